@@ -0,0 +1,165 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS answers (
+    id INTEGER PRIMARY KEY,
+    scope TEXT NOT NULL,
+    chunk_key TEXT NOT NULL,
+    question_key TEXT NOT NULL,
+    embedding BLOB NOT NULL,
+    answer TEXT NOT NULL,
+    sources TEXT NOT NULL,
+    created REAL NOT NULL,
+    last_hit REAL NOT NULL,
+    size INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS answers_lookup ON answers (scope, chunk_key, question_key);
+"""
+# One answer per exact key, so a refresh (Cache-Control: no-cache) replaces the
+# stored answer instead of adding a row behind the stale one.
+_UNIQUE = """
+DELETE FROM answers WHERE id NOT IN (SELECT MAX(id) FROM answers GROUP BY scope, chunk_key, question_key);
+CREATE UNIQUE INDEX IF NOT EXISTS answers_key ON answers (scope, chunk_key, question_key);
+"""
+
+def _digest(parts: Sequence[str]) -> str:
+    return hashlib.sha1("\0".join(parts).encode("utf-8")).hexdigest()
+
+def scope_key(*parts: str) -> str:
+    """Cache scope for everything besides the question and chunks that shapes the prompt (model, system prompt, ...)."""
+    return _digest(parts)
+
+def _chunk_key(chunk_ids: Sequence[str], contents: Optional[Sequence[str]] = None) -> str:
+    # Content hashes make a re-ingested chunk that kept its id miss the cache.
+    if contents is None:
+        return _digest(chunk_ids)
+    return _digest([f"{cid}:{_digest([text])}" for cid, text in zip(chunk_ids, contents)])
+
+def _unit(v: np.ndarray) -> np.ndarray:
+    v = np.asarray(v, dtype=np.float32).ravel()
+    n = float(np.linalg.norm(v))
+    return v / n if n else v
+
+class AnswerCache:
+    """Persistent cache of generated answers, matched by query-embedding similarity.
+
+    An entry is only reused when the new question retrieved exactly the same
+    chunks, in the same order and with the same text, so re-ingested or
+    re-ranked context always regenerates. The same question text always hits;
+    a differently worded one needs `threshold` similarity. The least recently
+    hit entries are evicted beyond `max_entries` or `max_bytes`.
+    """
+
+    def __init__(self, path: str, threshold: float, max_entries: int, scope: str = "", max_bytes: int = 0):
+        self.path = path
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.scope = scope
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            d = os.path.dirname(self.path)
+            if d:
+                os.makedirs(d, exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            cols = {row[1] for row in conn.execute("PRAGMA table_info(answers)")}
+            if cols and "size" not in cols:
+                # Written by an older version with a different key; it is only a cache.
+                conn.execute("DROP TABLE answers")
+            conn.executescript(_SCHEMA)
+            if not conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'answers_key'").fetchone():
+                conn.executescript(_UNIQUE)
+            # Every hit writes last_hit; WAL without a sync per commit keeps a
+            # hit in the tens of microseconds instead of waiting on the disk.
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn = conn
+        return self._conn
+
+    def lookup(self, q_emb: np.ndarray, chunk_ids: Sequence[str], contents: Optional[Sequence[str]] = None,
+               question: str = "") -> Optional[Tuple[str, List[str]]]:
+        q = _unit(q_emb)
+        with self._lock:
+            db = self._db()
+            rows = db.execute(
+                "SELECT id, embedding, answer, sources, question_key FROM answers WHERE scope = ? AND chunk_key = ?",
+                (self.scope, _chunk_key(chunk_ids, contents)),
+            ).fetchall()
+            exact = _digest([question]) if question else None
+            best, best_sim = None, self.threshold
+            for row in rows:
+                if row[4] == exact:
+                    best = row
+                    break
+                emb = np.frombuffer(row[1], dtype=np.float32)
+                if emb.shape != q.shape:
+                    continue
+                sim = float(emb @ q)
+                if sim >= best_sim:
+                    best, best_sim = row, sim
+            if best is None:
+                self.misses += 1
+                return None
+            db.execute("UPDATE answers SET last_hit = ? WHERE id = ?", (time.time(), best[0]))
+            db.commit()
+            self.hits += 1
+            return best[2], json.loads(best[3])
+
+    def store(self, q_emb: np.ndarray, chunk_ids: Sequence[str], answer: str, sources: List[str],
+              contents: Optional[Sequence[str]] = None, question: str = "") -> None:
+        now = time.time()
+        emb = _unit(q_emb).tobytes()
+        srcs = json.dumps(sources)
+        size = len(emb) + len(answer.encode("utf-8")) + len(srcs.encode("utf-8"))
+        with self._lock:
+            db = self._db()
+            db.execute(
+                "INSERT INTO answers (scope, chunk_key, question_key, embedding, answer, sources, created, last_hit, size) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) ON CONFLICT (scope, chunk_key, question_key) DO UPDATE SET "
+                "embedding = excluded.embedding, answer = excluded.answer, sources = excluded.sources, "
+                "created = excluded.created, last_hit = excluded.last_hit, size = excluded.size",
+                (self.scope, _chunk_key(chunk_ids, contents), _digest([question]) if question else "",
+                 emb, answer, srcs, now, now, size),
+            )
+            excess = db.execute("SELECT COUNT(*) FROM answers").fetchone()[0] - self.max_entries
+            if excess > 0:
+                db.execute(
+                    "DELETE FROM answers WHERE id IN (SELECT id FROM answers ORDER BY last_hit LIMIT ?)",
+                    (excess,),
+                )
+            if self.max_bytes > 0 and db.execute("SELECT SUM(size) FROM answers").fetchone()[0] > self.max_bytes:
+                # Keep the most recently hit entries that fit in max_bytes.
+                db.execute(
+                    "DELETE FROM answers WHERE id IN (SELECT id FROM (SELECT id, SUM(size) OVER "
+                    "(ORDER BY last_hit DESC, id DESC) AS total FROM answers) WHERE total > ?)",
+                    (self.max_bytes,),
+                )
+            db.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            size, nbytes = self._db().execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM answers").fetchone()
+            lookups = self.hits + self.misses
+            return {
+                "size": size,
+                "max_entries": self.max_entries,
+                "bytes": nbytes,
+                "max_bytes": self.max_bytes,
+                "threshold": self.threshold,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
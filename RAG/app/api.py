@@ -1,30 +1,151 @@
-from fastapi import FastAPI
-from pydantic import BaseModel
+import asyncio
+import json
+import time
+from contextlib import aclosing, asynccontextmanager
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from pydantic import BaseModel, Field
 from typing import List
 
-from app.query import retrieve, answer
-from app.config import TOP_K
+from app import metrics, rerank, resources
+from app.query import build_where, default_k, retrieve, retrieve_many, agenerate, astream_answer, embed_cache, answer_cache
+from app.runtime import run_retrieval
+from app.config import COLLECTION, WARM_ON_STARTUP, MAX_BATCH_QUERIES, MAX_TOP_K
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if WARM_ON_STARTUP:
+        resources.warm_in_background()
+    yield
 
-class QueryIn(BaseModel):
+app = FastAPI(lifespan=lifespan)
+
+@app.exception_handler(resources.UnknownCollection)
+async def unknown_collection(request: Request, exc: resources.UnknownCollection):
+    return JSONResponse({"detail": str(exc)}, status_code=404)
+
+@app.middleware("http")
+async def record_requests(request: Request, call_next):
+    # The route template (e.g. /query) rather than the raw URL keeps label cardinality bounded.
+    t0 = time.perf_counter()
+    try:
+        response = await call_next(request)
+    except Exception:
+        path = _route_path(request)
+        metrics.REQUESTS.inc(path=path, status="500")
+        metrics.ERRORS.inc(path=path)
+        raise
+    path = _route_path(request)
+    metrics.REQUESTS.inc(path=path, status=str(response.status_code))
+    metrics.REQUEST_SECONDS.observe(time.perf_counter() - t0, path=path)
+    if response.status_code >= 500:
+        metrics.ERRORS.inc(path=path)
+    return response
+
+def _route_path(request: Request) -> str:
+    route = request.scope.get("route")
+    return getattr(route, "path", "unmatched")
+
+class Filters(BaseModel):
+    # Collection to search (default: COLLECTION). Restrict retrieval to these sources / document sets and to documents dated
+    # within [date_from, date_to] (YYYY-MM-DD, inclusive).
+    collection: str | None = None
+    sources: List[str] | None = None
+    doc_sets: List[str] | None = None
+    date_from: str | None = None
+    date_to: str | None = None
+
+class QueryIn(Filters):
     q: str
-    k: int | None = None
+    k: int | None = Field(default=None, gt=0, le=MAX_TOP_K)
 
 class QueryOut(BaseModel):
     answer: str
     sources: List[str]
+    citations: List[str]
+
+class BatchQueryIn(Filters):
+    qs: List[str]
+    k: int | None = Field(default=None, gt=0, le=MAX_TOP_K)
+
+class BatchQueryOut(BaseModel):
+    results: List[QueryOut]
 
 @app.get("/health")
 def health():
     return {"ok": True}
 
+@app.get("/cache/stats")
+def cache_stats():
+    return {"embeddings": embed_cache.stats(), "answers": answer_cache.stats(), "rerank": rerank.stats()}
+
+@app.get("/metrics")
+def prometheus_metrics():
+    return PlainTextResponse(metrics.registry.render(), media_type=metrics.CONTENT_TYPE)
+
+@app.get("/collections")
+def collections():
+    return {"default": COLLECTION, "collections": resources.list_collections(), "open": resources.open_collections()}
+
+@app.get("/ready")
+def ready():
+    st = resources.status()
+    return JSONResponse(st, status_code=200 if st["ready"] else 503)
+
+def _scope(f: Filters) -> dict:
+    """The collection and where-filter keyword arguments for retrieve()/retrieve_many()."""
+    try:
+        collection = resources.check_collection_name(f.collection) if f.collection else None
+        return {"where": build_where(f.sources, f.date_from, f.date_to, f.doc_sets), "collection": collection}
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+def _cache_mode(request: Request) -> str:
+    """Answer-cache bypass from the request's Cache-Control header: no-store skips it, no-cache regenerates."""
+    directives = {d.strip().lower() for d in request.headers.get("cache-control", "").split(",")}
+    if "no-store" in directives:
+        return "off"
+    if "no-cache" in directives:
+        return "refresh"
+    return "use"
+
 @app.post("/query", response_model=QueryOut)
-def query(qin: QueryIn):
-    k = qin.k or TOP_K
-    results = retrieve(qin.q, k=k)
-    docs = results.get("documents", [[]])[0]
-    metas = results.get("metadatas", [[]])[0]
-    ans = answer(qin.q)
-    srcs = [m.get("source","") for m in metas]
-    return {"answer": ans, "sources": srcs}
+async def query(qin: QueryIn, request: Request):
+    k = qin.k or default_k()
+    r = await run_retrieval(retrieve, qin.q, k=k, **_scope(qin))
+    return {"answer": await agenerate(r, _cache_mode(request)), "sources": r.sources, "citations": r.citations}
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@app.post("/query/stream")
+async def query_stream(qin: QueryIn, request: Request):
+    k = qin.k or default_k()
+    r = await run_retrieval(retrieve, qin.q, k=k, **_scope(qin))
+
+    async def events():
+        yield _sse("sources", {"sources": r.sources, "citations": r.citations})
+        try:
+            async with aclosing(astream_answer(r, _cache_mode(request))) as pieces:
+                async for piece in pieces:
+                    if await request.is_disconnected():
+                        return
+                    yield _sse("token", {"text": piece})
+        except Exception as e:
+            metrics.ERRORS.inc(path="/query/stream")
+            yield _sse("error", {"detail": f"{type(e).__name__}: {e}"})
+            return
+        yield _sse("done", {})
+
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    return StreamingResponse(events(), media_type="text/event-stream", headers=headers)
+
+@app.post("/query/batch", response_model=BatchQueryOut)
+async def query_batch(bq: BatchQueryIn, request: Request):
+    if len(bq.qs) > MAX_BATCH_QUERIES:
+        raise HTTPException(status_code=413, detail=f"At most {MAX_BATCH_QUERIES} questions per batch")
+    k = bq.k or default_k()
+    rs = await run_retrieval(retrieve_many, bq.qs, k=k, **_scope(bq))
+    cache = _cache_mode(request)
+    answers = await asyncio.gather(*(agenerate(r, cache) for r in rs))
+    return {"results": [{"answer": a, "sources": r.sources, "citations": r.citations} for a, r in zip(answers, rs)]}
@@ -0,0 +1,97 @@
+import re
+from typing import Callable, Iterator, List, Optional, Sequence, Tuple
+
+Span = Tuple[int, int]
+Chunker = Callable[[str], Iterator[Span]]
+TokenCounter = Callable[[Sequence[str]], List[int]]
+
+# A sentence ends at ., ! or ? (optionally followed by a closing quote/bracket)
+# before whitespace, or at a blank line. One left-to-right scan, no backtracking
+# across the text, so boundary detection stays linear in the document length.
+_BOUNDARY = re.compile(r"\n[ \t]*\n\s*|(?<=[.!?])[\"')\]]*\s+")
+_WORD = re.compile(r"\w+|[^\w\s]")
+_NONSPACE = re.compile(r"\S+")
+
+def char_chunks(text: str, size: int, overlap: int) -> Iterator[Span]:
+    n, i = len(text), 0
+    while i < n:
+        j = min(i + size, n)
+        if text[i:j].strip():
+            yield i, j
+        if j == n:
+            break
+        i = max(0, j - overlap)
+
+def _units(text: str) -> Iterator[Tuple[int, int, bool]]:
+    """Yield (start, end, ends_paragraph) for each sentence, trimmed of surrounding whitespace."""
+    pos = 0
+    for m in _BOUNDARY.finditer(text):
+        if m.start() > pos:
+            yield pos, m.start(), m.group().count("\n") >= 2
+        pos = m.end()
+    if pos < len(text):
+        yield pos, len(text.rstrip()), True
+
+def approx_token_count(texts: Sequence[str]) -> List[int]:
+    return [len(_WORD.findall(t)) for t in texts]
+
+def tokenizer_counter(tokenizer) -> TokenCounter:
+    """Count tokens with a Hugging Face tokenizer, batching all texts in one call."""
+    def count(texts: Sequence[str]) -> List[int]:
+        if not texts:
+            return []
+        ids = tokenizer(list(texts), add_special_tokens=False, truncation=False)["input_ids"]
+        return [len(x) for x in ids]
+    return count
+
+def _split_long(text: str, start: int, end: int, tokens: int, max_tokens: int) -> Iterator[Span]:
+    # A single sentence over budget: cut it into equal runs of whitespace-separated words.
+    words = [m.span() for m in _NONSPACE.finditer(text, start, end)]
+    pieces = -(-tokens // max_tokens)
+    step = max(1, -(-len(words) // pieces))
+    for i in range(0, len(words), step):
+        yield words[i][0], words[min(i + step, len(words)) - 1][1]
+
+def sentence_chunks(text: str, max_tokens: int, count: TokenCounter = approx_token_count,
+                    overlap_sentences: int = 0) -> Iterator[Span]:
+    """Pack whole sentences into chunks of at most `max_tokens` tokens.
+
+    Chunks close early at a paragraph break once they are half full, so
+    paragraphs tend to stay together. `overlap_sentences` repeats the last N
+    sentences of a chunk at the start of the next one.
+    """
+    units = [u for u in _units(text) if u[1] > u[0]]
+    sizes = count([text[s:e] for s, e, _ in units])
+    cur: List[int] = []
+    cur_tokens = 0
+    for idx, ((s, e, para), n) in enumerate(zip(units, sizes)):
+        if n > max_tokens:
+            if cur:
+                yield units[cur[0]][0], units[cur[-1]][1]
+                cur, cur_tokens = [], 0
+            yield from _split_long(text, s, e, n, max_tokens)
+            continue
+        if cur and cur_tokens + n > max_tokens:
+            yield units[cur[0]][0], units[cur[-1]][1]
+            cur = cur[-overlap_sentences:] if overlap_sentences else []
+            cur_tokens = sum(sizes[i] for i in cur)
+            if cur_tokens + n > max_tokens:
+                cur, cur_tokens = [], 0
+        cur.append(idx)
+        cur_tokens += n
+        if para and cur_tokens * 2 >= max_tokens:
+            yield units[cur[0]][0], units[cur[-1]][1]
+            cur, cur_tokens = [], 0
+    if cur:
+        yield units[cur[0]][0], units[cur[-1]][1]
+
+CHUNKERS = ("char", "sentence")
+
+def get_chunker(name: str, size: int, overlap: int, max_tokens: int,
+                count: Optional[TokenCounter] = None) -> Chunker:
+    if name == "char":
+        return lambda text: char_chunks(text, size, overlap)
+    if name == "sentence":
+        counter = count or approx_token_count
+        return lambda text: sentence_chunks(text, max_tokens, counter)
+    raise ValueError(f"Unknown chunker {name!r}; expected one of {CHUNKERS}")
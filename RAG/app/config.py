@@ -4,8 +4,58 @@ from dotenv import load_dotenv
 load_dotenv()
 
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "")
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL") or None
 CHROMA_DIR = os.getenv("CHROMA_DIR", ".chroma")
+COLLECTION = os.getenv("COLLECTION", "docs")
+COLLECTION_IDLE_SECONDS = float(os.getenv("COLLECTION_IDLE_SECONDS", "900"))
 EMBED_MODEL = os.getenv("EMBED_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
 TOP_K = int(os.getenv("TOP_K", "5"))
+MAX_TOP_K = int(os.getenv("MAX_TOP_K", "100"))
 CHUNK_SIZE = int(os.getenv("CHUNK_SIZE", "500"))
 CHUNK_OVERLAP = int(os.getenv("CHUNK_OVERLAP", "100"))
+CHUNKER = os.getenv("CHUNKER", "sentence")
+CHUNK_TOKENS = int(os.getenv("CHUNK_TOKENS", "200"))
+# Token budget for the retrieved context in the LLM prompt (0 = no limit).
+CONTEXT_TOKENS = int(os.getenv("CONTEXT_TOKENS", "1500"))
+INGEST_EMBED_BATCH = int(os.getenv("INGEST_EMBED_BATCH", "64"))
+INGEST_UPSERT_BATCH = int(os.getenv("INGEST_UPSERT_BATCH", "512"))
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "1"))
+# Ingest persists the store (and advances the manifest) after this many chunks
+# or seconds since the last flush, whichever comes first, and at the end of a run.
+INGEST_FLUSH_CHUNKS = int(os.getenv("INGEST_FLUSH_CHUNKS", "20000"))
+INGEST_FLUSH_SECONDS = float(os.getenv("INGEST_FLUSH_SECONDS", "60"))
+PDF_PAGES_PER_TASK = int(os.getenv("PDF_PAGES_PER_TASK", "25"))
+WARM_ON_STARTUP = os.getenv("WARM_ON_STARTUP", "1") == "1"
+EMBED_CACHE_SIZE = int(os.getenv("EMBED_CACHE_SIZE", "1024"))
+EMBED_CACHE_TTL = float(os.getenv("EMBED_CACHE_TTL", "3600"))
+LLM_MODEL = os.getenv("LLM_MODEL", "gpt-4o-mini")
+ANSWER_CACHE_ENABLED = os.getenv("ANSWER_CACHE_ENABLED", "1") == "1"
+ANSWER_CACHE_PATH = os.getenv("ANSWER_CACHE_PATH", os.path.join(CHROMA_DIR, "answer_cache.sqlite3"))
+ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.95"))
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "10000"))
+ANSWER_CACHE_MAX_BYTES = int(os.getenv("ANSWER_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+GENERATION_CONCURRENCY = int(os.getenv("GENERATION_CONCURRENCY", "8"))
+RETRIEVAL_WORKERS = int(os.getenv("RETRIEVAL_WORKERS", "4"))
+MAX_BATCH_QUERIES = int(os.getenv("MAX_BATCH_QUERIES", "64"))
+LEXICAL_INDEX = os.getenv("LEXICAL_INDEX", "1") == "1"
+HYBRID_SEARCH = os.getenv("HYBRID_SEARCH", "1") == "1"
+HYBRID_CANDIDATES = int(os.getenv("HYBRID_CANDIDATES", "20"))
+RRF_K = int(os.getenv("RRF_K", "60"))
+RERANK_ENABLED = os.getenv("RERANK_ENABLED", "0") == "1"
+RERANK_MODEL = os.getenv("RERANK_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+RERANK_CANDIDATES = int(os.getenv("RERANK_CANDIDATES", "20"))
+RERANK_TOP_K = int(os.getenv("RERANK_TOP_K", "3"))
+RERANK_BUDGET_MS = float(os.getenv("RERANK_BUDGET_MS", "150"))
+RERANK_CACHE_SIZE = int(os.getenv("RERANK_CACHE_SIZE", "8192"))
+RERANK_CACHE_TTL = float(os.getenv("RERANK_CACHE_TTL", "3600"))
+QUANTIZE = os.getenv("QUANTIZE", "none")
+QUANTIZE_RESCORE = int(os.getenv("QUANTIZE_RESCORE", "4"))
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "chroma")
+HNSW_M = int(os.getenv("HNSW_M", "16"))
+HNSW_EF_CONSTRUCTION = int(os.getenv("HNSW_EF_CONSTRUCTION", "200"))
+HNSW_EF_SEARCH = int(os.getenv("HNSW_EF_SEARCH", "64"))
+FLAT_INDEX = os.getenv("FLAT_INDEX", "0") == "1"
+DEDUP = os.getenv("DEDUP", "0") == "1"
+DEDUP_THRESHOLD = float(os.getenv("DEDUP_THRESHOLD", "0.95"))
+WATCH_DEBOUNCE_MS = int(os.getenv("WATCH_DEBOUNCE_MS", "1000"))
+WATCH_POLL_INTERVAL = float(os.getenv("WATCH_POLL_INTERVAL", "1.0"))
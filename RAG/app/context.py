@@ -0,0 +1,123 @@
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from app.chunking import TokenCounter, approx_token_count
+
+# Chunks of the same page whose offsets are at most this many characters apart
+# (the whitespace a chunker strips between them) are joined into one passage.
+ADJACENT_GAP = 8
+# Shortest suffix/prefix match that counts as overlap when offsets are missing.
+MIN_OVERLAP = 20
+
+@dataclass
+class _Passage:
+    text: str
+    rank: int
+    start: Optional[int]
+    end: Optional[int]
+
+def _overlap(a: str, b: str) -> int:
+    """Length of the longest suffix of `a` that is a prefix of `b` (0 below MIN_OVERLAP)."""
+    probe = b[:MIN_OVERLAP]
+    if len(probe) < MIN_OVERLAP:
+        return 0
+    i = a.find(probe, max(0, len(a) - len(b)))
+    while i != -1:
+        if b.startswith(a[i:]):
+            return len(a) - i
+        i = a.find(probe, i + 1)
+    return 0
+
+def _merge(cur: _Passage, nxt: _Passage) -> Optional[_Passage]:
+    """One passage covering both, or None when they are not neighbours.
+
+    With offsets on both sides they decide (after checking that the text
+    really overlaps); chunks without offsets, stored before ingest recorded
+    them, are matched on their text alone.
+    """
+    a, b = cur.text, nxt.text
+    if b in a:
+        text = a
+    elif a in b:
+        text = b
+    elif cur.end is not None and nxt.start is not None:
+        gap = nxt.start - cur.end
+        if 0 <= gap <= ADJACENT_GAP:
+            text = a + ("" if gap == 0 else "\n") + b
+        elif gap < 0 and a.endswith(b[:-gap]):
+            text = a + b[-gap:]
+        else:
+            return None
+    elif _overlap(a, b):
+        text = a + b[_overlap(a, b):]
+    elif _overlap(b, a):
+        text = b + a[_overlap(b, a):]
+    else:
+        return None
+    ends = [e for e in (cur.end, nxt.end) if e is not None]
+    starts = [s for s in (cur.start, nxt.start) if s is not None]
+    return _Passage(text, min(cur.rank, nxt.rank), min(starts, default=None), max(ends, default=None))
+
+def _truncate(text: str, budget: int, count: TokenCounter) -> str:
+    # Longest prefix, cut at a space, that fits the budget.
+    lo, hi = 0, len(text)
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if count([text[:mid]])[0] <= budget:
+            lo = mid
+        else:
+            hi = mid - 1
+    cut = text.rfind(" ", 0, lo + 1) if lo < len(text) else lo
+    return text[:cut if cut > 0 else lo].rstrip()
+
+def merge_passages(documents: Sequence[str], metadatas: Sequence[Dict[str, Any]]) -> List[Tuple[str, int]]:
+    """Merge overlapping, adjacent or contained chunks of the same source page.
+
+    Returns (text, best rank) per passage, best first; the rank is the
+    position of the passage's highest-scored chunk in `documents`.
+    """
+    groups: Dict[Tuple[str, Any], List[_Passage]] = {}
+    for rank, (doc, meta) in enumerate(zip(documents, metadatas)):
+        meta = meta or {}
+        groups.setdefault((meta.get("source", ""), meta.get("page")), []).append(
+            _Passage(doc, rank, meta.get("start"), meta.get("end"))
+        )
+    passages = []
+    for members in groups.values():
+        members.sort(key=lambda p: (p.start is None, p.start or 0, p.rank))
+        merged: List[_Passage] = []
+        for nxt in members:
+            # Chunks arrive in page order, so one with offsets can only join
+            # the passage before it; one without is tried against all of them.
+            candidates = range(len(merged)) if nxt.start is None else range(len(merged))[-1:]
+            for i in reversed(candidates):
+                joined = _merge(merged[i], nxt)
+                if joined is not None:
+                    merged[i] = joined
+                    break
+            else:
+                merged.append(nxt)
+        passages.extend(merged)
+    passages.sort(key=lambda p: p.rank)
+    return [(p.text, p.rank) for p in passages]
+
+def pack(documents: Sequence[str], metadatas: Sequence[Dict[str, Any]], budget: int,
+         count: TokenCounter = approx_token_count) -> List[str]:
+    """Context passages for the prompt: merged chunks, best first, within `budget` tokens (0 = no limit).
+
+    Passages that do not fit are skipped so that smaller, lower-ranked ones can
+    still use the remaining budget; a best passage that alone exceeds the
+    budget is truncated rather than dropped.
+    """
+    passages = [text for text, _ in merge_passages(documents, metadatas)]
+    if budget <= 0:
+        return passages
+    out, used = [], 0
+    for text, n in zip(passages, count(passages)):
+        if used + n <= budget:
+            out.append(text)
+            used += n
+        elif not out:
+            out.append(_truncate(text, budget, count))
+            used = budget
+    return out
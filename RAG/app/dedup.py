@@ -0,0 +1,149 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS survivors (id TEXT PRIMARY KEY, source TEXT NOT NULL, signature BLOB NOT NULL);
+CREATE INDEX IF NOT EXISTS survivors_source ON survivors (source);
+CREATE TABLE IF NOT EXISTS bands (band INTEGER, value INTEGER, id TEXT, PRIMARY KEY (band, value, id)) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS copies (source TEXT NOT NULL, id TEXT NOT NULL, metadata TEXT NOT NULL);
+CREATE INDEX IF NOT EXISTS copies_source ON copies (source);
+CREATE INDEX IF NOT EXISTS copies_id ON copies (id);
+"""
+_WORD = re.compile(r"\w+")
+NUM_PERM = 64
+BANDS = 16
+# Fixed seed: signatures are persisted and compared across runs.
+_A, _B = (np.random.default_rng(0x5EED).integers(1, 2 ** 63, size=(2, NUM_PERM), dtype=np.uint64) | np.uint64(1))
+
+def shingles(text: str, k: int = 3) -> List[str]:
+    words = _WORD.findall(text.lower())
+    return [" ".join(words[i:i + k]) for i in range(max(1, len(words) - k + 1))]
+
+def minhash(text: str) -> np.ndarray:
+    """NUM_PERM-value MinHash of the word 3-grams; the share of equal values estimates Jaccard similarity."""
+    grams = set(shingles(text))
+    digests = b"".join(hashlib.blake2b(g.encode("utf-8"), digest_size=8).digest() for g in grams)
+    h = np.frombuffer(digests, dtype="<u8")
+    with np.errstate(over="ignore"):
+        perms = h[:, None] * _A[None, :] + _B[None, :]
+    return (perms.min(axis=0) >> np.uint64(32)).astype("<u4")
+
+def _band_key(values: np.ndarray) -> int:
+    return int.from_bytes(hashlib.blake2b(values.tobytes(), digest_size=8).digest(), "little", signed=True)
+
+class DedupIndex:
+    """MinHash signatures of the stored chunks, for dropping near-duplicates before embedding.
+
+    Two chunks are near-duplicates when the estimated Jaccard similarity of
+    their word 3-grams is at least `threshold`. Signatures are split into
+    BANDS bands, and only chunks that agree on a whole band are compared, so a
+    lookup is a few indexed probes instead of a scan. The dropped chunks are
+    kept as "copies" of their survivor, so the sources that hold a copy can be
+    re-ingested when the survivor's own source goes away.
+    """
+
+    def __init__(self, path: str, threshold: float = 0.95):
+        self.path = path
+        self.threshold = threshold
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            d = os.path.dirname(self.path)
+            if d:
+                os.makedirs(d, exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.executescript(_SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    @staticmethod
+    def _bands(sig: np.ndarray) -> List[Tuple[int, int]]:
+        return [(b, _band_key(band)) for b, band in enumerate(np.split(sig, BANDS))]
+
+    def match(self, sig: np.ndarray) -> Optional[str]:
+        """The most similar stored chunk at or above the threshold, if any."""
+        best: Optional[Tuple[float, str]] = None
+        seen = set()
+        with self._lock:
+            db = self._db()
+            for band, value in self._bands(sig):
+                rows = db.execute(
+                    "SELECT s.id, s.signature FROM bands b JOIN survivors s ON s.id = b.id "
+                    "WHERE b.band = ? AND b.value = ?", (band, value),
+                )
+                for cid, other in rows:
+                    if cid in seen:
+                        continue
+                    seen.add(cid)
+                    sim = float(np.mean(np.frombuffer(other, dtype="<u4") == sig))
+                    if sim >= self.threshold and (best is None or sim > best[0]):
+                        best = (sim, cid)
+        return best[1] if best else None
+
+    def add(self, cid: str, source: str, sig: np.ndarray) -> None:
+        with self._lock:
+            db = self._db()
+            db.execute("INSERT OR REPLACE INTO survivors (id, source, signature) VALUES (?, ?, ?)",
+                       (cid, source, sig.tobytes()))
+            db.executemany("INSERT OR IGNORE INTO bands (band, value, id) VALUES (?, ?, ?)",
+                           [(b, v, cid) for b, v in self._bands(sig)])
+
+    def add_copy(self, source: str, cid: str, meta: Dict[str, Any]) -> None:
+        with self._lock:
+            self._db().execute("INSERT INTO copies (source, id, metadata) VALUES (?, ?, ?)",
+                               (source, cid, json.dumps(meta)))
+
+    def sources(self, cid: str) -> List[str]:
+        """Every source holding this chunk: its owner first, then the sources of its copies."""
+        with self._lock:
+            db = self._db()
+            owner = db.execute("SELECT source FROM survivors WHERE id = ?", (cid,)).fetchone()
+            rest = [s for (s,) in db.execute("SELECT DISTINCT source FROM copies WHERE id = ? ORDER BY source", (cid,))]
+        owned = [owner[0]] if owner else []
+        return owned + [s for s in rest if s not in owned]
+
+    def drop_source(self, source: str) -> Tuple[Set[str], Set[str]]:
+        """Forget `source` and its chunks. Returns (heirs, touched).
+
+        heirs are the other sources that held a copy of one of its chunks; that
+        copy was never stored, so they must be re-ingested to store their own
+        text. touched holds the other survivors that lost copies from `source`.
+        """
+        with self._lock:
+            db = self._db()
+            touched = {cid for (cid,) in db.execute("SELECT DISTINCT id FROM copies WHERE source = ?", (source,))}
+            db.execute("DELETE FROM copies WHERE source = ?", (source,))
+            owned = [cid for (cid,) in db.execute("SELECT id FROM survivors WHERE source = ?", (source,))]
+            heirs: Set[str] = set()
+            for cid in owned:
+                heirs.update(s for (s,) in db.execute("SELECT DISTINCT source FROM copies WHERE id = ?", (cid,)))
+                db.execute("DELETE FROM copies WHERE id = ?", (cid,))
+                db.execute("DELETE FROM bands WHERE id = ?", (cid,))
+            db.execute("DELETE FROM survivors WHERE source = ?", (source,))
+        return heirs, touched - set(owned)
+
+    def commit(self) -> None:
+        with self._lock:
+            self._db().commit()
+
+    def clear(self) -> None:
+        with self._lock:
+            db = self._db()
+            db.executescript("DELETE FROM survivors; DELETE FROM bands; DELETE FROM copies;")
+            db.commit()
+
+    def count(self) -> Tuple[int, int]:
+        """(stored chunks, dropped copies)"""
+        with self._lock:
+            db = self._db()
+            return (db.execute("SELECT COUNT(*) FROM survivors").fetchone()[0],
+                    db.execute("SELECT COUNT(*) FROM copies").fetchone()[0])
@@ -0,0 +1,55 @@
+import re
+from datetime import date, datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+_MONTHS = ("january february march april may june july august september october november december").split()
+# "February 23, 2023" / "Feb. 23, 2023" / "Sept 23, 2023": full month names or exact abbreviations only.
+_MONTH_NAMES = sorted({*_MONTHS, *(m[:3] for m in _MONTHS), "sept"}, key=len, reverse=True)
+_DATE = re.compile(r"\b(" + "|".join(_MONTH_NAMES) + r")\.?\s+(\d{1,2}),\s+(\d{4})\b", re.I)
+_TITLE_CHARS = 200
+
+def date_int(d: date) -> int:
+    """Dates are stored as YYYYMMDD integers so the vector stores can range-filter them."""
+    return d.year * 10000 + d.month * 100 + d.day
+
+def _text_date(text: str) -> Optional[int]:
+    for m in _DATE.finditer(text):
+        month = [x[:3] for x in _MONTHS].index(m.group(1).lower()[:3]) + 1
+        try:
+            return date_int(date(int(m.group(3)), month, int(m.group(2))))
+        except ValueError:
+            continue
+    return None
+
+def _pdf_info(path: Path) -> Dict[str, Any]:
+    try:
+        from pypdf import PdfReader
+        info = PdfReader(str(path)).metadata or {}
+        return {"title": info.get("/Title"), "created": info.creation_date}
+    except Exception:
+        return {}
+
+def _first_line(text: str) -> Optional[str]:
+    for line in text.splitlines():
+        line = line.strip().lstrip("#").strip()
+        if line:
+            return line[:_TITLE_CHARS]
+    return None
+
+def describe(path: Path, pages: List[str]) -> Dict[str, Any]:
+    """Title and date (YYYYMMDD) of a document.
+
+    The title is the PDF /Title, else the first non-empty line, else the file
+    name. The date is the first written date ("February 23, 2023") on the
+    first page, else the PDF creation date, else the file's modification time.
+    """
+    info = _pdf_info(path) if path.suffix.lower() == ".pdf" else {}
+    first = pages[0] if pages else ""
+    title = (info.get("title") or "").strip() or _first_line(first) or path.stem
+    day = _text_date(first[:5000])
+    if day is None and isinstance(info.get("created"), datetime):
+        day = date_int(info["created"].date())
+    if day is None:
+        day = date_int(datetime.fromtimestamp(path.stat().st_mtime).date())
+    return {"title": title, "date": day}
@@ -0,0 +1,213 @@
+import bisect
+import json
+import mmap
+import os
+import threading
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.store import Hit, Records, Where, where_conditions
+
+# Metadata fields written as columns at build time, so filtered searches never parse chunks.jsonl.
+COLUMNS = ("source", "doc_set", "date")
+
+def write_records(dirpath: str, documents: Sequence[str], metadatas: Sequence[Dict[str, Any]]) -> None:
+    """Write documents and metadata as JSON lines (chunks.jsonl) plus the byte offset of each line (offsets.npy)."""
+    offsets = [0]
+    with open(os.path.join(dirpath, "chunks.jsonl"), "wb") as f:
+        for doc, meta in zip(documents, metadatas):
+            line = json.dumps([doc, meta or {}], ensure_ascii=False).encode("utf-8") + b"\n"
+            f.write(line)
+            offsets.append(offsets[-1] + len(line))
+    np.save(os.path.join(dirpath, "offsets.npy"), np.asarray(offsets, dtype=np.int64))
+
+def open_records(dirpath: str, count: int) -> Tuple[Optional[mmap.mmap], np.ndarray]:
+    offsets = np.load(os.path.join(dirpath, "offsets.npy"), mmap_mode="r")
+    if not count:
+        return None, offsets
+    with open(os.path.join(dirpath, "chunks.jsonl"), "rb") as f:
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ), offsets
+
+def read_record(chunks: mmap.mmap, offsets: np.ndarray, row: int) -> Tuple[str, Dict[str, Any]]:
+    doc, meta = json.loads(chunks[int(offsets[row]):int(offsets[row + 1])])
+    return doc, meta
+
+def _write_columns(dirpath: str, metadatas: Sequence[Dict[str, Any]]) -> None:
+    """Dictionary-encode each of COLUMNS: col-<field>.npy holds int32 codes (-1 = missing)
+    into the sorted distinct values listed in columns.json, so code order is value order."""
+    vocab = {}
+    for field in COLUMNS:
+        values = [(m or {}).get(field) for m in metadatas]
+        try:
+            distinct = sorted({v for v in values if v is not None})
+        except TypeError:
+            continue  # mixed types have no order; filters on this field go to the vector store
+        index = {v: i for i, v in enumerate(distinct)}
+        codes = np.asarray([index.get(v, -1) if v is not None else -1 for v in values], dtype=np.int32)
+        np.save(os.path.join(dirpath, f"col-{field}.npy"), codes)
+        vocab[field] = distinct
+    with open(os.path.join(dirpath, "columns.json"), "w", encoding="utf-8") as f:
+        json.dump(vocab, f, ensure_ascii=False)
+
+def _column_mask(codes: np.ndarray, values: List[Any], op: str, operand: Any) -> np.ndarray:
+    """Rows of one dictionary-encoded column satisfying `op operand`, with the semantics of store.matches."""
+    if op in ("$eq", "$ne", "$in", "$nin"):
+        wanted = [operand] if op in ("$eq", "$ne") else list(operand)
+        where = {v: i for i, v in enumerate(values)}
+        mask = np.isin(codes, [where[v] for v in wanted if v in where])
+        return ~mask if op in ("$ne", "$nin") else mask
+    # Missing values (-1) never satisfy a range, and bisect gives the first code past the bound.
+    if op in ("$gt", "$gte"):
+        return codes >= (bisect.bisect_right if op == "$gt" else bisect.bisect_left)(values, operand)
+    cut = (bisect.bisect_left if op == "$lt" else bisect.bisect_right)(values, operand)
+    return (codes >= 0) & (codes < cut)
+
+class FlatIndex:
+    """Exact search over a flat matrix of unit-normalized float32 embeddings.
+
+    Every file is memory-mapped read-only, so several API workers share the
+    same page-cache pages and opening the index costs only the ids list.
+    Documents and metadata are JSON lines in chunks.jsonl; offsets.npy holds
+    the byte offset of each line, so a hit is decoded without a store lookup.
+    The fields in COLUMNS are also stored as memory-mapped columns, which
+    `where` filters are evaluated on; see can_filter().
+    Distances are squared L2 between unit vectors (2 - 2 * cosine), which
+    matches the other backends for normalized embeddings.
+    """
+
+    BLOCK = 16384
+
+    def __init__(self, path: str):
+        self.path = path
+        self.ids: List[str] = []
+        self.embeddings: Optional[np.ndarray] = None
+        self.offsets: Optional[np.ndarray] = None
+        self._chunks: Optional[mmap.mmap] = None
+        self._rows: Optional[Dict[str, int]] = None
+        self._columns: Optional[Dict[str, Tuple[np.ndarray, List[Any]]]] = None
+
+    @classmethod
+    def build(cls, path: str, ids: Sequence[str], embs: np.ndarray, documents: Sequence[str],
+              metadatas: Sequence[Dict[str, Any]]) -> "FlatIndex":
+        embs = np.asarray(embs, dtype=np.float32)
+        norms = np.linalg.norm(embs, axis=1, keepdims=True) if len(embs) else np.ones((0, 1), np.float32)
+        os.makedirs(path, exist_ok=True)
+        tmp = path + ".tmp"
+        os.makedirs(tmp, exist_ok=True)
+        np.save(os.path.join(tmp, "embeddings.npy"), embs / np.where(norms == 0, 1, norms))
+        write_records(tmp, documents, metadatas)
+        _write_columns(tmp, metadatas)
+        with open(os.path.join(tmp, "ids.json"), "w", encoding="utf-8") as f:
+            json.dump(list(ids), f)
+        with open(os.path.join(tmp, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump({"count": len(ids), "dim": int(embs.shape[1]) if embs.ndim == 2 else 0}, f)
+        # meta.json goes last so a reader never sees it next to half-written files.
+        for name in ("embeddings.npy", "chunks.jsonl", "offsets.npy", *(f"col-{c}.npy" for c in COLUMNS),
+                     "columns.json", "ids.json", "meta.json"):
+            src = os.path.join(tmp, name)
+            if os.path.exists(src):
+                os.replace(src, os.path.join(path, name))
+            elif os.path.exists(os.path.join(path, name)):
+                os.remove(os.path.join(path, name))
+        os.rmdir(tmp)
+        return cls(path).load()
+
+    def load(self) -> "FlatIndex":
+        with open(os.path.join(self.path, "ids.json"), encoding="utf-8") as f:
+            self.ids = json.load(f)
+        self.embeddings = np.load(os.path.join(self.path, "embeddings.npy"), mmap_mode="r")
+        self._chunks, self.offsets = open_records(self.path, len(self.ids))
+        return self
+
+    def _record(self, row: int) -> Tuple[str, Dict[str, Any]]:
+        return read_record(self._chunks, self.offsets, row)
+
+    def _load_columns(self) -> Dict[str, Tuple[np.ndarray, List[Any]]]:
+        if self._columns is None:
+            columns = {}
+            try:
+                with open(os.path.join(self.path, "columns.json"), encoding="utf-8") as f:
+                    vocab = json.load(f)
+            except FileNotFoundError:
+                vocab = {}  # built before columns existed
+            for field, values in vocab.items():
+                columns[field] = (np.load(os.path.join(self.path, f"col-{field}.npy"), mmap_mode="r"), values)
+            self._columns = columns
+        return self._columns
+
+    def can_filter(self, where: Where) -> bool:
+        """Whether every field in `where` has a column; other filters must go to the vector store."""
+        if "$and" in where or "$or" in where:
+            return all(self.can_filter(w) for w in where.get("$and", where.get("$or")))
+        columns = self._load_columns()
+        return all(field in columns for field, _, _ in where_conditions(where))
+
+    def _mask(self, where: Where) -> np.ndarray:
+        if "$and" in where or "$or" in where:
+            masks = [self._mask(w) for w in where.get("$and", where.get("$or"))]
+            return np.logical_and.reduce(masks) if "$and" in where else np.logical_or.reduce(masks)
+        mask = np.ones(len(self.ids), dtype=bool)
+        for field, op, operand in where_conditions(where):
+            codes, values = self._columns[field]
+            mask &= _column_mask(codes, values, op, operand)
+        return mask
+
+    def _filter(self, where: Where) -> np.ndarray:
+        """Row numbers whose columns match `where` (see can_filter)."""
+        if not self.can_filter(where):
+            raise ValueError(f"Flat index has no column for filter {where!r}")
+        return np.flatnonzero(self._mask(where))
+
+    def search(self, queries: np.ndarray, n: int, where: Optional[Where] = None) -> List[List[Hit]]:
+        """Return the n nearest hits per query row, best first; only rows matching `where` are scored."""
+        rows = self._filter(where) if where and self.ids else None
+        total = len(self.ids) if rows is None else len(rows)
+        if not total or n <= 0:
+            return [[] for _ in range(len(queries))]
+        q = np.asarray(queries, dtype=np.float32)
+        qn = np.linalg.norm(q, axis=1, keepdims=True)
+        q = q / np.where(qn == 0, 1, qn)
+        sims = np.empty((total, len(q)), dtype=np.float32)
+        for s in range(0, total, self.BLOCK):
+            block = self.embeddings[s:s + self.BLOCK] if rows is None else self.embeddings[rows[s:s + self.BLOCK]]
+            sims[s:s + len(block)] = block @ q.T
+        n = min(n, total)
+        out = []
+        for col in sims.T:
+            top = np.argpartition(-col, n - 1)[:n] if n < len(col) else np.arange(len(col))
+            top = top[np.argsort(-col[top])]
+            row_of = top if rows is None else rows[top]
+            out.append([(self.ids[r], *self._record(r), float(2.0 - 2.0 * col[i])) for i, r in zip(top, row_of)])
+        return out
+
+    def get(self, ids: Sequence[str], embeddings: bool = False) -> Records:
+        if self._rows is None:
+            self._rows = {cid: i for i, cid in enumerate(self.ids)}
+        out = {}
+        for cid in ids:
+            row = self._rows.get(cid)
+            if row is not None:
+                emb = np.asarray(self.embeddings[row]) if embeddings else None
+                out[cid] = (*self._record(row), emb)
+        return out
+
+_cache: Dict[str, Tuple[int, FlatIndex]] = {}
+_cache_lock = threading.Lock()
+
+def forget_flat(path: str) -> None:
+    """Drop the cached index for `path`; its memory maps close once no search holds them."""
+    with _cache_lock:
+        _cache.pop(path, None)
+
+def open_flat(path: str) -> Optional[FlatIndex]:
+    """Load (or reuse) the index at `path`, reloading when ingest has rebuilt it."""
+    try:
+        mtime = os.stat(os.path.join(path, "meta.json")).st_mtime_ns
+    except FileNotFoundError:
+        return None
+    with _cache_lock:
+        hit = _cache.get(path)
+        if hit is None or hit[0] != mtime:
+            hit = _cache[path] = (mtime, FlatIndex(path).load())
+        return hit[1]
@@ -1,80 +1,612 @@
 import argparse
+import hashlib
+import json
+import os
+import shutil
+import sys
+import time
+from collections import deque
+from contextlib import nullcontext, suppress
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from typing import List, Tuple
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
 
-import chromadb
-from chromadb.config import Settings
-from sentence_transformers import SentenceTransformer
+import numpy as np
 from pypdf import PdfReader
 
-from app.config import CHROMA_DIR, EMBED_MODEL, CHUNK_SIZE, CHUNK_OVERLAP
+from app.chunking import CHUNKERS, Chunker, get_chunker, tokenizer_counter
+from app.config import (
+    CHROMA_DIR, COLLECTION, CHUNK_SIZE, CHUNK_OVERLAP, CHUNK_TOKENS, CHUNKER, DEDUP, DEDUP_THRESHOLD, INGEST_EMBED_BATCH,
+    INGEST_FLUSH_CHUNKS, INGEST_FLUSH_SECONDS, INGEST_UPSERT_BATCH, INGEST_WORKERS, LEXICAL_INDEX, FLAT_INDEX, PDF_PAGES_PER_TASK, QUANTIZE,
+    WATCH_DEBOUNCE_MS, WATCH_POLL_INTERVAL,
+)
+from app.dedup import DedupIndex, minhash
+from app.docmeta import describe
+from app.flat import FlatIndex, forget_flat
+from app.ingest_stats import IngestStats
+from app.lexical import LexicalIndex
+from app.quantize import MODES, QuantizedIndex, forget_index
+from app.resources import (
+    check_collection_name, dedup_path, flat_path, get_embedder, get_flat, get_lexical, get_quantized, get_store, quantized_path,
+)
+from app.store import VectorStore
+
+SUFFIXES = {".txt", ".md", ".pdf"}
+# Bump when the per-chunk metadata changes so the next run re-ingests every file.
+METADATA_VERSION = 4
+DEFAULT_DOC_SET = "default"
+
+# (path, first page, stop page); start is None for plain-text files.
+ExtractTask = Tuple[str, Optional[int], Optional[int]]
+# (1-based page number or None for the whole file, error message)
+PageError = Tuple[Optional[int], str]
 
 def _read_text(path: Path) -> str:
     return path.read_text(encoding="utf-8", errors="ignore")
 
-def _read_pdf(path: Path) -> str:
-    reader = PdfReader(str(path))
-    pages = []
-    for p in reader.pages:
+def _read_pdf(path: str, start: int = 0, stop: Optional[int] = None) -> Tuple[List[str], List[PageError]]:
+    """Extract pages [start, stop) of a PDF. Failed pages come back empty and are listed in the errors."""
+    try:
+        reader = PdfReader(path)
+        n = len(reader.pages)
+    except Exception as e:
+        return [], [(None, f"{type(e).__name__}: {e}")]
+    pages, errors = [], []
+    for i in range(start, n if stop is None else min(stop, n)):
         try:
-            pages.append(p.extract_text() or "")
-        except Exception:
-            pass
-    return "\n".join(pages)
-
-def _load_docs(root: Path) -> List[Tuple[str, str]]:
-    out = []
-    for p in root.rglob("*"):
-        if p.is_file():
-            suf = p.suffix.lower()
-            if suf in {".txt", ".md"}:
-                out.append((str(p), _read_text(p)))
-            elif suf == ".pdf":
-                out.append((str(p), _read_pdf(p)))
-    return out
-
-def _chunk(text: str, size: int, overlap: int) -> List[str]:
-    chunks, n, i = [], len(text), 0
-    while i < n:
-        j = min(i + size, n)
-        chunk = text[i:j]
-        if chunk.strip():
-            chunks.append(chunk)
-        if j == n:
-            break
-        i = max(0, j - overlap)
-    return chunks
+            pages.append(reader.pages[i].extract_text() or "")
+        except Exception as e:
+            pages.append("")
+            errors.append((i + 1, f"{type(e).__name__}: {e}"))
+    return pages, errors
+
+def _extract_task(task: ExtractTask) -> Tuple[List[str], List[PageError]]:
+    path, start, stop = task
+    if start is None:
+        return [_read_text(Path(path))], []
+    return _read_pdf(path, start, stop)
+
+def _tasks(path: Path, pages_per_task: int = PDF_PAGES_PER_TASK) -> List[ExtractTask]:
+    """Split a file into extraction tasks: one per text file, one per page range of a PDF."""
+    if path.suffix.lower() != ".pdf":
+        return [(str(path), None, None)]
+    try:
+        n = len(PdfReader(str(path)).pages)
+    except Exception:
+        n = 0
+    if n <= pages_per_task:
+        return [(str(path), 0, None)]
+    return [(str(path), i, i + pages_per_task) for i in range(0, n, pages_per_task)]
+
+def _collect(path: Path, results: Iterable[Tuple[List[str], List[PageError]]],
+             stats: Optional[IngestStats] = None) -> List[str]:
+    pages = []
+    for chunk_pages, errors in results:
+        pages.extend(chunk_pages)
+        for page, msg in errors:
+            where = f"page {page}" if page is not None else "file"
+            print(f"warning: {path}: {where}: {msg}", file=sys.stderr)
+        if stats is not None:
+            stats.add("failures", len(errors))
+    if stats is not None:
+        stats.add("pages", len(pages))
+    return pages
+
+def _discover(root: Path) -> List[Path]:
+    return sorted(p for p in root.rglob("*") if p.is_file() and p.suffix.lower() in SUFFIXES)
+
+def _chunker_signature(name: str, dedup: bool = False) -> str:
+    # Turning dedup on or off changes which chunks are stored, so it re-ingests everything too.
+    suffix = f":m{METADATA_VERSION}" + (f":dedup{DEDUP_THRESHOLD:g}" if dedup else "")
+    if name == "char":
+        return f"char:{CHUNK_SIZE}:{CHUNK_OVERLAP}{suffix}"
+    return f"{name}:{CHUNK_TOKENS}{suffix}"
+
+def _doc_set(path: Path, root: Optional[Path]) -> str:
+    """The top-level folder under the data root a file lives in, or DEFAULT_DOC_SET for files at the root."""
+    try:
+        parts = path.relative_to(root).parts if root is not None else ()
+    except ValueError:
+        parts = ()
+    return parts[0] if len(parts) > 1 else DEFAULT_DOC_SET
+
+def _make_chunker(name: str, embedder=None) -> Chunker:
+    tokenizer = getattr(embedder, "tokenizer", None)
+    count = tokenizer_counter(tokenizer) if tokenizer is not None else None
+    return get_chunker(name, CHUNK_SIZE, CHUNK_OVERLAP, CHUNK_TOKENS, count)
+
+def _sha1(s: str) -> str:
+    return hashlib.sha1(s.encode("utf-8", errors="ignore")).hexdigest()
+
+def _chunk_id(source: str, position: int, text: str) -> str:
+    # Stable across runs: the same chunk of the same file always gets the same id,
+    # and an edited chunk gets a new one.
+    return f"{_sha1(source)[:12]}-{position:05d}-{_sha1(text)[:8]}"
+
+def _file_hash(path: Path) -> str:
+    h = hashlib.sha256()
+    with path.open("rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+def _manifest_path(collection: str) -> Path:
+    return Path(CHROMA_DIR) / f"manifest-{collection}.json"
+
+def _report_path(collection: str) -> Path:
+    return Path(CHROMA_DIR) / f"ingest-report-{collection}.json"
+
+def _load_manifest(path: Path) -> Dict[str, Dict]:
+    if not path.exists():
+        return {}
+    return json.loads(path.read_text(encoding="utf-8")).get("files", {})
+
+def _save_manifest(path: Path, files: Dict[str, Dict]) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps({"version": 1, "files": files}, indent=1, sort_keys=True), encoding="utf-8")
+    os.replace(tmp, path)
+
+def _plan(files: List[Path], manifest: Dict[str, Dict], full: bool = False, chunker: str = "",
+          root: Optional[Path] = None, doc_set: Optional[str] = None) -> Tuple[List[Tuple[Path, Dict]], List[str]]:
+    """Split `files` into (changed files with their new manifest entries, removed sources).
+
+    Files chunked with a different chunker configuration, moved to another
+    document set, or marked stale (see _drop_source) count as changed. The set is `doc_set` or, without it, the
+    file's top-level folder under `root`.
+    """
+    changed = []
+    for p in files:
+        st = p.stat()
+        entry = {"size": st.st_size, "mtime": st.st_mtime_ns, "chunker": chunker,
+                 "doc_set": doc_set or _doc_set(p, root)}
+        old = manifest.get(str(p))
+        if old and (old.get("chunker", "") != chunker or old.get("doc_set", DEFAULT_DOC_SET) != entry["doc_set"]
+                    or old.get("stale")):
+            old = None
+        if not full and old and old.get("size") == entry["size"] and old.get("mtime") == entry["mtime"]:
+            continue
+        entry["sha256"] = _file_hash(p)
+        if not full and old and old.get("sha256") == entry["sha256"]:
+            old.update(entry)
+            continue
+        changed.append((p, entry))
+    present = {str(p) for p in files}
+    removed = sorted(s for s in manifest if s not in present)
+    return changed, removed
+
+def _extract(changed: Iterable[Tuple[Path, Dict]], workers: int = 1,
+             stats: Optional[IngestStats] = None) -> Iterator[Tuple[Path, Dict, List[str]]]:
+    """Yield (path, entry, pages) in input order, extracting on a process pool when workers > 1.
+
+    A text file is a single page. The entry gains the document's title and date.
+
+    At most about 2 * workers tasks are in flight ahead of the consumer, so a
+    slow embed stage holds extraction back instead of buffering the corpus.
+    """
+    def collect(path, entry, results):
+        with stats.stage("extract") if stats is not None else nullcontext():
+            pages = _collect(path, results, stats)
+            entry.update(describe(path, pages))
+        if stats is not None:
+            stats.add("files")
+            stats.add("bytes", entry.get("size", 0))
+        return path, entry, pages
+
+    if workers <= 1:
+        for path, entry in changed:
+            yield collect(path, entry, map(_extract_task, _tasks(path)))
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        window, inflight = deque(), 0
+        for path, entry in changed:
+            futures = [pool.submit(_extract_task, t) for t in _tasks(path)]
+            window.append((path, entry, futures))
+            inflight += len(futures)
+            while window and inflight >= 2 * workers:
+                p, e, fs = window.popleft()
+                inflight -= len(fs)
+                yield collect(p, e, (f.result() for f in fs))
+        while window:
+            p, e, fs = window.popleft()
+            yield collect(p, e, (f.result() for f in fs))
+
+def _chunk_meta(path: Path, entry: Dict, page: Optional[int], start: int, end: int) -> Dict:
+    # start/end are character offsets within the page text, used to stitch
+    # neighbouring chunks back together when the prompt is assembled.
+    meta = {"source": str(path), "doc_set": entry.get("doc_set", DEFAULT_DOC_SET), "start": start, "end": end}
+    # Chroma rejects None values, so unknown fields are left out.
+    for key, value in (("title", entry.get("title")), ("date", entry.get("date")), ("page", page)):
+        if value is not None:
+            meta[key] = value
+    return meta
+
+def _records(docs: Iterable[Tuple[Path, Dict, List[str]]], chunker: Chunker,
+             stats: Optional[IngestStats] = None) -> Iterator[tuple]:
+    """Yield ("chunk", id, text, meta) per chunk and ("done", path, entry) after each file's last chunk.
+
+    Each PDF page is chunked on its own, so every chunk cites exactly one page.
+    """
+    for path, entry, pages in docs:
+        source = str(path)
+        paged = path.suffix.lower() == ".pdf"
+        with stats.stage("chunk") if stats is not None else nullcontext():
+            spans = [(n, text, start, end) for n, text in enumerate(pages, 1) for start, end in chunker(text)]
+        for i, (n, text, start, end) in enumerate(spans):
+            c = text[start:end]
+            yield "chunk", _chunk_id(source, i, c), c, _chunk_meta(path, entry, n if paged else None, start, end)
+        entry["chunks"] = len(spans)
+        if stats is not None:
+            stats.add("chunks", len(spans))
+        yield "done", path, entry
+
+def _dedup(records: Iterable[tuple], dedup: DedupIndex, touched: Set[str], stats: IngestStats) -> Iterator[tuple]:
+    """Drop chunks that nearly duplicate a stored (or earlier) chunk before they are embedded.
 
-def main():
-    parser = argparse.ArgumentParser(description="Ingest .txt/.md/.pdf into Chroma")
+    A dropped chunk is recorded as a copy of its survivor, whose id goes into
+    `touched` so that its `sources` list is rewritten once it is stored.
+    """
+    dropped = 0
+    for rec in records:
+        if rec[0] == "done":
+            rec[2]["duplicates"] = dropped
+            dropped = 0
+            yield rec
+            continue
+        _, cid, text, meta = rec
+        with stats.stage("dedup"):
+            sig = minhash(text)
+            hit = dedup.match(sig)
+            if hit is None:
+                dedup.add(cid, meta["source"], sig)
+                meta["sources"] = meta["source"]
+            else:
+                dedup.add_copy(meta["source"], hit, meta)
+                touched.add(hit)
+        if hit is None:
+            yield rec
+        else:
+            dropped += 1
+            stats.add("duplicates")
+
+def _refresh_sources(store: VectorStore, dedup: DedupIndex, touched: Set[str]) -> None:
+    """Rewrite the `sources` of the survivors in `touched`; ids not stored yet stay pending.
+
+    `sources` is a newline-joined string rather than a list, which older Chroma
+    releases reject as a metadata value.
+    """
+    rows = store.get(sorted(touched), embeddings=True)
+    if rows:
+        ids = list(rows)
+        metas = [{**rows[i][1], "sources": "\n".join(dedup.sources(i))} for i in ids]
+        store.upsert(ids, np.stack([rows[i][2] for i in ids]), [rows[i][0] for i in ids], metas)
+    touched.difference_update(rows)
+
+def _drop_source(store: VectorStore, source: str, lexical: Optional[LexicalIndex] = None,
+                 dedup: Optional[DedupIndex] = None, touched: Optional[Set[str]] = None,
+                 manifest: Optional[Dict[str, Dict]] = None) -> None:
+    """Delete a source's chunks.
+
+    Other sources that held a near-duplicate of one of them only stored a copy
+    record, not their own text; they are marked stale in `manifest` so they
+    are re-ingested instead of inheriting text they may not contain.
+    """
+    if dedup is not None:
+        heirs, lost = dedup.drop_source(source)
+        if manifest is not None:
+            for heir in heirs:
+                if heir != source and heir in manifest:
+                    manifest[heir]["stale"] = True
+        if touched is not None:
+            touched.update(lost)
+    store.delete_by_source(source)
+    if lexical is not None:
+        lexical.delete_source(source)
+
+def _batches(records: Iterable[tuple], size: int) -> Iterator[Tuple[List[tuple], List[Tuple[Path, Dict]]]]:
+    """Group chunk records into batches of `size`; each batch carries the files it completes.
+
+    A full batch is only emitted when the next chunk arrives, so a file that ends
+    exactly on a batch boundary is committed with that batch.
+    """
+    chunks, done = [], []
+    for rec in records:
+        if rec[0] == "done":
+            done.append(rec[1:])
+            continue
+        if len(chunks) >= size:
+            yield chunks, done
+            chunks, done = [], []
+        chunks.append(rec[1:])
+    if chunks or done:
+        yield chunks, done
+
+def ingest_files(store: VectorStore, changed: List[Tuple[Path, Dict]], manifest: Dict[str, Dict], manifest_path: Path,
+                 embed_batch: int = INGEST_EMBED_BATCH, upsert_batch: int = INGEST_UPSERT_BATCH,
+                 workers: int = INGEST_WORKERS, chunker: str = CHUNKER, lexical: Optional[LexicalIndex] = None,
+                 stats: Optional[IngestStats] = None, dedup: Optional[DedupIndex] = None,
+                 flush_chunks: int = INGEST_FLUSH_CHUNKS, flush_seconds: float = INGEST_FLUSH_SECONDS) -> int:
+    """Stream `changed` files through extract -> chunk -> dedup -> embed -> upsert, committing as it goes.
+
+    Generators pull one file at a time, so memory is bounded by one document plus
+    one upsert batch. The store is flushed every `flush_chunks` chunks or
+    `flush_seconds` seconds, at the end, and when the run fails; only then are
+    the files whose chunks it covers written to the manifest, so an interrupted
+    run resumes where it stopped.
+    """
+    stats = stats or IngestStats(store.name)
+    touched: Set[str] = set()
+
+    def _replace(docs):
+        for path, entry, pages in docs:
+            with stats.stage("delete"):
+                _drop_source(store, str(path), lexical, dedup, touched, manifest)
+            yield path, entry, pages
+
+    chunk_fn: Optional[Chunker] = None
+
+    def _chunk(text: str):
+        # Built on the first document: the sentence chunker counts tokens with
+        # the embedder's tokenizer, and a run with nothing to ingest should not
+        # pay for loading the model.
+        nonlocal chunk_fn
+        if chunk_fn is None:
+            chunk_fn = _make_chunker(chunker, get_embedder() if chunker == "sentence" else None)
+        return chunk_fn(text)
+
+    total = 0
+    pending: List[Tuple[Path, Dict]] = []
+    unflushed, last_flush = 0, time.monotonic()
+
+    def _flush():
+        nonlocal unflushed, last_flush
+        with stats.stage("upsert"):
+            if dedup is not None:
+                if touched:
+                    _refresh_sources(store, dedup, touched)
+                dedup.commit()
+            store.flush()
+        with stats.stage("manifest"):
+            for path, entry in pending:
+                manifest[str(path)] = entry
+            _save_manifest(manifest_path, manifest)
+        pending.clear()
+        unflushed, last_flush = 0, time.monotonic()
+
+    records = _records(_replace(_extract(changed, workers, stats)), _chunk, stats)
+    if dedup is not None:
+        records = _dedup(records, dedup, touched, stats)
+    try:
+        for chunks, done in _batches(records, upsert_batch):
+            if chunks:
+                ids, texts, metas = (list(x) for x in zip(*chunks))
+                with stats.stage("embed"):
+                    embs = get_embedder().encode(texts, batch_size=embed_batch, convert_to_numpy=True)
+                stats.add("embeddings", len(texts))
+                with stats.stage("upsert"):
+                    store.upsert(ids, embs, texts, metas)
+                    if lexical is not None:
+                        lexical.upsert(ids, texts, [m["source"] for m in metas])
+                stats.add("upsert_batches")
+                total += len(chunks)
+                unflushed += len(chunks)
+            pending.extend(done)
+            if unflushed >= flush_chunks or time.monotonic() - last_flush >= flush_seconds:
+                _flush()
+            stats.progress()
+    finally:
+        # Also on failure: every batch before the failing one is fully stored.
+        _flush()
+    return total
+
+def export_quantized(store: VectorStore, path: str, mode: str, page: int = 4096) -> int:
+    """Rebuild the quantized search index (codes, float32 rescoring vectors, chunk text) from `store`."""
+    ids, blocks, docs, metas = [], [], [], []
+    for page_ids, embs in store.scan(page):
+        rows = store.get(page_ids)
+        ids.extend(page_ids)
+        blocks.append(embs)
+        docs.extend(rows[i][0] for i in page_ids)
+        metas.extend(rows[i][1] for i in page_ids)
+    embs = np.concatenate(blocks) if blocks else np.zeros((0, 0), dtype=np.float32)
+    QuantizedIndex.build(path, ids, embs, mode, docs, metas)
+    return len(ids)
+
+def export_flat(store: VectorStore, path: str, page: int = 4096) -> int:
+    """Rebuild the memory-mapped flat index (embeddings, ids, chunk text) from `store`."""
+    ids, blocks, docs, metas = [], [], [], []
+    for page_ids, embs in store.scan(page):
+        rows = store.get(page_ids)
+        ids.extend(page_ids)
+        blocks.append(embs)
+        docs.extend(rows[i][0] for i in page_ids)
+        metas.extend(rows[i][1] for i in page_ids)
+    embs = np.concatenate(blocks) if blocks else np.zeros((0, 0), dtype=np.float32)
+    FlatIndex.build(path, ids, embs, docs, metas)
+    return len(ids)
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Ingest .txt/.md/.pdf into the vector store")
     parser.add_argument("--data", default="./data", help="Folder containing documents")
-    parser.add_argument("--collection", default="docs", help="Chroma collection name")
-    args = parser.parse_args()
+    parser.add_argument("--collection", default=COLLECTION, type=check_collection_name, help="Collection name")
+    parser.add_argument("--full", action="store_true", help="Ignore the manifest and re-ingest every file")
+    parser.add_argument("--embed-batch", type=int, default=INGEST_EMBED_BATCH, help="Chunks per encode() batch")
+    parser.add_argument("--upsert-batch", type=int, default=INGEST_UPSERT_BATCH, help="Chunks per vector store upsert")
+    parser.add_argument("--flush-chunks", type=int, default=INGEST_FLUSH_CHUNKS,
+                        help="Persist the store and manifest after this many chunks")
+    parser.add_argument("--flush-seconds", type=float, default=INGEST_FLUSH_SECONDS,
+                        help="... or after this many seconds, whichever comes first")
+    parser.add_argument("--workers", type=int, default=INGEST_WORKERS, help="Processes for text/PDF extraction")
+    parser.add_argument("--chunker", default=CHUNKER, choices=CHUNKERS, help="Chunking strategy")
+    parser.add_argument("--dedup", action=argparse.BooleanOptionalAction, default=DEDUP,
+                        help="Skip chunks that nearly duplicate an already stored chunk")
+    parser.add_argument("--doc-set", help="Document set for every file (default: top-level folder under --data)")
+    parser.add_argument("--flat", action=argparse.BooleanOptionalAction, default=FLAT_INDEX,
+                        help="Also export a memory-mapped flat index for exact search")
+    parser.add_argument("--quantize", default=QUANTIZE, choices=MODES, help="Also build a float16/int8 search index")
+    parser.add_argument("--watch", action="store_true", help="Keep running and ingest files as they change")
+    parser.add_argument("--debounce-ms", type=int, default=WATCH_DEBOUNCE_MS,
+                        help="With --watch, wait for this much quiet before ingesting a batch of changes")
+    parser.add_argument("--poll", action="store_true", help="With --watch, poll instead of using OS file events")
+    args = parser.parse_args(argv)
 
     data_dir = Path(args.data)
     data_dir.mkdir(parents=True, exist_ok=True)
+    ingest_once(args)
+    if args.watch:
+        watch(args)
+
+def watch(args, stop=None) -> None:
+    """Ingest every debounced batch of changes under --data until interrupted (or `stop` is set).
+
+    The embedder, vector store and lexical index stay loaded between batches,
+    and a batch only plans the paths it contains, so a new file is searchable
+    a few seconds after it lands. A failed batch is reported and skipped.
+    """
+    from app.watch import changes
+
+    data_dir = Path(args.data)
+    print(f"Watching {data_dir.resolve()} (Ctrl+C to stop)", flush=True)
+    try:
+        for paths in changes(data_dir, args.debounce_ms, WATCH_POLL_INTERVAL, args.poll, stop):
+            try:
+                ingest_once(args, paths)
+            except Exception as e:
+                print(f"warning: ingest failed, will retry on the next change: {type(e).__name__}: {e}",
+                      file=sys.stderr)
+    except KeyboardInterrupt:
+        pass
+
+def _local(data_dir: Path, path: Path) -> Path:
+    """Map an absolute event path back to the data_dir-relative form used as the manifest key."""
+    try:
+        return data_dir / Path(path).resolve().relative_to(data_dir.resolve())
+    except ValueError:
+        return Path(path)
+
+def _watch_plan(data_dir: Path, paths: Iterable[Path], manifest: Dict[str, Dict]) -> Tuple[List[Path], List[str]]:
+    """(files to check, manifest sources that are gone) for a batch of changed paths.
 
-    docs = _load_docs(data_dir)
-    if not docs:
+    A changed directory stands for every file under it, which covers folders
+    that are moved in or out of the data directory in one step.
+    """
+    files, gone = set(), set()
+    for p in (_local(data_dir, p) for p in paths):
+        if p.is_dir():
+            files.update(_discover(p))
+        elif p.is_file():
+            if p.suffix.lower() in SUFFIXES:
+                files.add(p)
+        else:
+            prefix = str(p) + os.sep
+            gone.update(s for s in manifest if s == str(p) or s.startswith(prefix))
+    return sorted(files), sorted(gone)
+
+def ingest_once(args, paths: Optional[Iterable[Path]] = None) -> None:
+    """One ingest run over the whole data directory, or over `paths` only (watch mode)."""
+    data_dir = Path(args.data)
+    stats = IngestStats(args.collection, settings={k: v for k, v in vars(args).items() if k != "data"})
+    with stats.stage("plan"):
+        manifest_path = _manifest_path(args.collection)
+        manifest = _load_manifest(manifest_path)
+        signature = _chunker_signature(args.chunker, args.dedup)
+        if paths is None:
+            files = _discover(data_dir)
+            changed, removed = _plan(files, manifest, full=args.full, chunker=signature,
+                                     root=data_dir, doc_set=args.doc_set)
+        else:
+            files, removed = _watch_plan(data_dir, paths, manifest)
+            changed, _ = _plan(files, {s: manifest[s] for s in map(str, files) if s in manifest},
+                               chunker=signature, root=data_dir, doc_set=args.doc_set)
+    if paths is None and not files and not removed:
         print("No documents found in", data_dir.resolve())
         return
+    if paths is not None and not changed and not removed:
+        return
+    stats.add("files_total", len(changed))
+    stats.add("files_removed", len(removed))
+
+    try:
+        _run(args, stats, changed, removed, manifest, manifest_path)
+    except BaseException as e:
+        stats.finish()
+        stats.write(str(_report_path(args.collection)), "failed", f"{type(e).__name__}: {e}")
+        raise
+    stats.finish()
+    report = stats.write(str(_report_path(args.collection)))
+    print(
+        "Stages (s):", " ".join(f"{k}={v}" for k, v in report["stages"].items() if v),
+        "| Embeddings/s:", report["rates"]["embeddings_per_second"], "| Failures:", report["counts"]["failures"],
+        "| Duplicate chunks skipped:", report["counts"]["duplicates"],
+    )
 
-    embedder = SentenceTransformer(EMBED_MODEL)
-    client = chromadb.PersistentClient(path=CHROMA_DIR, settings=Settings(anonymized_telemetry=False))
-    col = client.get_or_create_collection(args.collection)
-
-    ids, texts, metas = [], [], []
-    idx = 0
-    for path, content in docs:
-        for c in _chunk(content, CHUNK_SIZE, CHUNK_OVERLAP):
-            ids.append(f"doc-{idx}")
-            texts.append(c)
-            metas.append({"source": path})
-            idx += 1
-
-    embs = embedder.encode(texts, convert_to_numpy=True).tolist()
-    col.upsert(ids=ids, embeddings=embs, documents=texts, metadatas=metas)
-    print("Ingested chunks:", len(texts), "| Collection size:", col.count())
+def _drop_exports(collection: str) -> None:
+    """Delete the flat and quantized exports of `collection`; queries fall back to the store until they are rebuilt."""
+    for path in (flat_path(collection), quantized_path(collection)):
+        if os.path.exists(path):
+            # meta.json first: readers treat an export without it as missing.
+            with suppress(FileNotFoundError):
+                os.remove(os.path.join(path, "meta.json"))
+            shutil.rmtree(path, ignore_errors=True)
+        forget_flat(path)
+        forget_index(path)
+
+def _run(args, stats: IngestStats, changed: List[Tuple[Path, Dict]], removed: List[str],
+         manifest: Dict[str, Dict], manifest_path: Path) -> None:
+    if changed or removed:
+        # The exports are snapshots of the store; drop them before it changes so
+        # a run without --flat/--quantize (or one that fails) never leaves a
+        # stale copy that keeps serving deleted or replaced chunks.
+        _drop_exports(args.collection)
+    store = get_store(args.collection)
+    lexical = get_lexical(args.collection) if LEXICAL_INDEX else None
+    dedup = DedupIndex(dedup_path(args.collection), DEDUP_THRESHOLD)
+    if not args.dedup:
+        # A run without dedup re-ingests everything, so the signatures would only go stale.
+        if os.path.exists(dedup.path):
+            dedup.clear()
+        dedup = None
+    touched: Set[str] = set()
+    with stats.stage("delete"):
+        for source in removed:
+            _drop_source(store, source, lexical, dedup, touched, manifest)
+            manifest.pop(source, None)
+        if dedup is not None:
+            if touched:
+                _refresh_sources(store, dedup, touched)
+            dedup.commit()
+        store.flush()
+    with stats.stage("manifest"):
+        _save_manifest(manifest_path, manifest)
+
+    total = ingest_files(
+        store, changed, manifest, manifest_path, args.embed_batch, args.upsert_batch, args.workers,
+        args.chunker, lexical, stats, dedup, args.flush_chunks, args.flush_seconds,
+    )
+    signature = _chunker_signature(args.chunker, args.dedup)
+    for _ in range(3):
+        # Files whose near-duplicates were deleted above; anything still stale
+        # after a few passes is picked up by the next run.
+        stale = [Path(s) for s, e in manifest.items() if e.get("stale") and Path(s).is_file()]
+        if not stale:
+            break
+        again, _ = _plan(stale, manifest, chunker=signature, root=Path(args.data), doc_set=args.doc_set)
+        total += ingest_files(
+            store, again, manifest, manifest_path, args.embed_batch, args.upsert_batch, args.workers,
+            args.chunker, lexical, stats, dedup, args.flush_chunks, args.flush_seconds,
+        )
+    stats.finish()
+    print(
+        "Changed files:", len(changed), "| Removed files:", len(removed),
+        "| Ingested chunks:", total, "| Collection size:", store.count(),
+    )
+    with stats.stage("export"):
+        if args.quantize != "none" and get_quantized(args.collection) is None:
+            n = export_quantized(store, quantized_path(args.collection), args.quantize)
+            print(f"Quantized index ({args.quantize}):", n, "vectors")
+        if args.flat and get_flat(args.collection) is None:
+            n = export_flat(store, flat_path(args.collection))
+            print("Flat index:", n, "vectors")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,110 @@
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, Optional, TextIO
+
+STAGES = ("plan", "delete", "extract", "chunk", "dedup", "embed", "upsert", "manifest", "export")
+
+class IngestStats:
+    """Per-stage wall time and counters for one ingest run, with a live progress line.
+
+    Stages are timed in the consuming thread. With a worker pool, "extract"
+    is the time spent waiting for extracted text, so the stage times add up to
+    (roughly) the run's wall time and the largest one is the bottleneck.
+    """
+
+    def __init__(self, collection: str, settings: Optional[Dict[str, Any]] = None,
+                 stream: Optional[TextIO] = None, interval: float = 0.5, clock=time.perf_counter):
+        self.collection = collection
+        self.settings = settings or {}
+        self.stream = stream if stream is not None else sys.stderr
+        self.live = bool(getattr(self.stream, "isatty", lambda: False)())
+        self.interval = interval
+        self._clock = clock
+        self._lock = threading.Lock()
+        self.started_at = datetime.now(timezone.utc).isoformat(timespec="seconds")
+        self.t0 = clock()
+        self.seconds: Dict[str, float] = {s: 0.0 for s in STAGES}
+        self.counts: Dict[str, int] = {
+            "files_total": 0, "files": 0, "files_removed": 0, "pages": 0, "bytes": 0, "chunks": 0,
+            "duplicates": 0, "embeddings": 0, "upsert_batches": 0, "failures": 0,
+        }
+        self._last_print = 0.0
+        self._finished = False
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        t0 = self._clock()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.seconds[name] = self.seconds.get(name, 0.0) + self._clock() - t0
+
+    def add(self, name: str, n: int = 1) -> None:
+        with self._lock:
+            self.counts[name] = self.counts.get(name, 0) + n
+
+    def rates(self) -> Dict[str, Optional[float]]:
+        elapsed = self._clock() - self.t0
+        embed = self.seconds["embed"]
+        return {
+            "embeddings_per_second": round(self.counts["embeddings"] / embed, 1) if embed else None,
+            "files_per_second": round(self.counts["files"] / elapsed, 2) if elapsed else None,
+            "mb_per_second": round(self.counts["bytes"] / 1e6 / elapsed, 3) if elapsed else None,
+        }
+
+    def line(self) -> str:
+        c = self.counts
+        eps = self.rates()["embeddings_per_second"]
+        slowest = max(self.seconds, key=self.seconds.get)
+        return (
+            f"[ingest] files {c['files']}/{c['files_total']} | pages {c['pages']} | chunks {c['chunks']} | "
+            f"duplicates {c['duplicates']} | "
+            f"{eps or 0:.0f} emb/s | failures {c['failures']} | "
+            f"{self._clock() - self.t0:.1f}s ({slowest} {self.seconds[slowest]:.1f}s)"
+        )
+
+    def progress(self, force: bool = False) -> None:
+        """Redraw the progress line at most every `interval` seconds (only on a terminal)."""
+        if not self.live or self._finished:
+            return
+        now = self._clock()
+        if force or now - self._last_print >= self.interval:
+            self._last_print = now
+            self.stream.write("\r" + self.line() + "\x1b[K")
+            self.stream.flush()
+
+    def finish(self) -> None:
+        """End the progress line so that regular output starts on a fresh line."""
+        if self.live and not self._finished:
+            self.progress(force=True)
+            self.stream.write("\n")
+            self.stream.flush()
+        self._finished = True
+
+    def report(self, status: str = "ok", error: Optional[str] = None) -> Dict[str, Any]:
+        return {
+            "collection": self.collection,
+            "started_at": self.started_at,
+            "status": status,
+            "error": error,
+            "seconds": round(self._clock() - self.t0, 3),
+            "stages": {k: round(v, 3) for k, v in self.seconds.items()},
+            "counts": dict(self.counts),
+            "rates": self.rates(),
+            "settings": self.settings,
+        }
+
+    def write(self, path: str, status: str = "ok", error: Optional[str] = None) -> Dict[str, Any]:
+        report = self.report(status, error)
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        os.replace(tmp, path)
+        return report
@@ -0,0 +1,103 @@
+import os
+import re
+import sqlite3
+import threading
+from typing import Dict, List, Optional, Sequence, Tuple
+
+_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS chunks USING fts5(
+    id UNINDEXED, source UNINDEXED, text, tokenize = 'unicode61 remove_diacritics 2'
+);
+CREATE TABLE IF NOT EXISTS chunk_rows (id TEXT PRIMARY KEY, source TEXT NOT NULL, row INTEGER NOT NULL);
+CREATE INDEX IF NOT EXISTS chunk_rows_source ON chunk_rows (source);
+"""
+# Query terms: runs of word characters, keeping inner dots, dashes and slashes so
+# identifiers like "101.9", "FNS-2022-0007" or "7/20" survive as one phrase.
+_TERM = re.compile(r"\w+(?:[./§-]\w+)*")
+
+def match_expression(q: str) -> str:
+    """Turn free text into an FTS5 query that ORs every term.
+
+    Each term is quoted, so FTS5 treats it as a phrase of its own tokens: an
+    identifier such as 101.9 must appear as the adjacent tokens "101 9".
+    """
+    terms = dict.fromkeys(t.lower() for t in _TERM.findall(q))
+    return " OR ".join('"' + t.replace('"', '""') + '"' for t in terms)
+
+class LexicalIndex:
+    """BM25 keyword index over chunks, kept in an SQLite FTS5 table on disk.
+
+    FTS5 stores an inverted index (term -> postings) that is updated in place,
+    and the file is memory-mapped on read so worker processes share its pages.
+    UNINDEXED FTS5 columns can only be scanned, so chunk_rows maps each chunk
+    id (and source) to its FTS rowid, and replaces and deletes go by rowid.
+    """
+
+    def __init__(self, path: str, mmap_bytes: int = 256 << 20):
+        self.path = path
+        self.mmap_bytes = mmap_bytes
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            d = os.path.dirname(self.path)
+            if d:
+                os.makedirs(d, exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute(f"PRAGMA mmap_size = {int(self.mmap_bytes)}")
+            had_rows = conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'chunk_rows'").fetchone()
+            conn.executescript(_SCHEMA)
+            if not had_rows:
+                # Index written before chunk_rows existed: map its rows once.
+                conn.execute("INSERT OR REPLACE INTO chunk_rows (id, source, row) SELECT id, source, rowid FROM chunks")
+                conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def upsert(self, ids: Sequence[str], texts: Sequence[str], sources: Sequence[str]) -> None:
+        with self._lock:
+            db = self._db()
+            for cid, source, text in zip(ids, sources, texts):
+                old = db.execute("SELECT row FROM chunk_rows WHERE id = ?", (cid,)).fetchone()
+                if old is not None:
+                    db.execute("DELETE FROM chunks WHERE rowid = ?", old)
+                row = db.execute("INSERT INTO chunks (id, source, text) VALUES (?, ?, ?)", (cid, source, text)).lastrowid
+                db.execute("INSERT OR REPLACE INTO chunk_rows (id, source, row) VALUES (?, ?, ?)", (cid, source, row))
+            db.commit()
+
+    def delete_source(self, source: str) -> None:
+        with self._lock:
+            db = self._db()
+            db.execute("DELETE FROM chunks WHERE rowid IN (SELECT row FROM chunk_rows WHERE source = ?)", (source,))
+            db.execute("DELETE FROM chunk_rows WHERE source = ?", (source,))
+            db.commit()
+
+    def search(self, q: str, k: int) -> List[Tuple[str, float]]:
+        """Return up to k (chunk id, bm25 score) pairs, best first; higher scores are better."""
+        expr = match_expression(q)
+        if not expr or k <= 0:
+            return []
+        with self._lock:
+            rows = self._db().execute(
+                "SELECT id, bm25(chunks) AS s FROM chunks WHERE chunks MATCH ? ORDER BY s LIMIT ?", (expr, k)
+            ).fetchall()
+        return [(i, -s) for i, s in rows]
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def count(self) -> int:
+        with self._lock:
+            return self._db().execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[str]], k: int = 60) -> Dict[str, float]:
+    """Fuse ranked id lists: each list adds 1 / (k + rank) for every id it contains."""
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, 1):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (k + rank)
+    return scores
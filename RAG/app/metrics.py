@@ -0,0 +1,162 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+# Latency buckets in seconds, from sub-millisecond cache hits to slow LLM calls.
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+Labels = Tuple[str, ...]
+
+def _escape(v: str) -> str:
+    return v.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(str(v))}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+def _num(v: float) -> str:
+    if v == float("inf"):
+        return "+Inf"
+    return repr(float(v)) if not float(v).is_integer() else str(int(v))
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._fn: Optional[Callable[[], Dict[Labels, float]]] = None
+
+    def _key(self, labels: Dict[str, str]) -> Labels:
+        return tuple(str(labels[n]) for n in self.labelnames)
+
+    def set_function(self, fn: Callable[[], Dict[Labels, float]]) -> None:
+        """Compute the values at scrape time instead, as {label values: value}."""
+        self._fn = fn
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        head = f"# HELP {self.name} {self.help}\n# TYPE {self.name} {self.kind}\n"
+        return head + "".join(line + "\n" for line in self.samples())
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, help, labelnames)
+        self._values: Dict[Labels, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: str) -> float:
+        values = self._fn() if self._fn is not None else self._values
+        return values.get(self._key(labels), 0.0)
+
+    def samples(self) -> List[str]:
+        if self._fn is not None:
+            values = self._fn()
+        else:
+            with self._lock:
+                values = dict(self._values)
+        return [f"{self.name}{_labels(self.labelnames, k)} {_num(v)}" for k, v in sorted(values.items())]
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value: float, **labels: str) -> None:
+        with self._lock:
+            self._values[self._key(labels)] = float(value)
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> (per-bucket counts incl. +Inf, sum)
+        self._values: Dict[Labels, Tuple[List[int], float]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._values.get(key) or ([0] * (len(self.buckets) + 1), 0.0)
+            counts[bisect.bisect_left(self.buckets, value)] += 1
+            self._values[key] = (counts, total + value)
+
+    @contextmanager
+    def time(self, **labels: str) -> Iterator[None]:
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - t0, **labels)
+
+    def count(self, **labels: str) -> int:
+        with self._lock:
+            hit = self._values.get(self._key(labels))
+            return sum(hit[0]) if hit else 0
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            values = {k: (list(c), s) for k, (c, s) in self._values.items()}
+        lines = []
+        for key, (counts, total) in sorted(values.items()):
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float("inf"),), counts):
+                cumulative += n
+                le = 'le="' + _num(bound) + '"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {_num(total)}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {cumulative}")
+        return lines
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        """Every metric in the Prometheus text exposition format (version 0.0.4)."""
+        out = []
+        for m in self._metrics.values():
+            try:
+                out.append(m.render())
+            except Exception:
+                # A failing scrape-time callback (e.g. the store is not open yet)
+                # must not take the whole endpoint down.
+                continue
+        return "".join(out)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+registry = Registry()
+
+REQUESTS = registry.register(Counter("rag_requests_total", "HTTP requests by path and status.", ("path", "status")))
+ERRORS = registry.register(Counter("rag_errors_total", "Failed requests or streams by path.", ("path",)))
+REQUEST_SECONDS = registry.register(Histogram("rag_request_seconds", "HTTP request latency.", ("path",)))
+EMBED_SECONDS = registry.register(Histogram("rag_embed_seconds", "Query embedding latency, cache misses included."))
+SEARCH_SECONDS = registry.register(Histogram("rag_search_seconds", "Retrieval latency after embedding.", ("index",)))
+RERANK_SECONDS = registry.register(Histogram("rag_rerank_seconds", "Cross-encoder rerank latency."))
+GENERATION_SECONDS = registry.register(
+    Histogram("rag_generation_seconds", "Answer generation latency.", ("mode",))
+)
+TOKENS = registry.register(Counter("rag_llm_tokens_total", "Tokens reported by the LLM.", ("kind",)))
+CACHE_HITS = registry.register(Counter("rag_cache_hits_total", "Cache hits by cache.", ("cache",)))
+CACHE_MISSES = registry.register(Counter("rag_cache_misses_total", "Cache misses by cache.", ("cache",)))
+COLLECTION_SIZE = registry.register(Gauge("rag_collection_chunks", "Chunks stored per open collection.", ("collection",)))
+MODEL_LOADED = registry.register(Gauge("rag_model_loaded", "1 when the model is loaded in this process.", ("model",)))
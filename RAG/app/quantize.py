@@ -0,0 +1,191 @@
+import json
+import mmap
+import os
+import threading
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.flat import open_records, read_record, write_records
+from app.store import Hit, Records
+
+MODES = ("none", "float16", "int8")
+
+def quantize(embs: np.ndarray, mode: str) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """Return (codes, per-dimension scales); scales is None unless mode is int8."""
+    embs = np.asarray(embs, dtype=np.float32)
+    if mode == "float16":
+        return embs.astype(np.float16), None
+    if mode == "int8":
+        scales = np.abs(embs).max(axis=0) / 127.0 if len(embs) else np.ones(embs.shape[1], np.float32)
+        scales = np.where(scales == 0, 1.0, scales).astype(np.float32)
+        codes = np.clip(np.rint(embs / scales), -127, 127).astype(np.int8)
+        return codes, scales
+    raise ValueError(f"Unknown quantization mode {mode!r}; expected float16 or int8")
+
+def dequantize(codes: np.ndarray, scales: Optional[np.ndarray]) -> np.ndarray:
+    out = codes.astype(np.float32)
+    return out * scales if scales is not None else out
+
+class QuantizedIndex:
+    """Compact brute-force index over quantized embeddings, memory-mapped from disk.
+
+    Scores are squared L2 distances (Chroma's default space) computed from the
+    codes, so only about 1/4 (int8) or 1/2 (float16) of the float32 bytes are
+    touched per query. query() rescores the candidates exactly against a
+    memory-mapped float32 copy (vectors.npy), of which only the candidate rows
+    are read, and returns their documents from chunks.jsonl (the flat index's
+    record format), so the vector store is never opened on this path.
+    """
+
+    BLOCK = 16384
+
+    def __init__(self, path: str):
+        self.path = path
+        self.ids: List[str] = []
+        self.codes: Optional[np.ndarray] = None
+        self.scales: Optional[np.ndarray] = None
+        self.norms: Optional[np.ndarray] = None
+        self.vectors: Optional[np.ndarray] = None
+        self.offsets: Optional[np.ndarray] = None
+        self.meta: Dict = {}
+        self._chunks: Optional[mmap.mmap] = None
+        self._rows: Optional[Dict[str, int]] = None
+
+    @classmethod
+    def build(cls, path: str, ids: Sequence[str], embs: np.ndarray, mode: str,
+              documents: Optional[Sequence[str]] = None,
+              metadatas: Optional[Sequence[Dict[str, Any]]] = None) -> "QuantizedIndex":
+        """Write the index; without documents only coarse search() works (see open_index)."""
+        codes, scales = quantize(embs, mode)
+        os.makedirs(path, exist_ok=True)
+        tmp = path + ".tmp"
+        os.makedirs(tmp, exist_ok=True)
+        np.save(os.path.join(tmp, "codes.npy"), codes)
+        np.save(os.path.join(tmp, "norms.npy"), (dequantize(codes, scales) ** 2).sum(axis=1).astype(np.float32))
+        if scales is not None:
+            np.save(os.path.join(tmp, "scales.npy"), scales)
+        np.save(os.path.join(tmp, "vectors.npy"), np.asarray(embs, dtype=np.float32))
+        if documents is not None:
+            write_records(tmp, documents, metadatas or [{}] * len(documents))
+        with open(os.path.join(tmp, "ids.json"), "w", encoding="utf-8") as f:
+            json.dump(list(ids), f)
+        meta = {"mode": mode, "count": len(ids), "dim": int(codes.shape[1]) if codes.ndim == 2 else 0}
+        with open(os.path.join(tmp, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        # meta.json goes last so a reader never sees it next to half-written arrays.
+        for name in ("codes.npy", "norms.npy", "scales.npy", "vectors.npy", "chunks.jsonl", "offsets.npy",
+                     "ids.json", "meta.json"):
+            src = os.path.join(tmp, name)
+            if os.path.exists(src):
+                os.replace(src, os.path.join(path, name))
+            elif os.path.exists(os.path.join(path, name)):
+                os.remove(os.path.join(path, name))
+        os.rmdir(tmp)
+        return cls(path).load()
+
+    def load(self) -> "QuantizedIndex":
+        with open(os.path.join(self.path, "meta.json"), encoding="utf-8") as f:
+            self.meta = json.load(f)
+        with open(os.path.join(self.path, "ids.json"), encoding="utf-8") as f:
+            self.ids = json.load(f)
+        self.codes = np.load(os.path.join(self.path, "codes.npy"), mmap_mode="r")
+        self.norms = np.load(os.path.join(self.path, "norms.npy"), mmap_mode="r")
+        scales = os.path.join(self.path, "scales.npy")
+        self.scales = np.load(scales) if os.path.exists(scales) else None
+        self.vectors = np.load(os.path.join(self.path, "vectors.npy"), mmap_mode="r")
+        if os.path.exists(os.path.join(self.path, "offsets.npy")):
+            self._chunks, self.offsets = open_records(self.path, len(self.ids))
+        return self
+
+    def nbytes(self) -> int:
+        """Bytes every query scans (codes, norms, scales); see disk_bytes() for the whole export."""
+        return sum(a.nbytes for a in (self.codes, self.norms, self.scales) if a is not None)
+
+    def disk_bytes(self) -> int:
+        """Size of every file of the export, including the float32 rescoring copy and the chunk text."""
+        return sum(os.path.getsize(os.path.join(self.path, f)) for f in os.listdir(self.path))
+
+    def _coarse(self, queries: np.ndarray, n: int) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """(rows, approximate squared L2 distances) of the n nearest codes per query row, best first."""
+        q = np.asarray(queries, dtype=np.float32)
+        qs = q * self.scales if self.scales is not None else q
+        # Decode a block of rows at a time so the float32 working set stays at
+        # BLOCK x dim no matter how large the index is.
+        d = np.empty((len(self.ids), len(q)), dtype=np.float32)
+        for s in range(0, len(self.ids), self.BLOCK):
+            block = np.asarray(self.codes[s:s + self.BLOCK], dtype=np.float32)
+            d[s:s + len(block)] = self.norms[s:s + len(block), None] - 2 * (block @ qs.T)
+        d += (q ** 2).sum(axis=1)[None, :]
+        n = min(n, len(self.ids))
+        out = []
+        for col in d.T:
+            top = np.argpartition(col, n - 1)[:n] if n < len(col) else np.arange(len(col))
+            top = top[np.argsort(col[top])]
+            out.append((top, col[top]))
+        return out
+
+    def search(self, queries: np.ndarray, n: int) -> List[List[Tuple[str, float]]]:
+        """Return the n nearest (id, approximate squared L2 distance) per query row."""
+        if not self.ids or n <= 0:
+            return [[] for _ in range(len(queries))]
+        return [[(self.ids[i], float(d)) for i, d in zip(rows, dists)] for rows, dists in self._coarse(queries, n)]
+
+    def query(self, queries: np.ndarray, n: int, rescore: int = 4) -> List[List[Hit]]:
+        """Coarse top n * rescore from the codes, then the n best by exact float32 distance.
+
+        With rescore <= 1 the coarse hits and their approximate distances are
+        returned as is, and vectors.npy is never read.
+        """
+        if not self.ids or n <= 0:
+            return [[] for _ in range(len(queries))]
+        if rescore <= 1:
+            return [[(self.ids[r], *read_record(self._chunks, self.offsets, r), float(d)) for r, d in zip(rows, dists)]
+                    for rows, dists in self._coarse(queries, n)]
+        out = []
+        for qv, (rows, _) in zip(np.asarray(queries, dtype=np.float32), self._coarse(queries, n * rescore)):
+            # Sorted rows read the memory-mapped vectors front to back.
+            rows = np.sort(rows)
+            exact = ((np.asarray(self.vectors[rows]) - qv) ** 2).sum(axis=1)
+            best = np.argsort(exact, kind="stable")[:n]
+            out.append([(self.ids[rows[i]], *read_record(self._chunks, self.offsets, rows[i]), float(exact[i]))
+                        for i in best])
+        return out
+
+    def get(self, ids: Sequence[str], embeddings: bool = False) -> Records:
+        if self._rows is None:
+            self._rows = {cid: i for i, cid in enumerate(self.ids)}
+        out = {}
+        for cid in ids:
+            row = self._rows.get(cid)
+            if row is not None:
+                emb = np.asarray(self.vectors[row]) if embeddings else None
+                out[cid] = (*read_record(self._chunks, self.offsets, row), emb)
+        return out
+
+_cache: Dict[str, Tuple[float, QuantizedIndex]] = {}
+_cache_lock = threading.Lock()
+
+def forget_index(path: str) -> None:
+    with _cache_lock:
+        _cache.pop(path, None)
+
+def open_index(path: str) -> Optional[QuantizedIndex]:
+    """Load (or reuse) the index at `path`, reloading when ingest has rebuilt it.
+
+    An index without the float32 vectors and chunk records (built by an older
+    version, or without documents) cannot answer queries on its own and is
+    treated as missing, so ingest rebuilds it.
+    """
+    meta = os.path.join(path, "meta.json")
+    try:
+        mtime = os.stat(meta).st_mtime_ns
+    except FileNotFoundError:
+        return None
+    with _cache_lock:
+        hit = _cache.get(path)
+        if hit is None or hit[0] != mtime:
+            if not os.path.exists(os.path.join(path, "offsets.npy")):
+                return None
+            hit = _cache[path] = (mtime, QuantizedIndex(path).load())
+        return hit[1]
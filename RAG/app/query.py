@@ -1,43 +1,344 @@
+import asyncio
+import re
 import sys
-from typing import List, Dict, Any
+import time
+from contextlib import aclosing
+from dataclasses import dataclass, field
+from datetime import date
+from typing import AsyncIterator, List, Dict, Any, Literal, Optional
 
-import chromadb
-from chromadb.config import Settings
-from sentence_transformers import SentenceTransformer
+import numpy as np
 
-from app.config import CHROMA_DIR, EMBED_MODEL, TOP_K, OPENAI_API_KEY
+from app.answer_cache import AnswerCache, scope_key
+from app.cache import TTLCache
+from app.config import (
+    COLLECTION, TOP_K, OPENAI_API_KEY, OPENAI_BASE_URL, EMBED_MODEL, EMBED_CACHE_SIZE, EMBED_CACHE_TTL, LLM_MODEL,
+    ANSWER_CACHE_ENABLED, ANSWER_CACHE_PATH, ANSWER_CACHE_THRESHOLD, ANSWER_CACHE_MAX_ENTRIES, ANSWER_CACHE_MAX_BYTES,
+    GENERATION_CONCURRENCY, HYBRID_SEARCH, HYBRID_CANDIDATES, RRF_K, RERANK_ENABLED, RERANK_CANDIDATES,
+    RERANK_TOP_K, QUANTIZE, QUANTIZE_RESCORE, FLAT_INDEX, VECTOR_BACKEND, CONTEXT_TOKENS,
+)
+from app.context import pack
+from app.docmeta import date_int
+from app.lexical import reciprocal_rank_fusion
+from app.metrics import (
+    CACHE_HITS, CACHE_MISSES, EMBED_SECONDS, GENERATION_SECONDS, RERANK_SECONDS, SEARCH_SECONDS, TOKENS,
+)
+from app.rerank import rerank_hits, score_cache
+from app.resources import get_embedder, get_flat, get_lexical, get_quantized, get_store
+from app.runtime import generation_slots, loop_local
+from app.store import Hit, Where, matches
 
-def retrieve(q: str, k: int = TOP_K) -> Dict[str, Any]:
-    client = chromadb.PersistentClient(path=CHROMA_DIR, settings=Settings(anonymized_telemetry=False))
-    col = client.get_or_create_collection("docs")
-    embedder = SentenceTransformer(EMBED_MODEL)
-    q_emb = embedder.encode([q], convert_to_numpy=True).tolist()
-    return col.query(query_embeddings=q_emb, n_results=k, include=["documents", "metadatas", "distances"])
+embed_cache = TTLCache(EMBED_CACHE_SIZE, EMBED_CACHE_TTL)
+SYSTEM_PROMPT = "Answer ONLY using the provided chunks. If unknown, say you don't know."
 
-def _generate_with_openai(question: str, contexts: List[str]) -> str:
-    from openai import OpenAI
-    client = OpenAI(api_key=OPENAI_API_KEY)
-    system = "Answer ONLY using the provided chunks. If unknown, say you don't know."
+answer_cache = AnswerCache(
+    ANSWER_CACHE_PATH, ANSWER_CACHE_THRESHOLD, ANSWER_CACHE_MAX_ENTRIES,
+    scope=scope_key(LLM_MODEL, EMBED_MODEL, SYSTEM_PROMPT, f"context={CONTEXT_TOKENS}"),
+    max_bytes=ANSWER_CACHE_MAX_BYTES,
+)
+# "use": read and write the answer cache; "refresh": regenerate and store
+# (Cache-Control: no-cache); "off": neither (Cache-Control: no-store).
+CacheMode = Literal["use", "refresh", "off"]
+
+def _cache_counts(attr: str):
+    caches = {"embeddings": embed_cache, "answers": answer_cache, "rerank": score_cache}
+    return lambda: {(name,): getattr(c, attr) for name, c in caches.items()}
+
+CACHE_HITS.set_function(_cache_counts("hits"))
+CACHE_MISSES.set_function(_cache_counts("misses"))
+
+@dataclass
+class Retrieval:
+    question: str
+    ids: List[str] = field(default_factory=list)
+    documents: List[str] = field(default_factory=list)
+    metadatas: List[Dict[str, Any]] = field(default_factory=list)
+    distances: List[Optional[float]] = field(default_factory=list)
+    embedding: Optional[np.ndarray] = None
+
+    @property
+    def sources(self) -> List[str]:
+        return [m.get("source", "") for m in self.metadatas]
+
+    @property
+    def citations(self) -> List[str]:
+        """source#page=N for chunks with a page number (PDFs), else just the source."""
+        return [f"{m.get('source', '')}#page={m['page']}" if m.get("page") else m.get("source", "")
+                for m in self.metadatas]
+
+    @property
+    def contexts(self) -> List[str]:
+        """The prompt context: overlapping or adjacent chunks merged, best first, within CONTEXT_TOKENS."""
+        return pack(self.documents, self.metadatas, CONTEXT_TOKENS)
+
+def _date_int(d: str) -> int:
+    """'2023-02-23' or '20230223' -> 20230223, the form ingest stores dates in."""
+    m = re.fullmatch(r"(\d{4})(-?)(\d{2})\2(\d{2})", d)
+    try:
+        day = date.fromisoformat(f"{m[1]}-{m[3]}-{m[4]}") if m else None
+    except ValueError:  # e.g. 2023-13-45
+        day = None
+    if day is None:
+        raise ValueError(f"Expected a date as YYYY-MM-DD, got {d!r}")
+    return date_int(day)
+
+def build_where(sources: Optional[List[str]] = None, date_from: Optional[str] = None,
+                date_to: Optional[str] = None, doc_sets: Optional[List[str]] = None) -> Optional[Where]:
+    """Combine the optional query filters into one `where` clause, or None when nothing is set."""
+    clauses: List[Where] = []
+    if sources:
+        clauses.append({"source": {"$in": list(sources)}})
+    if doc_sets:
+        clauses.append({"doc_set": {"$in": list(doc_sets)}})
+    if date_from:
+        clauses.append({"date": {"$gte": _date_int(date_from)}})
+    if date_to:
+        clauses.append({"date": {"$lte": _date_int(date_to)}})
+    if not clauses:
+        return None
+    return clauses[0] if len(clauses) == 1 else {"$and": clauses}
+
+def _normalize(q: str) -> str:
+    return " ".join(q.split()).lower()
+
+def embed_queries(qs: List[str]) -> List[np.ndarray]:
+    """Embed questions, serving repeats from the cache and encoding all misses in one call."""
+    keys = [(EMBED_MODEL, _normalize(q)) for q in qs]
+    embs: List[Optional[np.ndarray]] = [embed_cache.get(key) for key in keys]
+    missing: Dict[tuple, List[int]] = {}
+    for i, emb in enumerate(embs):
+        if emb is None:
+            missing.setdefault(keys[i], []).append(i)
+    if missing:
+        first = [idx[0] for idx in missing.values()]
+        encoded = get_embedder().encode([qs[i] for i in first], convert_to_numpy=True)
+        for (key, idx), emb in zip(missing.items(), encoded):
+            emb.setflags(write=False)
+            embed_cache.put(key, emb)
+            for i in idx:
+                embs[i] = emb
+    return embs
+
+def embed_query(q: str) -> np.ndarray:
+    return embed_queries([q])[0]
+
+def _fuse(records, name: str, qs: List[str], vector_hits: List[List[Hit]], n: int,
+          where: Optional[Where] = None) -> List[List[Hit]]:
+    """Re-rank vector hits with BM25 keyword hits by reciprocal-rank fusion.
+
+    `records` is the store (or flat index) that keyword-only hits are loaded from.
+    Keyword hits whose metadata fails `where` are dropped.
+    """
+    lex = get_lexical(name)
+    keyword = [[i for i, _ in lex.search(q, n)] for q in qs]
+    known = {h[0]: h for hits in vector_hits for h in hits}
+    missing = sorted({i for ids in keyword for i in ids if i not in known})
+    for i, (doc, meta, _) in records.get(missing).items():
+        if matches(meta, where):
+            known[i] = (i, doc, meta, None)
+    out = []
+    for hits, ids in zip(vector_hits, keyword):
+        scores = reciprocal_rank_fusion([[h[0] for h in hits], ids], RRF_K)
+        out.append([known[i] for i in sorted(scores, key=scores.get, reverse=True) if i in known])
+    return out
+
+def default_k() -> int:
+    return RERANK_TOP_K if RERANK_ENABLED else TOP_K
+
+def retrieve_many(qs: List[str], k: Optional[int] = None, where: Optional[Where] = None,
+                  collection: Optional[str] = None) -> List[Retrieval]:
+    """Retrieve for several questions with one encode call and one vector search.
+
+    With HYBRID_SEARCH on, each question also runs a BM25 query against the
+    lexical index and the two rankings are fused, so exact identifiers that the
+    embedding misses can still make the top k. With RERANK_ENABLED on,
+    RERANK_CANDIDATES candidates are rescored by the cross-encoder first. With
+    FLAT_INDEX on and an exported flat index on disk, the vector search is an
+    exact scan of that memory-mapped matrix and the vector store is not opened.
+    A `where` filter (see build_where) restricts every path to matching chunks
+    before the nearest-neighbour search. The flat index evaluates it on its
+    source/doc_set/date columns; a filter on any other field, and any filtered
+    query when only the quantized index is exported, goes to the vector store.
+
+    `collection` defaults to COLLECTION, which is created on first use; any
+    other collection must exist (see app.ingest --collection) or
+    UnknownCollection is raised.
+    """
+    if not qs:
+        return []
+    k = k or default_k()
+    name = collection or COLLECTION
+    create = name == COLLECTION
+    with EMBED_SECONDS.time():
+        embs = embed_queries(qs)
+    n = k
+    if HYBRID_SEARCH:
+        n = max(n, HYBRID_CANDIDATES)
+    if RERANK_ENABLED:
+        n = max(n, RERANK_CANDIDATES)
+    t0 = time.perf_counter()
+    flat = get_flat(name) if FLAT_INDEX else None
+    if flat is not None and where and not flat.can_filter(where):
+        flat = None
+    qix = get_quantized(name) if QUANTIZE != "none" and flat is None and not where else None
+    if flat is not None:
+        records, index = flat, "flat"
+        hits = flat.search(np.stack(embs), n, where)
+    elif qix is not None:
+        records, index = qix, "quantized"
+        hits = qix.query(np.stack(embs), n, QUANTIZE_RESCORE)
+    else:
+        records, index = get_store(name, create), VECTOR_BACKEND
+        hits = records.query(np.stack(embs), n, where)
+    if HYBRID_SEARCH:
+        hits = _fuse(records, name, qs, hits, n, where)
+    SEARCH_SECONDS.observe(time.perf_counter() - t0, index=index)
+    if RERANK_ENABLED:
+        with RERANK_SECONDS.time():
+            hits = rerank_hits(qs, [row[:n] for row in hits], k)
+    out = []
+    for q, emb, row in zip(qs, embs, hits):
+        row = row[:k]
+        out.append(Retrieval(
+            question=q,
+            ids=[h[0] for h in row],
+            documents=[h[1] for h in row],
+            metadatas=[h[2] for h in row],
+            distances=[h[3] for h in row],
+            embedding=emb,
+        ))
+    return out
+
+def retrieve(q: str, k: Optional[int] = None, where: Optional[Where] = None,
+             collection: Optional[str] = None) -> Retrieval:
+    return retrieve_many([q], k=k, where=where, collection=collection)[0]
+
+def _messages(question: str, contexts: List[str]) -> List[Dict[str, str]]:
     ctx = "\n\n".join(f"- {c}" for c in contexts)
     prompt = f"Context:\n{ctx}\n\nQuestion: {question}\nAnswer:"
-    resp = client.chat.completions.create(
-        model="gpt-4o-mini",
-        messages=[{"role":"system","content":system},{"role":"user","content":prompt}],
-        temperature=0.2,
+    return [{"role":"system","content":SYSTEM_PROMPT},{"role":"user","content":prompt}]
+
+_openai_client = None
+
+def _openai():
+    global _openai_client
+    if _openai_client is None:
+        from openai import OpenAI
+        _openai_client = OpenAI(api_key=OPENAI_API_KEY, base_url=OPENAI_BASE_URL)
+    return _openai_client
+
+def _async_openai():
+    def make():
+        import httpx
+        from openai import AsyncOpenAI
+        limits = httpx.Limits(max_connections=GENERATION_CONCURRENCY, max_keepalive_connections=GENERATION_CONCURRENCY)
+        return AsyncOpenAI(
+            api_key=OPENAI_API_KEY, base_url=OPENAI_BASE_URL,
+            http_client=httpx.AsyncClient(limits=limits, timeout=60.0),
+        )
+    return loop_local("openai", make)
+
+def _record_usage(usage) -> None:
+    if usage is not None:
+        TOKENS.inc(usage.prompt_tokens or 0, kind="prompt")
+        TOKENS.inc(usage.completion_tokens or 0, kind="completion")
+
+def _generate_with_openai(question: str, contexts: List[str]) -> str:
+    resp = _openai().chat.completions.create(
+        model=LLM_MODEL, messages=_messages(question, contexts), temperature=0.2,
     )
+    _record_usage(resp.usage)
     return resp.choices[0].message.content
 
-def answer(question: str) -> str:
-    results = retrieve(question, k=TOP_K)
-    docs = results.get("documents", [[]])[0]
-    metas = results.get("metadatas", [[]])[0]
-    contexts = list(docs)[:TOP_K]
+async def _agenerate_with_openai(question: str, contexts: List[str]) -> str:
+    resp = await _async_openai().chat.completions.create(
+        model=LLM_MODEL, messages=_messages(question, contexts), temperature=0.2,
+    )
+    _record_usage(resp.usage)
+    return resp.choices[0].message.content
+
+async def _astream_openai(question: str, contexts: List[str]) -> AsyncIterator[str]:
+    stream = await _async_openai().chat.completions.create(
+        model=LLM_MODEL, messages=_messages(question, contexts), temperature=0.2, stream=True,
+        stream_options={"include_usage": True},
+    )
+    try:
+        async for chunk in stream:
+            _record_usage(getattr(chunk, "usage", None))
+            delta = chunk.choices[0].delta.content if chunk.choices else None
+            if delta:
+                yield delta
+    finally:
+        # Closing the response drops the HTTP connection, which stops the
+        # completion upstream when the consumer goes away mid-stream.
+        await stream.close()
+
+def _fallback_answer(r: Retrieval) -> str:
+    header = "[No OPENAI_API_KEY] Top retrieved chunks:\n\n"
+    body = "\n\n---\n\n".join(r.documents)
+    srcs = "\n".join(f"- {s}" for s in r.sources)
+    return header + body + "\n\nSources:\n" + srcs
+
+def _use_answer_cache(r: Retrieval) -> bool:
+    return bool(ANSWER_CACHE_ENABLED and r.embedding is not None and r.ids)
+
+def _cached_answer(r: Retrieval, cache: CacheMode = "use") -> Optional[str]:
+    if cache != "use" or not _use_answer_cache(r):
+        return None
+    hit = answer_cache.lookup(r.embedding, r.ids, r.documents, r.question)
+    return hit[0] if hit is not None else None
+
+def _store_answer(r: Retrieval, ans: str, cache: CacheMode = "use") -> None:
+    if cache != "off" and _use_answer_cache(r):
+        answer_cache.store(r.embedding, r.ids, ans, r.sources, r.documents, r.question)
+
+def generate(r: Retrieval, cache: CacheMode = "use") -> str:
+    if not OPENAI_API_KEY:
+        return _fallback_answer(r)
+    ans = _cached_answer(r, cache)
+    if ans is None:
+        with GENERATION_SECONDS.time(mode="sync"):
+            ans = _generate_with_openai(r.question, r.contexts)
+        _store_answer(r, ans, cache)
+    return ans
+
+async def agenerate(r: Retrieval, cache: CacheMode = "use") -> str:
+    """Async generate(): the LLM call uses the shared async client, capped by GENERATION_CONCURRENCY."""
     if not OPENAI_API_KEY:
-        header = "[No OPENAI_API_KEY] Top retrieved chunks:\n\n"
-        body = "\n\n---\n\n".join(contexts)
-        srcs = "\n".join(f"- {m.get('source','')}" for m in metas[:TOP_K])
-        return header + body + "\n\nSources:\n" + srcs
-    return _generate_with_openai(question, contexts)
+        return _fallback_answer(r)
+    ans = await asyncio.to_thread(_cached_answer, r, cache)
+    if ans is None:
+        async with generation_slots():
+            with GENERATION_SECONDS.time(mode="async"):
+                ans = await _agenerate_with_openai(r.question, r.contexts)
+        await asyncio.to_thread(_store_answer, r, ans, cache)
+    return ans
+
+async def astream_answer(r: Retrieval, cache: CacheMode = "use") -> AsyncIterator[str]:
+    """Yield the answer in pieces as the LLM produces them; cached answers come back in one piece.
+
+    Only a fully streamed answer is written to the answer cache. Closing this
+    generator early closes the upstream completion stream.
+    """
+    if not OPENAI_API_KEY:
+        yield _fallback_answer(r)
+        return
+    cached = await asyncio.to_thread(_cached_answer, r, cache)
+    if cached is not None:
+        yield cached
+        return
+    parts = []
+    async with generation_slots():
+        t0 = time.perf_counter()
+        async with aclosing(_astream_openai(r.question, r.contexts)) as stream:
+            async for piece in stream:
+                parts.append(piece)
+                yield piece
+        GENERATION_SECONDS.observe(time.perf_counter() - t0, mode="stream")
+    await asyncio.to_thread(_store_answer, r, "".join(parts), cache)
+
+def answer(question: str, k: Optional[int] = None) -> str:
+    return generate(retrieve(question, k=k))
 
 def main():
     if len(sys.argv) < 2:
@@ -0,0 +1,90 @@
+import hashlib
+import threading
+import time
+from typing import Any, Dict, List, Sequence, Tuple
+
+from app.cache import TTLCache
+from app.config import RERANK_BUDGET_MS, RERANK_CACHE_SIZE, RERANK_CACHE_TTL, RERANK_MODEL
+from app.resources import get_reranker
+
+score_cache = TTLCache(RERANK_CACHE_SIZE, RERANK_CACHE_TTL)
+
+class _Budget:
+    """Tracks the observed cost per scored pair to predict whether a rerank fits the budget.
+
+    Skipped calls measure nothing, so while over budget every PROBE_EVERY-th
+    call runs anyway and its measurement replaces the estimate; a slow spike
+    (a busy CPU, a one-off stall) cannot turn reranking off for good.
+    """
+
+    PROBE_EVERY = 20
+
+    def __init__(self, budget_ms: float):
+        self.budget_ms = budget_ms
+        self.ms_per_pair = 0.0
+        self.runs = 0
+        self.skipped = 0
+        self._streak = 0
+        self._lock = threading.Lock()
+
+    def allows(self, pairs: int) -> bool:
+        with self._lock:
+            ok = self.runs == 0 or self.ms_per_pair * pairs <= self.budget_ms or self._streak + 1 >= self.PROBE_EVERY
+            if ok:
+                self._streak = 0
+            else:
+                self._streak += 1
+                self.skipped += 1
+            return ok
+
+    def observe(self, pairs: int, elapsed_ms: float) -> None:
+        if pairs <= 0:
+            return
+        with self._lock:
+            per_pair = elapsed_ms / pairs
+            fits = self.ms_per_pair * pairs <= self.budget_ms
+            self.ms_per_pair = per_pair if self.runs == 0 or not fits else 0.8 * self.ms_per_pair + 0.2 * per_pair
+            self.runs += 1
+
+budget = _Budget(RERANK_BUDGET_MS)
+
+def _query_hash(q: str) -> str:
+    return hashlib.sha1(" ".join(q.split()).lower().encode("utf-8")).hexdigest()
+
+def rerank_hits(qs: Sequence[str], hits: List[List[Tuple]], k: int) -> List[List[Tuple]]:
+    """Rescore (id, document, ...) candidates per question with the cross-encoder and keep the top k.
+
+    Every uncached (question, chunk) pair of the whole batch is scored in one
+    predict() call. If the predicted cost of that call exceeds RERANK_BUDGET_MS,
+    reranking is skipped and the candidates keep their retrieval order.
+    """
+    keys = [[(RERANK_MODEL, _query_hash(q), h[0]) for h in row] for q, row in zip(qs, hits)]
+    scores = [[score_cache.get(key) for key in row] for row in keys]
+    todo = [(i, j) for i, row in enumerate(scores) for j, s in enumerate(row) if s is None]
+    if todo:
+        if not budget.allows(len(todo)):
+            return [row[:k] for row in hits]
+        # Load the model outside the timed section: its load time is not scoring cost.
+        model = get_reranker()
+        t0 = time.perf_counter()
+        pairs = [(qs[i], hits[i][j][1]) for i, j in todo]
+        predicted = model.predict(pairs, batch_size=len(pairs), convert_to_numpy=True)
+        budget.observe(len(pairs), (time.perf_counter() - t0) * 1000)
+        for (i, j), s in zip(todo, predicted):
+            scores[i][j] = float(s)
+            score_cache.put(keys[i][j], float(s))
+    out = []
+    for row, row_scores in zip(hits, scores):
+        order = sorted(range(len(row)), key=lambda j: row_scores[j], reverse=True)
+        out.append([row[j] for j in order[:k]])
+    return out
+
+def stats() -> Dict[str, Any]:
+    return {
+        "model": RERANK_MODEL,
+        "budget_ms": budget.budget_ms,
+        "ms_per_pair": round(budget.ms_per_pair, 3),
+        "runs": budget.runs,
+        "skipped": budget.skipped,
+        "scores": score_cache.stats(),
+    }
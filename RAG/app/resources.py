@@ -0,0 +1,212 @@
+import os
+import re
+import threading
+import time
+from typing import Dict, List, Optional
+
+import chromadb
+from chromadb.config import Settings
+from sentence_transformers import CrossEncoder, SentenceTransformer
+
+from app.config import (
+    CHROMA_DIR, COLLECTION, COLLECTION_IDLE_SECONDS, EMBED_MODEL, HNSW_EF_CONSTRUCTION, HNSW_EF_SEARCH, HNSW_M,
+    RERANK_ENABLED, RERANK_MODEL, VECTOR_BACKEND,
+)
+from app.flat import FlatIndex, forget_flat, open_flat
+from app.lexical import LexicalIndex
+from app.metrics import COLLECTION_SIZE, MODEL_LOADED
+from app.quantize import QuantizedIndex, forget_index, open_index
+from app.store import BACKENDS, ChromaStore, HnswStore, VectorStore
+
+# One embedder and one Chroma client per process; loading either costs
+# seconds, so they are created once and shared by every request thread.
+_lock = threading.Lock()
+_embedder: Optional[SentenceTransformer] = None
+_reranker: Optional[CrossEncoder] = None
+_client = None
+_collections: Dict[str, "chromadb.Collection"] = {}
+_lexical: Dict[str, LexicalIndex] = {}
+_stores: Dict[str, VectorStore] = {}
+# Collection name -> time.monotonic() of its last use (see touch()), for idle eviction.
+_last_used: Dict[str, float] = {}
+_last_sweep = 0.0
+_ready = threading.Event()
+_error: Optional[str] = None
+
+def get_embedder() -> SentenceTransformer:
+    global _embedder
+    if _embedder is None:
+        with _lock:
+            if _embedder is None:
+                _embedder = SentenceTransformer(EMBED_MODEL)
+    return _embedder
+
+def get_reranker() -> CrossEncoder:
+    global _reranker
+    if _reranker is None:
+        with _lock:
+            if _reranker is None:
+                _reranker = CrossEncoder(RERANK_MODEL)
+    return _reranker
+
+def get_client():
+    global _client
+    if _client is None:
+        with _lock:
+            if _client is None:
+                _client = chromadb.PersistentClient(path=CHROMA_DIR, settings=Settings(anonymized_telemetry=False))
+    return _client
+
+def get_collection(name: str = COLLECTION):
+    col = _collections.get(name)
+    if col is None:
+        client = get_client()
+        with _lock:
+            col = _collections.get(name)
+            if col is None:
+                col = client.get_or_create_collection(name)
+                _collections[name] = col
+    return col
+
+def hnsw_path(name: str = COLLECTION) -> str:
+    return os.path.join(CHROMA_DIR, f"hnsw-{name}")
+
+class UnknownCollection(LookupError):
+    pass
+
+# Chroma's rule for collection names; it also keeps names safe to use in file paths.
+_COLLECTION_NAME = re.compile(r"[A-Za-z0-9][A-Za-z0-9._-]{1,510}[A-Za-z0-9]")
+
+def check_collection_name(name: str) -> str:
+    if not _COLLECTION_NAME.fullmatch(name) or ".." in name:
+        raise ValueError(f"Invalid collection name {name!r}: use 3-512 characters from [A-Za-z0-9._-]")
+    return name
+
+def list_collections() -> List[str]:
+    """Collections that exist on disk for the configured backend."""
+    if VECTOR_BACKEND == "hnsw":
+        if not os.path.isdir(CHROMA_DIR):
+            return []
+        return sorted(d[len("hnsw-"):] for d in os.listdir(CHROMA_DIR)
+                      if d.startswith("hnsw-") and os.path.isfile(os.path.join(CHROMA_DIR, d, "records.sqlite3")))
+    return sorted(c if isinstance(c, str) else c.name for c in get_client().list_collections())
+
+def evict_idle(max_idle: float = COLLECTION_IDLE_SECONDS, now: Optional[float] = None) -> List[str]:
+    """Close the collections not used for `max_idle` seconds (never the default one) and return their names.
+
+    Their handles, lexical index connections and cached flat/quantized indexes
+    are dropped; the next request for one of them opens it again.
+    """
+    now = time.monotonic() if now is None else now
+    with _lock:
+        idle = [n for n, t in _last_used.items() if n != COLLECTION and now - t > max_idle]
+        closing = []
+        for name in idle:
+            del _last_used[name]
+            _collections.pop(name, None)
+            closing += [_stores.pop(name, None), _lexical.pop(name, None)]
+    for handle in closing:
+        if handle is not None:
+            handle.close()
+    for name in idle:
+        forget_flat(flat_path(name))
+        forget_index(quantized_path(name))
+    return idle
+
+def touch(name: str) -> None:
+    """Record a use of collection `name` for idle eviction; every handle getter calls it."""
+    global _last_sweep
+    now = time.monotonic()
+    # Under the lock: evict_idle iterates _last_used from other request threads.
+    with _lock:
+        _last_used[name] = now
+        sweep = now - _last_sweep >= min(60.0, COLLECTION_IDLE_SECONDS / 2)
+        if sweep:
+            _last_sweep = now
+    if sweep:
+        evict_idle(now=now)
+
+def get_store(name: str = COLLECTION, create: bool = True) -> VectorStore:
+    """The vector store for collection `name`, on the backend chosen by VECTOR_BACKEND.
+
+    Handles are opened on first use and cached; ones left idle for
+    COLLECTION_IDLE_SECONDS are closed again. With create=False a collection
+    that does not exist yet raises UnknownCollection instead of being created.
+    """
+    store = _stores.get(name)
+    if store is None and not create and name not in list_collections():
+        raise UnknownCollection(f"Collection {name!r} not found")
+    if store is None:
+        if VECTOR_BACKEND == "chroma":
+            made = ChromaStore(get_collection(name))
+        elif VECTOR_BACKEND == "hnsw":
+            made = HnswStore(hnsw_path(name), name, HNSW_EF_CONSTRUCTION, HNSW_M, HNSW_EF_SEARCH)
+        else:
+            raise ValueError(f"Unknown VECTOR_BACKEND {VECTOR_BACKEND!r}; expected one of {', '.join(BACKENDS)}")
+        with _lock:
+            store = _stores.setdefault(name, made)
+    touch(name)
+    return store
+
+def get_lexical(name: str = COLLECTION) -> LexicalIndex:
+    with _lock:
+        ix = _lexical.get(name)
+        if ix is None:
+            ix = _lexical[name] = LexicalIndex(os.path.join(CHROMA_DIR, f"lexical-{name}.sqlite3"))
+    touch(name)
+    return ix
+
+def dedup_path(name: str = COLLECTION) -> str:
+    return os.path.join(CHROMA_DIR, f"dedup-{name}.sqlite3")
+
+def quantized_path(name: str = COLLECTION) -> str:
+    return os.path.join(CHROMA_DIR, f"quant-{name}")
+
+def get_quantized(name: str = COLLECTION) -> Optional[QuantizedIndex]:
+    touch(name)
+    return open_index(quantized_path(name))
+
+def flat_path(name: str = COLLECTION) -> str:
+    return os.path.join(CHROMA_DIR, f"flat-{name}")
+
+def get_flat(name: str = COLLECTION) -> Optional[FlatIndex]:
+    touch(name)
+    return open_flat(flat_path(name))
+
+def warm(collection: str = COLLECTION) -> None:
+    global _error
+    try:
+        get_embedder().encode(["warmup"], convert_to_numpy=True)
+        get_store(collection)
+        if RERANK_ENABLED:
+            get_reranker()
+    except Exception as e:
+        _error = f"{type(e).__name__}: {e}"
+        return
+    _error = None
+    _ready.set()
+
+def warm_in_background(collection: str = COLLECTION) -> threading.Thread:
+    t = threading.Thread(target=warm, args=(collection,), name="rag-warmup", daemon=True)
+    t.start()
+    return t
+
+def is_ready() -> bool:
+    return _ready.is_set()
+
+def open_collections() -> List[str]:
+    """Collections whose vector store handle is currently open in this process."""
+    return sorted(_stores)
+
+COLLECTION_SIZE.set_function(lambda: {(name,): store.count() for name, store in list(_stores.items())})
+MODEL_LOADED.set_function(lambda: {(EMBED_MODEL,): float(_embedder is not None), (RERANK_MODEL,): float(_reranker is not None)})
+
+def status() -> Dict[str, object]:
+    return {
+        "ready": _ready.is_set(),
+        "embedder_loaded": _embedder is not None,
+        "embed_model": EMBED_MODEL,
+        "vector_backend": VECTOR_BACKEND,
+        "collections": open_collections(),
+        "error": _error,
+    }
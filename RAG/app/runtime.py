@@ -0,0 +1,27 @@
+import asyncio
+import functools
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict
+
+from app.config import RETRIEVAL_WORKERS, GENERATION_CONCURRENCY
+
+# Embedding and vector search are CPU-bound and release the GIL for most of
+# their work, so they get their own bounded pool instead of sharing the event
+# loop's default executor with everything else.
+_retrieval_pool = ThreadPoolExecutor(max_workers=RETRIEVAL_WORKERS, thread_name_prefix="rag-retrieval")
+_per_loop: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, Any]]" = weakref.WeakKeyDictionary()
+
+async def run_retrieval(fn: Callable, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_retrieval_pool, functools.partial(fn, *args, **kwargs))
+
+def loop_local(name: str, factory: Callable[[], Any]) -> Any:
+    """Return a per-event-loop singleton; semaphores and async HTTP pools can't cross loops."""
+    state = _per_loop.setdefault(asyncio.get_running_loop(), {})
+    if name not in state:
+        state[name] = factory()
+    return state[name]
+
+def generation_slots() -> asyncio.Semaphore:
+    return loop_local("generation_slots", lambda: asyncio.Semaphore(GENERATION_CONCURRENCY))
@@ -0,0 +1,358 @@
+import json
+import os
+import sqlite3
+import threading
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+BACKENDS = ("chroma", "hnsw")
+
+# (chunk id, document, metadata, squared L2 distance or None)
+Hit = Tuple[str, str, Dict[str, Any], Optional[float]]
+# chunk id -> (document, metadata, embedding or None)
+Records = Dict[str, Tuple[str, Dict[str, Any], Optional[np.ndarray]]]
+# Metadata filter in Chroma's `where` syntax: {"field": value}, {"field": {"$gte": v}},
+# {"$and": [...]}, {"$or": [...]}; operators $eq $ne $gt $gte $lt $lte $in $nin.
+Where = Dict[str, Any]
+
+_OPS = {
+    "$eq": lambda a, b: a == b,
+    "$ne": lambda a, b: a != b,
+    "$gt": lambda a, b: a is not None and a > b,
+    "$gte": lambda a, b: a is not None and a >= b,
+    "$lt": lambda a, b: a is not None and a < b,
+    "$lte": lambda a, b: a is not None and a <= b,
+    "$in": lambda a, b: a in b,
+    "$nin": lambda a, b: a not in b,
+}
+_SQL_OPS = {"$eq": "=", "$ne": "!=", "$gt": ">", "$gte": ">=", "$lt": "<", "$lte": "<="}
+
+def where_conditions(where: Where) -> Iterator[Tuple[str, str, Any]]:
+    """Yield (field, operator, operand) for every non-logical clause of `where`."""
+    for field, cond in where.items():
+        if isinstance(cond, dict):
+            for op, operand in cond.items():
+                if op not in _OPS:
+                    raise ValueError(f"Unsupported where operator {op!r}")
+                yield field, op, operand
+        else:
+            yield field, "$eq", cond
+
+def matches(meta: Dict[str, Any], where: Optional[Where]) -> bool:
+    """Evaluate a Chroma-style `where` filter against one metadata dict."""
+    if not where:
+        return True
+    if "$and" in where:
+        return all(matches(meta, w) for w in where["$and"])
+    if "$or" in where:
+        return any(matches(meta, w) for w in where["$or"])
+    return all(_OPS[op](meta.get(field), operand) for field, op, operand in where_conditions(where))
+
+def where_sql(where: Where, column: str = "metadata") -> Tuple[str, List[Any]]:
+    """Translate a `where` filter into an SQLite condition over a JSON metadata column."""
+    if "$and" in where or "$or" in where:
+        key = "$and" if "$and" in where else "$or"
+        parts = [where_sql(w, column) for w in where[key]]
+        joiner = " AND " if key == "$and" else " OR "
+        return "(" + joiner.join(sql for sql, _ in parts) + ")", [p for _, params in parts for p in params]
+    clauses, params = [], []
+    for field, op, operand in where_conditions(where):
+        ref = f"json_extract({column}, ?)"
+        params.append(f'$."{field}"')
+        if op in ("$in", "$nin"):
+            marks = ",".join("?" * len(operand)) or "NULL"
+            clauses.append(f"{ref} {'IN' if op == '$in' else 'NOT IN'} ({marks})")
+            params.extend(operand)
+        else:
+            clauses.append(f"{ref} {_SQL_OPS[op]} ?")
+            params.append(operand)
+    return "(" + " AND ".join(clauses) + ")", params
+
+class VectorStore:
+    """What ingest and retrieval need from a vector database.
+
+    Distances are squared L2 in every backend, so scores stay comparable when
+    the backend is switched.
+    """
+
+    name: str
+
+    def upsert(self, ids: Sequence[str], embeddings: np.ndarray, documents: Sequence[str],
+               metadatas: Sequence[Dict[str, Any]]) -> None:
+        raise NotImplementedError
+
+    def delete_by_source(self, source: str) -> None:
+        raise NotImplementedError
+
+    def query(self, embeddings: np.ndarray, k: int, where: Optional[Where] = None) -> List[List[Hit]]:
+        """Nearest k chunks per query row; `where` restricts the search to matching metadata."""
+        raise NotImplementedError
+
+    def get(self, ids: Sequence[str], embeddings: bool = False) -> Records:
+        raise NotImplementedError
+
+    def scan(self, page: int = 4096) -> Iterator[Tuple[List[str], np.ndarray]]:
+        """Yield (ids, embeddings) pages covering every stored vector."""
+        raise NotImplementedError
+
+    def count(self) -> int:
+        raise NotImplementedError
+
+    def close(self) -> None:
+        """Release memory held for this collection; the handle reopens lazily if it is used again."""
+
+    def flush(self) -> None:
+        """Persist buffered writes; a no-op for stores that write through."""
+
+class ChromaStore(VectorStore):
+    def __init__(self, collection):
+        self.col = collection
+        self.name = collection.name
+
+    def upsert(self, ids, embeddings, documents, metadatas):
+        self.col.upsert(ids=list(ids), embeddings=embeddings, documents=list(documents), metadatas=list(metadatas))
+
+    def delete_by_source(self, source):
+        self.col.delete(where={"source": source})
+
+    def query(self, embeddings, k, where=None):
+        res = self.col.query(query_embeddings=embeddings, n_results=k, where=where or None,
+                             include=["documents", "metadatas", "distances"])
+        return [
+            [(cid, doc, meta or {}, dist) for cid, doc, meta, dist in
+             zip(res["ids"][i], res["documents"][i], res["metadatas"][i], res["distances"][i])]
+            for i in range(len(res["ids"]))
+        ]
+
+    def get(self, ids, embeddings=False):
+        if not ids:
+            return {}
+        include = ["documents", "metadatas"] + (["embeddings"] if embeddings else [])
+        got = self.col.get(ids=list(ids), include=include)
+        embs = got["embeddings"] if embeddings else [None] * len(got["ids"])
+        return {
+            cid: (doc, meta or {}, np.asarray(emb, dtype=np.float32) if emb is not None else None)
+            for cid, doc, meta, emb in zip(got["ids"], got["documents"], got["metadatas"], embs)
+        }
+
+    def scan(self, page=4096):
+        offset = 0
+        while True:
+            got = self.col.get(include=["embeddings"], limit=page, offset=offset)
+            if not got["ids"]:
+                return
+            yield list(got["ids"]), np.asarray(got["embeddings"], dtype=np.float32)
+            offset += len(got["ids"])
+
+    def count(self):
+        return self.col.count()
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS records (
+    label INTEGER PRIMARY KEY AUTOINCREMENT,
+    id TEXT NOT NULL UNIQUE,
+    source TEXT NOT NULL,
+    document TEXT NOT NULL,
+    metadata TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS records_source ON records (source);
+"""
+
+class HnswStore(VectorStore):
+    """In-process HNSW graph (hnswlib) with documents and metadata in SQLite.
+
+    Files live in one directory: index.bin (the graph and vectors),
+    records.sqlite3 (id <-> label, document, metadata) and meta.json, which is
+    rewritten on every flush() so other processes know to reload.
+
+    A `where` filter is resolved to the matching labels in SQLite first. Up to
+    EXACT_FILTER_LIMIT candidates are scored exactly; above that, the graph
+    search skips labels outside the set.
+    """
+
+    EXACT_FILTER_LIMIT = 4096
+
+    def __init__(self, path: str, name: str, ef_construction: int = 200, m: int = 16, ef_search: int = 64):
+        import hnswlib  # optional dependency, only needed for this backend
+
+        self._hnswlib = hnswlib
+        self.path = path
+        self.name = name
+        self.ef_construction = ef_construction
+        self.m = m
+        self.ef_search = ef_search
+        self._lock = threading.RLock()
+        self._index = None
+        self._loaded_mtime: Optional[int] = None
+        os.makedirs(path, exist_ok=True)
+        self._db = sqlite3.connect(os.path.join(path, "records.sqlite3"), check_same_thread=False)
+        self._db.executescript(_SCHEMA)
+        self._dirty = False
+
+    def _meta_path(self) -> str:
+        return os.path.join(self.path, "meta.json")
+
+    def _load(self) -> None:
+        try:
+            mtime = os.stat(self._meta_path()).st_mtime_ns
+        except FileNotFoundError:
+            return
+        if self._dirty or mtime == self._loaded_mtime:
+            return
+        with open(self._meta_path(), encoding="utf-8") as f:
+            meta = json.load(f)
+        index = self._hnswlib.Index(space="l2", dim=meta["dim"])
+        index.load_index(os.path.join(self.path, "index.bin"), max_elements=meta["max_elements"],
+                         allow_replace_deleted=True)
+        index.set_ef(self.ef_search)
+        self._index, self._loaded_mtime = index, mtime
+
+    def _ensure_capacity(self, dim: int, extra: int) -> None:
+        if self._index is None:
+            self._index = self._hnswlib.Index(space="l2", dim=dim)
+            self._index.init_index(max_elements=max(1024, extra), ef_construction=self.ef_construction, M=self.m,
+                                   allow_replace_deleted=True)
+            self._index.set_ef(self.ef_search)
+        need = self._index.get_current_count() + extra
+        if need > self._index.get_max_elements():
+            self._index.resize_index(max(need, 2 * self._index.get_max_elements()))
+
+    def upsert(self, ids, embeddings, documents, metadatas):
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        if not len(ids):
+            return
+        with self._lock:
+            self._load()
+            db = self._db
+            db.executemany(
+                "INSERT INTO records (id, source, document, metadata) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(id) DO UPDATE SET source = excluded.source, document = excluded.document, "
+                "metadata = excluded.metadata",
+                [(i, (m or {}).get("source", ""), d, json.dumps(m or {})) for i, d, m in zip(ids, documents, metadatas)],
+            )
+            labels = self._labels(ids)
+            self._ensure_capacity(embeddings.shape[1], len(ids))
+            self._index.add_items(embeddings, np.array([labels[i] for i in ids], dtype=np.int64),
+                                  replace_deleted=True)
+            db.commit()
+            self._dirty = True
+
+    def _labels(self, ids: Sequence[str]) -> Dict[str, int]:
+        out = {}
+        for start in range(0, len(ids), 500):
+            part = list(ids[start:start + 500])
+            marks = ",".join("?" * len(part))
+            out.update(self._db.execute(f"SELECT id, label FROM records WHERE id IN ({marks})", part).fetchall())
+        return out
+
+    def delete_by_source(self, source):
+        with self._lock:
+            self._load()
+            rows = self._db.execute("SELECT label FROM records WHERE source = ?", (source,)).fetchall()
+            for (label,) in rows:
+                if self._index is not None:
+                    try:
+                        self._index.mark_deleted(label)
+                    except RuntimeError:
+                        pass
+            self._db.execute("DELETE FROM records WHERE source = ?", (source,))
+            self._db.commit()
+            self._dirty = self._dirty or bool(rows)
+
+    def query(self, embeddings, k, where=None):
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        with self._lock:
+            self._load()
+            allowed = self._filter(where) if where else None
+            n = min(k, self.count() if allowed is None else len(allowed))
+            if self._index is None or n <= 0:
+                return [[] for _ in range(len(embeddings))]
+            self._index.set_ef(max(self.ef_search, n))
+            if allowed is not None and len(allowed) <= self.EXACT_FILTER_LIMIT:
+                labels, dists = self._exact(embeddings, sorted(allowed), n)
+            elif allowed is not None:
+                labels, dists = self._index.knn_query(embeddings, k=n, num_threads=1,
+                                                      filter=lambda label: label in allowed)
+            else:
+                labels, dists = self._index.knn_query(embeddings, k=n)
+            rows = self._by_label({int(x) for x in labels.ravel()})
+        out = []
+        for lab_row, dist_row in zip(labels, dists):
+            out.append([(rows[int(lab)][0], rows[int(lab)][1], rows[int(lab)][2], float(d))
+                        for lab, d in zip(lab_row, dist_row) if int(lab) in rows])
+        return out
+
+    def _filter(self, where: Where) -> set:
+        sql, params = where_sql(where)
+        return {label for (label,) in self._db.execute(f"SELECT label FROM records WHERE {sql}", params)}
+
+    def _exact(self, embeddings: np.ndarray, labels: List[int], n: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Brute-force the n nearest of `labels`; cheaper and exact when a filter leaves few candidates."""
+        vecs = np.asarray(self._index.get_items(labels), dtype=np.float32)
+        d = (vecs ** 2).sum(axis=1)[None, :] - 2 * embeddings @ vecs.T + (embeddings ** 2).sum(axis=1)[:, None]
+        top = np.argsort(d, axis=1)[:, :n]
+        return np.asarray(labels)[top], np.take_along_axis(d, top, axis=1)
+
+    def _by_label(self, labels) -> Dict[int, Tuple[str, str, Dict[str, Any]]]:
+        labels = list(labels)
+        out = {}
+        for start in range(0, len(labels), 500):
+            part = labels[start:start + 500]
+            marks = ",".join("?" * len(part))
+            for label, cid, doc, meta in self._db.execute(
+                f"SELECT label, id, document, metadata FROM records WHERE label IN ({marks})", part
+            ):
+                out[label] = (cid, doc, json.loads(meta))
+        return out
+
+    def get(self, ids, embeddings=False):
+        if not ids:
+            return {}
+        with self._lock:
+            self._load()
+            labels = self._labels(list(ids))
+            rows = self._by_label(labels.values())
+            vecs = {}
+            if embeddings and self._index is not None and labels:
+                order = list(labels.values())
+                vecs = dict(zip(order, np.asarray(self._index.get_items(order), dtype=np.float32)))
+        return {cid: (doc, meta, vecs.get(label)) for label, (cid, doc, meta) in rows.items()}
+
+    def scan(self, page=4096):
+        last = 0
+        while True:
+            with self._lock:
+                self._load()
+                rows = self._db.execute(
+                    "SELECT label, id FROM records WHERE label > ? ORDER BY label LIMIT ?", (last, page)
+                ).fetchall()
+                if not rows or self._index is None:
+                    return
+                embs = np.asarray(self._index.get_items([r[0] for r in rows]), dtype=np.float32)
+            yield [r[1] for r in rows], embs
+            last = rows[-1][0]
+
+    def count(self):
+        return self._db.execute("SELECT COUNT(*) FROM records").fetchone()[0]
+
+    def flush(self):
+        with self._lock:
+            if not self._dirty or self._index is None:
+                return
+            tmp = os.path.join(self.path, "index.bin.tmp")
+            self._index.save_index(tmp)
+            os.replace(tmp, os.path.join(self.path, "index.bin"))
+            meta = {"dim": self._index.dim, "max_elements": self._index.get_max_elements(), "count": self.count()}
+            with open(self._meta_path() + ".tmp", "w", encoding="utf-8") as f:
+                json.dump(meta, f)
+            os.replace(self._meta_path() + ".tmp", self._meta_path())
+            self._loaded_mtime = os.stat(self._meta_path()).st_mtime_ns
+            self._dirty = False
+
+    def close(self):
+        # Unsaved writes are flushed first; the graph is reloaded from index.bin on next use.
+        with self._lock:
+            self.flush()
+            self._index, self._loaded_mtime = None, None
+
@@ -0,0 +1,57 @@
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Iterator, Optional, Set, Tuple
+
+def _snapshot(root: Path) -> Dict[str, Tuple[int, int]]:
+    out = {}
+    for dirpath, _, names in os.walk(root):
+        for name in names:
+            p = os.path.join(dirpath, name)
+            try:
+                st = os.stat(p)
+            except OSError:
+                continue
+            out[p] = (st.st_size, st.st_mtime_ns)
+    return out
+
+def poll_changes(root: Path, debounce_ms: int = 1000, interval: float = 1.0,
+                 stop: Optional[threading.Event] = None) -> Iterator[Set[Path]]:
+    """Yield the sets of paths that changed under `root`, found by comparing stat() snapshots.
+
+    A batch is yielded once nothing has changed for `debounce_ms`, so a file
+    that is still being copied is picked up once, after the copy finishes.
+    """
+    stop = stop or threading.Event()
+    prev = _snapshot(root)
+    pending: Set[str] = set()
+    last = 0.0
+    while not stop.wait(interval):
+        cur = _snapshot(root)
+        diff = {p for p in prev.keys() | cur.keys() if prev.get(p) != cur.get(p)}
+        prev = cur
+        now = time.monotonic()
+        if diff:
+            pending |= diff
+            last = now
+        elif pending and (now - last) * 1000 >= debounce_ms:
+            yield {Path(p) for p in pending}
+            pending = set()
+
+def changes(root: Path, debounce_ms: int = 1000, poll_interval: float = 1.0, force_polling: bool = False,
+            stop: Optional[threading.Event] = None) -> Iterator[Set[Path]]:
+    """Yield debounced sets of added, modified or deleted paths under `root`, until `stop` is set.
+
+    Uses OS notifications (inotify, FSEvents, ...) through watchfiles when it is
+    installed, and falls back to polling otherwise or with `force_polling`.
+    """
+    try:
+        if force_polling:
+            raise ImportError
+        from watchfiles import watch
+    except ImportError:
+        yield from poll_changes(root, debounce_ms, poll_interval, stop)
+        return
+    for batch in watch(root, debounce=debounce_ms, stop_event=stop, raise_interrupt=False):
+        yield {Path(p) for _, p in batch}
@@ -0,0 +1,85 @@
+"""Compare chunkers on a document folder: chunk count, chunk/embed time and known-item recall.
+
+    python -m bench.bench_chunking --data ./data --queries 200 --k 5 --json out.json
+
+Recall is measured with sentences sampled from the corpus as queries: a query
+is a hit when one of the top-k chunks covers at least half of that sentence.
+"""
+import argparse
+import json
+import random
+import time
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from app.chunking import CHUNKERS, _units
+from app.ingest import _discover, _extract, _make_chunker
+from app.resources import get_embedder
+
+def _sample_queries(docs: List[Tuple[str, str]], n: int, seed: int) -> List[Tuple[int, int, int]]:
+    """Pick (doc index, start, end) sentence spans of 8-60 words."""
+    pool = []
+    for d, (_, text) in enumerate(docs):
+        for s, e, _ in _units(text):
+            if 8 <= len(text[s:e].split()) <= 60:
+                pool.append((d, s, e))
+    random.Random(seed).shuffle(pool)
+    return pool[:n]
+
+def _normalize(m: np.ndarray) -> np.ndarray:
+    return m / np.maximum(np.linalg.norm(m, axis=1, keepdims=True), 1e-12)
+
+def run(docs: List[Tuple[str, str]], chunkers: List[str], n_queries: int = 200, k: int = 5,
+        batch_size: int = 64, seed: int = 0, embedder=None) -> Dict[str, Dict]:
+    embedder = embedder or get_embedder()
+    queries = _sample_queries(docs, n_queries, seed)
+    q_embs = _normalize(embedder.encode([docs[d][1][s:e] for d, s, e in queries], convert_to_numpy=True))
+    report = {}
+    for name in chunkers:
+        chunk = _make_chunker(name, embedder)
+        t0 = time.perf_counter()
+        spans = [(d, s, e) for d, (_, text) in enumerate(docs) for s, e in chunk(text)]
+        chunk_s = time.perf_counter() - t0
+        texts = [docs[d][1][s:e] for d, s, e in spans]
+        t0 = time.perf_counter()
+        embs = _normalize(embedder.encode(texts, batch_size=batch_size, convert_to_numpy=True))
+        embed_s = time.perf_counter() - t0
+
+        hits = 0
+        if len(queries) and len(spans):
+            top = np.argsort(-(q_embs @ embs.T), axis=1)[:, :k]
+            for (d, qs, qe), row in zip(queries, top):
+                need = (qe - qs) / 2
+                if any(spans[i][0] == d and min(qe, spans[i][2]) - max(qs, spans[i][1]) >= need for i in row):
+                    hits += 1
+        report[name] = {
+            "chunks": len(spans),
+            "chars": sum(len(t) for t in texts),
+            "chunk_seconds": round(chunk_s, 4),
+            "embed_seconds": round(embed_s, 4),
+            "chunks_per_second": round(len(spans) / embed_s, 1) if embed_s else None,
+            f"recall@{k}": round(hits / len(queries), 4) if queries else None,
+        }
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark chunking strategies")
+    parser.add_argument("--data", default="./data", help="Folder containing documents")
+    parser.add_argument("--chunkers", default=",".join(CHUNKERS), help="Comma-separated chunker names")
+    parser.add_argument("--queries", type=int, default=200, help="Number of sampled sentence queries")
+    parser.add_argument("--k", type=int, default=5, help="Cutoff for recall@k")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="Write the report to this file")
+    args = parser.parse_args()
+
+    docs = [(str(p), "\n".join(pages)) for p, _, pages in _extract((p, {}) for p in _discover(Path(args.data)))]
+    report = run(docs, args.chunkers.split(","), args.queries, args.k, seed=args.seed)
+    for name, row in report.items():
+        print(name, " | ".join(f"{key}: {val}" for key, val in row.items()))
+    if args.json:
+        Path(args.json).write_text(json.dumps(report, indent=2), encoding="utf-8")
+
+if __name__ == "__main__":
+    main()
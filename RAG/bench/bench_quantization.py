@@ -0,0 +1,116 @@
+"""Recall-vs-memory report for the quantized search index.
+
+    python -m bench.bench_quantization --collection docs --k 10 --json quant.json
+    python -m bench.bench_quantization --synthetic 100000 --dim 384
+
+For each mode the report gives recall@k of the coarse search against exact
+float32 search and recall@k of QuantizedIndex.query(), which rescores
+k * rescore candidates from the memory-mapped float32 copy (what retrieve()
+does). Sizes are reported three ways:
+
+- scan_bytes: what every query reads (codes, norms, scales);
+- disk_bytes: the whole export, including the float32 copy and chunk text,
+  on top of the vector store's own copy of the vectors;
+- rss_bytes: growth of this process's resident memory from opening the
+  index and running the queries (Linux only, else null).
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from app.config import QUANTIZE_RESCORE
+from app.quantize import QuantizedIndex
+
+def _exact_topk(x: np.ndarray, q: np.ndarray, k: int) -> np.ndarray:
+    d = (x ** 2).sum(axis=1)[None, :] - 2 * (q @ x.T)
+    top = np.argpartition(d, k - 1, axis=1)[:, :k]
+    return np.take_along_axis(top, np.argsort(np.take_along_axis(d, top, axis=1), axis=1), axis=1)
+
+def _rss() -> Optional[int]:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return None
+
+def _recall(found, truth) -> float:
+    return float(np.mean([len(set(f) & set(t)) / len(t) for f, t in zip(found, truth)]))
+
+def run(x: np.ndarray, q: np.ndarray, k: int = 10, rescore: int = QUANTIZE_RESCORE,
+        documents: Optional[Sequence[str]] = None, metadatas: Optional[List[Dict]] = None) -> Dict[str, Dict]:
+    x = np.ascontiguousarray(x, dtype=np.float32)
+    ids = [str(i) for i in range(len(x))]
+    documents = documents if documents is not None else [""] * len(x)
+    metadatas = metadatas if metadatas is not None else [{}] * len(x)
+    truth = _exact_topk(x, q, k)
+    report = {"float32": {"scan_bytes": int(x.nbytes), "disk_bytes": int(x.nbytes), "ratio": 1.0, f"recall@{k}": 1.0}}
+    with tempfile.TemporaryDirectory() as tmp:
+        for mode in ("float16", "int8"):
+            QuantizedIndex.build(str(Path(tmp) / mode), ids, x, mode, documents, metadatas)
+            before = _rss()
+            ix = QuantizedIndex(str(Path(tmp) / mode)).load()
+            t0 = time.perf_counter()
+            coarse = ix.search(q, k)
+            coarse_ms = (time.perf_counter() - t0) * 1000 / len(q)
+            t0 = time.perf_counter()
+            hits = ix.query(q, k, rescore)
+            ms = (time.perf_counter() - t0) * 1000 / len(q)
+            after = _rss()
+            first = [[int(i) for i, _ in row] for row in coarse]
+            rescored = [[int(h[0]) for h in row] for row in hits]
+            report[mode] = {
+                "scan_bytes": ix.nbytes(),
+                "disk_bytes": ix.disk_bytes(),
+                "rss_bytes": after - before if before is not None and after is not None else None,
+                "ratio": round(ix.nbytes() / x.nbytes, 4),
+                f"recall@{k}": round(_recall(first, truth), 4),
+                f"recall@{k}_rescored": round(_recall(rescored, truth), 4),
+                "coarse_ms_per_query": round(coarse_ms, 3),
+                "ms_per_query": round(ms, 3),
+            }
+            del ix
+    return report
+
+def _from_collection(name: str):
+    from app.resources import get_collection
+    col = get_collection(name)
+    got = col.get(include=["embeddings", "documents", "metadatas"])
+    return np.asarray(got["embeddings"], dtype=np.float32), got["documents"], got["metadatas"]
+
+def main():
+    parser = argparse.ArgumentParser(description="Quantization recall vs memory report")
+    parser.add_argument("--collection", default="docs", help="Read embeddings from this Chroma collection")
+    parser.add_argument("--synthetic", type=int, default=0, help="Use N random unit vectors instead")
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--rescore", type=int, default=QUANTIZE_RESCORE)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="Write the report to this file")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    docs = metas = None
+    if args.synthetic:
+        # No text: disk_bytes then covers the vectors only.
+        x = rng.normal(size=(args.synthetic, args.dim)).astype(np.float32)
+        x /= np.linalg.norm(x, axis=1, keepdims=True)
+    else:
+        x, docs, metas = _from_collection(args.collection)
+    # Queries are perturbed copies of stored vectors, like paraphrased questions.
+    pick = rng.choice(len(x), size=min(args.queries, len(x)), replace=False)
+    q = x[pick] + 0.1 * rng.normal(size=(len(pick), x.shape[1])).astype(np.float32) / np.sqrt(x.shape[1])
+    report = run(x, q, min(args.k, len(x)), args.rescore, docs, metas)
+    for mode, row in report.items():
+        print(mode, " | ".join(f"{key}: {val}" for key, val in row.items()))
+    if args.json:
+        Path(args.json).write_text(json.dumps(report, indent=2), encoding="utf-8")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+"""End-to-end benchmark of retrieve() and answer(): latency, throughput, recall@k and MRR.
+
+    python -m bench.bench_rag --json rag.json
+    python -m bench.bench_rag --synthetic 2000 --concurrency 16 --llm-latency-ms 300
+
+The bundled ./data corpus (plus --synthetic distractor documents built from its
+vocabulary) is ingested into a separate --chroma-dir. The labelled queries in
+bench/queries.json are then run. A chunk counts as relevant when it comes from
+the labelled source and contains one of the labelled phrases. answer() talks to
+a local stub LLM (bench/stub_llm.py), so the numbers measure this service and
+not the OpenAI API. Retrieval runs with an empty embedding cache per query and
+the answer cache off, unless --warm-cache is given.
+
+Everything the app reads from the environment (VECTOR_BACKEND, FLAT_INDEX,
+QUANTIZE, HYBRID_SEARCH, RERANK_ENABLED, ...) applies, and the JSON report
+records it, so runs with different settings can be compared side by side.
+"""
+import argparse
+import json
+import os
+import random
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+
+QUERIES = Path(__file__).with_name("queries.json")
+# Settings that change what is measured; copied into the report.
+_SETTINGS = (
+    "EMBED_MODEL", "CHUNKER", "CHUNK_TOKENS", "TOP_K", "VECTOR_BACKEND", "FLAT_INDEX", "QUANTIZE",
+    "HYBRID_SEARCH", "RERANK_ENABLED", "RETRIEVAL_WORKERS",
+)
+
+def _stage_corpus(data: Path, dest: Path, synthetic: int, words: int, seed: int) -> Path:
+    """Link the data files into dest, giving suffix-less PDFs a .pdf name, and add synthetic documents."""
+    corpus = dest / "corpus"
+    corpus.mkdir(parents=True, exist_ok=True)
+    for p in sorted(data.rglob("*")):
+        if not p.is_file():
+            continue
+        name = p.name
+        if not p.suffix:
+            with p.open("rb") as f:
+                if f.read(5) == b"%PDF-":
+                    name += ".pdf"
+        link = corpus / name
+        if not link.exists():
+            link.symlink_to(p.resolve())
+    if synthetic:
+        from app.ingest import _discover, _extract
+        vocab = sorted({w for _, _, pages in _extract((p, {}) for p in _discover(corpus))
+                        for w in re.findall(r"[A-Za-z]{3,}", "\n".join(pages))})
+        rng = random.Random(seed)
+        syn = corpus / "synthetic"
+        syn.mkdir(exist_ok=True)
+        for i in range(synthetic):
+            path = syn / f"syn-{i:06d}.txt"
+            if not path.exists() and vocab:
+                sentences = [" ".join(rng.choices(vocab, k=12)).capitalize() + "." for _ in range(max(1, words // 12))]
+                path.write_text(" ".join(sentences), encoding="utf-8")
+    return corpus
+
+def _relevant(doc: str, meta: Dict, label: Dict) -> bool:
+    if label["source"] not in Path(meta.get("source", "")).name:
+        return False
+    text = " ".join(doc.split()).lower()
+    return any(" ".join(c.split()).lower() in text for c in label["contains"])
+
+def _latency(ms: List[float]) -> Dict[str, float]:
+    if not ms:
+        return {}
+    p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+    return {"n": len(ms), "mean_ms": round(float(np.mean(ms)), 3), "p50_ms": round(float(p50), 3),
+            "p95_ms": round(float(p95), 3), "p99_ms": round(float(p99), 3), "max_ms": round(max(ms), 3)}
+
+def run(labels: List[Dict], k: int, rounds: int, concurrency: int, warm_cache: bool = False) -> Dict:
+    import app.query as query
+
+    def _retrieve(q):
+        if not warm_cache:
+            query.embed_cache.clear()
+        return query.retrieve(q, k=k)
+
+    _retrieve(labels[0]["q"])  # load the model and open the index outside the timings
+    ranks: List[Optional[int]] = []
+    retrieve_ms = []
+    for rnd in range(rounds):
+        for label in labels:
+            t0 = time.perf_counter()
+            r = _retrieve(label["q"])
+            retrieve_ms.append((time.perf_counter() - t0) * 1000)
+            if rnd == 0:
+                hit = [i for i, (d, m) in enumerate(zip(r.documents, r.metadatas), 1) if _relevant(d, m, label)]
+                ranks.append(hit[0] if hit else None)
+
+    def _answer(q):
+        t0 = time.perf_counter()
+        query.generate(_retrieve(q))
+        return (time.perf_counter() - t0) * 1000
+
+    _answer(labels[0]["q"])  # the first call imports the OpenAI client and opens its connection
+    answer_ms = [_answer(label["q"]) for label in labels for _ in range(rounds)]
+    jobs = [label["q"] for _ in range(rounds) for label in labels]
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        load_ms = list(pool.map(_answer, jobs))
+    wall = time.perf_counter() - t0
+    found = [r for r in ranks if r is not None]
+    return {
+        "retrieve": {**_latency(retrieve_ms), f"recall@{k}": round(len(found) / len(ranks), 4),
+                     "mrr": round(sum(1.0 / r for r in found) / len(ranks), 4)},
+        "answer": _latency(answer_ms),
+        "load": {"concurrency": concurrency, "requests": len(jobs), "seconds": round(wall, 3),
+                 "qps": round(len(jobs) / wall, 2) if wall else None, **_latency(load_ms)},
+        "queries": [{"q": label["q"], "rank": r} for label, r in zip(labels, ranks)],
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark retrieval and answer latency, throughput and recall")
+    parser.add_argument("--data", default="./data", help="Corpus folder")
+    parser.add_argument("--queries", default=str(QUERIES), help="Labelled query set (JSON)")
+    parser.add_argument("--chroma-dir", default=".chroma-bench", help="Index folder used by the benchmark")
+    parser.add_argument("--synthetic", type=int, default=0, help="Add N synthetic distractor documents")
+    parser.add_argument("--synthetic-words", type=int, default=300, help="Words per synthetic document")
+    parser.add_argument("--k", type=int, default=5, help="Cutoff for recall@k and MRR")
+    parser.add_argument("--rounds", type=int, default=5, help="Passes over the query set per measurement")
+    parser.add_argument("--concurrency", type=int, default=8, help="Threads for the throughput run")
+    parser.add_argument("--llm-port", type=int, default=0, help="Port for the stub LLM (0 picks a free one)")
+    parser.add_argument("--llm-latency-ms", type=float, default=0.0, help="Simulated LLM response time")
+    parser.add_argument("--warm-cache", action="store_true", help="Keep the embedding and answer caches on")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="Write the report to this file")
+    args = parser.parse_args()
+
+    from bench.stub_llm import serve
+    llm = serve(args.llm_port, args.llm_latency_ms)
+    # app.config reads the environment on import, so everything is set before the first app import.
+    os.environ["CHROMA_DIR"] = args.chroma_dir
+    os.environ["OPENAI_BASE_URL"] = llm.url
+    os.environ["OPENAI_API_KEY"] = "stub"
+    if not args.warm_cache:
+        os.environ["ANSWER_CACHE_ENABLED"] = "0"
+
+    from app import config, ingest
+    from app.resources import get_store
+    corpus = _stage_corpus(Path(args.data), Path(args.chroma_dir), args.synthetic, args.synthetic_words, args.seed)
+    t0 = time.perf_counter()
+    ingest.main(["--data", str(corpus), "--collection", "docs"])
+    ingest_s = time.perf_counter() - t0
+
+    labels = json.loads(Path(args.queries).read_text(encoding="utf-8"))
+    report = {
+        "settings": {name: getattr(config, name) for name in _SETTINGS},
+        "corpus": {"files": len(ingest._discover(corpus)), "chunks": get_store("docs").count(),
+                   "ingest_seconds": round(ingest_s, 3)},
+        "llm_latency_ms": args.llm_latency_ms,
+        **run(labels, args.k, args.rounds, args.concurrency, args.warm_cache),
+        "llm_requests": llm.requests,
+    }
+    llm.shutdown()
+    for section in ("corpus", "retrieve", "answer", "load"):
+        print(section, " | ".join(f"{key}: {val}" for key, val in report[section].items()))
+    if args.json:
+        Path(args.json).write_text(json.dumps(report, indent=2), encoding="utf-8")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""Local stand-in for the OpenAI chat completions endpoint.
+
+    python -m bench.stub_llm --port 8900 --latency-ms 200
+    OPENAI_BASE_URL=http://127.0.0.1:8900/v1 OPENAI_API_KEY=stub uvicorn app.api:app
+
+Every completion answers with a fixed sentence after --latency-ms, either as
+one JSON response or as a server-sent event stream, and counts the requests it
+served so tests and benchmarks can tell whether the LLM was called.
+"""
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Tuple
+
+ANSWER = "This is a stub answer generated from the provided chunks."
+
+class StubLLM(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, addr: Tuple[str, int], latency_ms: float = 0.0, answer: str = ANSWER):
+        super().__init__(addr, _Handler)
+        self.latency_ms = latency_ms
+        self.answer = answer
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def count(self) -> None:
+        with self._lock:
+            self.requests += 1
+
+class _Handler(BaseHTTPRequestHandler):
+    server: StubLLM
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self.send_error(404)
+            return
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)) or b"{}")
+        self.server.count()
+        time.sleep(self.server.latency_ms / 1000)
+        model = body.get("model", "stub")
+        prompt_tokens = sum(len(str(m.get("content", "")).split()) for m in body.get("messages", []))
+        words = self.server.answer.split(" ")
+        usage = {"prompt_tokens": prompt_tokens, "completion_tokens": len(words),
+                 "total_tokens": prompt_tokens + len(words)}
+        if body.get("stream"):
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.end_headers()
+            for i, word in enumerate(words):
+                piece = word if i == 0 else " " + word
+                chunk = {"id": "stub", "object": "chat.completion.chunk", "created": int(time.time()), "model": model,
+                         "choices": [{"index": 0, "delta": {"content": piece}, "finish_reason": None}]}
+                self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+            if (body.get("stream_options") or {}).get("include_usage"):
+                chunk = {"id": "stub", "object": "chat.completion.chunk", "created": int(time.time()), "model": model,
+                         "choices": [], "usage": usage}
+                self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+            self.wfile.write(b"data: [DONE]\n\n")
+            return
+        payload = json.dumps({
+            "id": "stub", "object": "chat.completion", "created": int(time.time()), "model": model,
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": self.server.answer},
+                         "finish_reason": "stop"}],
+            "usage": usage,
+        }).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+def serve(port: int = 0, latency_ms: float = 0.0, answer: str = ANSWER) -> StubLLM:
+    """Start a stub server on a background thread; port 0 picks a free port."""
+    server = StubLLM(("127.0.0.1", port), latency_ms, answer)
+    threading.Thread(target=server.serve_forever, name="stub-llm", daemon=True).start()
+    return server
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve a stub OpenAI-compatible chat completions endpoint")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Delay before each response")
+    args = parser.parse_args()
+    server = StubLLM(("127.0.0.1", args.port), args.latency_ms)
+    print("Stub LLM listening on", server.url)
+    server.serve_forever()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+import hashlib
+import re
+
+import chromadb
+import numpy as np
+import pytest
+from chromadb.config import Settings
+
+import app.query as query
+import app.resources as resources
+
+class FakeEmbedder:
+    dim = 64
+
+    def __init__(self):
+        self.calls = 0
+
+    def encode(self, texts, convert_to_numpy=True, **kwargs):
+        self.calls += 1
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for w in re.findall(r"\w+", text.lower()):
+                out[row, int(hashlib.md5(w.encode()).hexdigest(), 16) % self.dim] += 1.0
+        norms = np.linalg.norm(out, axis=1, keepdims=True)
+        return out / np.where(norms == 0, 1, norms)
+
+@pytest.fixture
+def rag_env(tmp_path, monkeypatch):
+    embedder = FakeEmbedder()
+    client = chromadb.PersistentClient(path=str(tmp_path / "chroma"), settings=Settings(anonymized_telemetry=False))
+    monkeypatch.setattr(resources, "_embedder", embedder)
+    monkeypatch.setattr(resources, "_client", client)
+    monkeypatch.setattr(resources, "_collections", {})
+    monkeypatch.setattr(resources, "_lexical", {})
+    monkeypatch.setattr(resources, "_stores", {})
+    monkeypatch.setattr(resources, "_last_used", {})
+    monkeypatch.setattr(resources, "CHROMA_DIR", str(tmp_path / "chroma"))
+    query.embed_cache.clear()
+    monkeypatch.setattr(query.answer_cache, "path", str(tmp_path / "answer_cache.sqlite3"))
+    monkeypatch.setattr(query.answer_cache, "_conn", None)
+    col = resources.get_collection("docs")
+    texts = [
+        "Food labels must list allergens such as peanuts and milk.",
+        "Organic certification requires three years without prohibited substances.",
+        "Meat inspection is performed by the Food Safety and Inspection Service.",
+        "Dairy farms must pasteurize milk before sale.",
+        "Nutrition labeling requirements are codified at 21 CFR 101.9.",
+    ]
+    ids = [f"doc-{i}" for i in range(len(texts))]
+    sources = [f"data/doc{i}.txt" for i in range(len(texts))]
+    store = resources.get_store("docs")
+    store.upsert(ids, embedder.encode(texts), texts, [{"source": s} for s in sources])
+    resources.get_lexical("docs").upsert(ids, texts, sources)
+    embedder.calls = 0
+    return {"embedder": embedder, "collection": col, "store": store, "tmp_path": tmp_path}
+
+def _make_pdf(path, pages):
+    """Write a minimal PDF with one line of Helvetica text per page."""
+    objs = ["<< /Type /Catalog /Pages 2 0 R >>", None, "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for text in pages:
+        stream = f"BT /F1 12 Tf 72 720 Td ({text}) Tj ET".encode()
+        objs.append(f"<< /Length {len(stream)} >>\nstream\n{stream.decode()}\nendstream")
+        objs.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {len(objs)} 0 R >>"
+        )
+        kids.append(f"{len(objs)} 0 R")
+    objs[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(kids)} >>"
+    out, offsets = bytearray(b"%PDF-1.4\n"), []
+    for i, body in enumerate(objs, 1):
+        offsets.append(len(out))
+        out += f"{i} 0 obj\n{body}\nendobj\n".encode()
+    xref = len(out)
+    out += f"xref\n0 {len(objs) + 1}\n0000000000 65535 f \n".encode()
+    out += "".join(f"{o:010d} 00000 n \n" for o in offsets).encode()
+    out += f"trailer\n<< /Size {len(objs) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    path.write_bytes(bytes(out))
+
+@pytest.fixture
+def make_pdf():
+    return _make_pdf
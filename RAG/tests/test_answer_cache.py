@@ -0,0 +1,55 @@
+import numpy as np
+
+from app.answer_cache import AnswerCache
+
+def test_near_duplicate_hits_only_with_same_chunks(tmp_path):
+    path = str(tmp_path / "answers.sqlite3")
+    cache = AnswerCache(path, threshold=0.95, max_entries=10)
+    q = np.array([1.0, 0.0, 0.0], dtype=np.float32)
+    cache.store(q, ["a", "b"], "forty-two", ["src.txt"])
+
+    near = np.array([0.99, 0.05, 0.0], dtype=np.float32)
+    far = np.array([0.0, 1.0, 0.0], dtype=np.float32)
+    assert cache.lookup(near, ["a", "b"]) == ("forty-two", ["src.txt"])
+    assert cache.lookup(near, ["a", "c"]) is None
+    assert cache.lookup(far, ["a", "b"]) is None
+
+    reopened = AnswerCache(path, threshold=0.95, max_entries=10)
+    assert reopened.lookup(q, ["a", "b"])[0] == "forty-two"
+
+def test_evicts_least_recently_hit(tmp_path):
+    cache = AnswerCache(str(tmp_path / "answers.sqlite3"), threshold=0.99, max_entries=2)
+    vecs = np.eye(3, dtype=np.float32)
+    for i in range(3):
+        cache.store(vecs[i], [str(i)], f"ans{i}", [])
+    assert cache.lookup(vecs[0], ["0"]) is None
+    assert cache.stats()["size"] == 2
+
+def test_key_covers_chunk_text_and_exact_question(tmp_path):
+    cache = AnswerCache(str(tmp_path / "answers.sqlite3"), threshold=0.999, max_entries=10)
+    q = np.array([1.0, 0.0], dtype=np.float32)
+    cache.store(q, ["a", "b"], "old", [], contents=["milk", "eggs"], question="What is in it?")
+    assert cache.lookup(q, ["a", "b"], ["milk", "eggs"])[0] == "old"
+    assert cache.lookup(q, ["a", "b"], ["milk", "soy"]) is None
+    assert cache.lookup(q, ["b", "a"], ["eggs", "milk"]) is None
+    other = np.array([0.0, 1.0], dtype=np.float32)
+    assert cache.lookup(other, ["a", "b"], ["milk", "eggs"], question="What is in it?")[0] == "old"
+    assert AnswerCache(cache.path, 0.999, 10, scope="other").lookup(q, ["a", "b"], ["milk", "eggs"]) is None
+
+def test_evicts_least_recently_hit_beyond_max_bytes(tmp_path):
+    cache = AnswerCache(str(tmp_path / "answers.sqlite3"), threshold=0.99, max_entries=100, max_bytes=2500)
+    vecs = np.eye(4, dtype=np.float32)
+    for i in range(3):
+        cache.store(vecs[i], [str(i)], "x" * 1000, [])
+    assert cache.lookup(vecs[0], ["0"]) is None and cache.lookup(vecs[1], ["1"]) is not None
+    cache.store(vecs[3], ["3"], "x" * 1000, [])
+    assert cache.lookup(vecs[2], ["2"]) is None and cache.lookup(vecs[1], ["1"]) is not None
+    assert cache.stats()["bytes"] <= 2500
+
+def test_store_replaces_the_answer_for_the_same_key(tmp_path):
+    cache = AnswerCache(str(tmp_path / "answers.sqlite3"), threshold=0.95, max_entries=10)
+    q = np.array([1.0, 0.0], dtype=np.float32)
+    cache.store(q, ["a"], "OLD", [], contents=["milk"], question="q")
+    cache.store(q, ["a"], "NEW", [], contents=["milk"], question="q")
+    assert cache.lookup(q, ["a"], ["milk"], "q")[0] == "NEW"
+    assert cache.stats()["size"] == 1
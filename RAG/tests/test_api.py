@@ -0,0 +1,167 @@
+from fastapi.testclient import TestClient
+
+import app.api as api
+
+def test_query_retrieves_once_and_honours_k(rag_env, monkeypatch):
+    monkeypatch.setattr("app.query.OPENAI_API_KEY", "")
+    client = TestClient(api.app)
+    resp = client.post("/query", json={"q": "milk allergens", "k": 2})
+    assert resp.status_code == 200
+    body = resp.json()
+    assert len(body["sources"]) == 2
+    assert body["answer"].count("\n---\n") == 1
+    assert rag_env["embedder"].calls == 1
+    for bad in (0, -1, 10_000):
+        assert client.post("/query", json={"q": "milk", "k": bad}).status_code == 422
+        assert client.post("/query/batch", json={"qs": ["milk"], "k": bad}).status_code == 422
+
+def test_repeat_query_hits_embedding_cache(rag_env, monkeypatch):
+    monkeypatch.setattr("app.query.OPENAI_API_KEY", "")
+    client = TestClient(api.app)
+    before = client.get("/cache/stats").json()["embeddings"]
+    client.post("/query", json={"q": "Milk allergens"})
+    client.post("/query", json={"q": "  milk   ALLERGENS "})
+    assert rag_env["embedder"].calls == 1
+    after = client.get("/cache/stats").json()["embeddings"]
+    assert after["hits"] - before["hits"] == 1
+    assert after["misses"] - before["misses"] == 1
+
+def test_near_duplicate_question_reuses_generated_answer(rag_env, monkeypatch):
+    calls = []
+    monkeypatch.setattr("app.query.OPENAI_API_KEY", "sk-test")
+    async def fake_llm(q, ctx):
+        calls.append(q)
+        return "cached answer"
+
+    monkeypatch.setattr("app.query._agenerate_with_openai", fake_llm)
+    client = TestClient(api.app)
+    first = client.post("/query", json={"q": "milk allergens"}).json()
+    second = client.post("/query", json={"q": "allergens, milk?"}).json()
+    assert calls == ["milk allergens"]
+    assert second == first
+
+def test_batch_query_encodes_and_searches_once(rag_env, monkeypatch):
+    monkeypatch.setattr("app.query.OPENAI_API_KEY", "")
+    col = rag_env["collection"]
+    searches = []
+    real_query = col.query
+    monkeypatch.setattr(col, "query", lambda **kw: searches.append(kw) or real_query(**kw))
+    client = TestClient(api.app)
+    qs = ["organic certification", "meat inspection", "Organic  certification"]
+    body = client.post("/query/batch", json={"qs": qs, "k": 1}).json()
+    assert rag_env["embedder"].calls == 1
+    assert len(searches) == 1 and len(searches[0]["query_embeddings"]) == 3
+    assert [r["sources"] for r in body["results"]] == [["data/doc1.txt"], ["data/doc2.txt"], ["data/doc1.txt"]]
+
+def test_batch_generation_runs_concurrently_up_to_limit(rag_env, monkeypatch):
+    import asyncio
+
+    monkeypatch.setattr("app.query.OPENAI_API_KEY", "sk-test")
+    monkeypatch.setattr("app.query.ANSWER_CACHE_ENABLED", False)
+    monkeypatch.setattr("app.runtime.GENERATION_CONCURRENCY", 2)
+    active, peak = [0], [0]
+
+    async def slow_llm(q, ctx):
+        active[0] += 1
+        peak[0] = max(peak[0], active[0])
+        await asyncio.sleep(0.05)
+        active[0] -= 1
+        return q.upper()
+
+    monkeypatch.setattr("app.query._agenerate_with_openai", slow_llm)
+    client = TestClient(api.app)
+    qs = ["milk", "meat", "organic", "dairy", "labels"]
+    body = client.post("/query/batch", json={"qs": qs}).json()
+    assert [r["answer"] for r in body["results"]] == [q.upper() for q in qs]
+    assert peak[0] == 2
+
+def _fake_stream(pieces, closed):
+    async def stream(question, contexts):
+        try:
+            for p in pieces:
+                yield p
+        finally:
+            closed.append(True)
+    return stream
+
+def test_stream_sends_sources_then_tokens(rag_env, monkeypatch):
+    import json
+
+    closed = []
+    monkeypatch.setattr("app.query.OPENAI_API_KEY", "sk-test")
+    monkeypatch.setattr("app.query._astream_openai", _fake_stream(["Milk ", "is ", "an allergen."], closed))
+    client = TestClient(api.app)
+    with client.stream("POST", "/query/stream", json={"q": "milk allergens", "k": 2}) as resp:
+        assert resp.headers["content-type"].startswith("text/event-stream")
+        frames = [f for f in resp.read().decode().split("\n\n") if f]
+    events = [(f.split("\n")[0][len("event: "):], json.loads(f.split("\n")[1][len("data: "):])) for f in frames]
+    assert events[0][0] == "sources" and len(events[0][1]["sources"]) == 2
+    assert "".join(d["text"] for e, d in events if e == "token") == "Milk is an allergen."
+    assert events[-1][0] == "done"
+    assert closed == [True]
+
+def test_closing_answer_stream_closes_upstream(rag_env, monkeypatch):
+    import asyncio
+    import app.query as query
+
+    closed = []
+    monkeypatch.setattr("app.query.OPENAI_API_KEY", "sk-test")
+    monkeypatch.setattr("app.query._astream_openai", _fake_stream(["a", "b", "c"], closed))
+    r = query.retrieve("milk")
+
+    async def consume_one():
+        gen = query.astream_answer(r)
+        first = await gen.__anext__()
+        await gen.aclose()
+        return first
+
+    assert asyncio.run(consume_one()) == "a"
+    assert closed == [True]
+    assert query.answer_cache.stats()["size"] == 0
+
+def test_query_and_stream_against_local_llm_stub(rag_env, monkeypatch):
+    import app.query as query
+    from bench.stub_llm import ANSWER, serve
+
+    llm = serve()
+    monkeypatch.setattr("app.query.OPENAI_API_KEY", "stub")
+    monkeypatch.setattr("app.query.OPENAI_BASE_URL", llm.url)
+    monkeypatch.setattr("app.query._openai_client", None)
+    monkeypatch.setattr("app.query.ANSWER_CACHE_ENABLED", False)
+    try:
+        client = TestClient(api.app)
+        assert client.post("/query", json={"q": "milk allergens"}).json()["answer"] == ANSWER
+        with client.stream("POST", "/query/stream", json={"q": "milk allergens"}) as resp:
+            body = resp.read().decode()
+        assert body.count("event: token") == len(ANSWER.split(" "))
+        assert query.answer("milk allergens") == ANSWER
+        assert llm.requests == 3
+    finally:
+        llm.shutdown()
+
+def test_answer_cache_serves_repeats_and_honours_cache_control(rag_env, monkeypatch):
+    import app.query as query
+    from bench.stub_llm import serve
+
+    llm = serve(answer="OLD")
+    monkeypatch.setattr("app.query.OPENAI_API_KEY", "stub")
+    monkeypatch.setattr("app.query.OPENAI_BASE_URL", llm.url)
+    monkeypatch.setattr("app.query._openai_client", None)
+    try:
+        client = TestClient(api.app)
+        for _ in range(3):
+            assert client.post("/query", json={"q": "milk allergens"}).json()["answer"] == "OLD"
+        assert llm.requests == 1
+        llm.answer = "NEW"
+        assert client.post("/query", json={"q": "milk allergens"},
+                           headers={"Cache-Control": "no-cache"}).json()["answer"] == "NEW"
+        assert client.post("/query", json={"q": "milk allergens"}).json()["answer"] == "NEW"
+        assert llm.requests == 2 and query.answer_cache.stats()["size"] == 1
+        client.post("/query", json={"q": "pasteurize"}, headers={"Cache-Control": "no-store"})
+        client.post("/query", json={"q": "pasteurize"})
+        assert llm.requests == 4
+        with client.stream("POST", "/query/stream", json={"q": "pasteurize"}) as resp:
+            resp.read()
+        assert llm.requests == 4
+    finally:
+        llm.shutdown()
@@ -0,0 +1,30 @@
+from app.cache import TTLCache
+
+class _Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+def test_lru_eviction_and_stats():
+    c = TTLCache(maxsize=2, ttl=60)
+    c.put("a", 1)
+    c.put("b", 2)
+    assert c.get("a") == 1
+    c.put("c", 3)
+    assert c.get("b") is None
+    assert c.get("a") == 1 and c.get("c") == 3
+    st = c.stats()
+    assert (st["hits"], st["misses"], st["evictions"]) == (3, 1, 1)
+
+def test_entries_expire_after_ttl():
+    clock = _Clock()
+    c = TTLCache(maxsize=4, ttl=10, clock=clock)
+    c.put("a", 1)
+    clock.now = 9.9
+    assert c.get("a") == 1
+    clock.now = 10.0
+    assert c.get("a") is None
+    assert c.stats()["expirations"] == 1
+    assert len(c) == 0
@@ -0,0 +1,40 @@
+from app.chunking import approx_token_count, char_chunks, get_chunker, sentence_chunks
+
+TEXT = (
+    "Food labels must list allergens. Milk and peanuts are common examples!\n\n"
+    "Section 21 CFR 101.9 covers nutrition labeling. It applies to most packaged foods. "
+    "Exemptions exist for small businesses."
+)
+
+def _texts(spans):
+    return [TEXT[s:e] for s, e in spans]
+
+def test_char_chunks_match_fixed_window():
+    spans = list(char_chunks("abcdefghij", 4, 1))
+    assert spans == [(0, 4), (3, 7), (6, 10)]
+
+def test_sentence_chunks_respect_boundaries_and_budget():
+    chunks = _texts(sentence_chunks(TEXT, max_tokens=12))
+    assert chunks[0] == "Food labels must list allergens."
+    assert "Section 21 CFR 101.9 covers nutrition labeling." in chunks
+    assert all(c[-1] in ".!" for c in chunks)
+    assert max(approx_token_count(chunks)) <= 12
+
+def test_sentence_chunks_keep_paragraphs_together_when_they_fit():
+    chunks = _texts(sentence_chunks(TEXT, max_tokens=24))
+    assert chunks[0] == "Food labels must list allergens. Milk and peanuts are common examples!"
+    assert chunks[1].startswith("Section 21 CFR 101.9")
+
+def test_oversized_sentence_is_split_at_whitespace():
+    text = " ".join(f"w{i}" for i in range(50))
+    chunks = [text[s:e] for s, e in sentence_chunks(text, max_tokens=10)]
+    assert len(chunks) == 5
+    assert " ".join(chunks) == text
+
+def test_get_chunker_rejects_unknown_name():
+    try:
+        get_chunker("nope", 500, 100, 200)
+    except ValueError as e:
+        assert "nope" in str(e)
+    else:
+        raise AssertionError("expected ValueError")
@@ -0,0 +1,79 @@
+import time
+
+from fastapi.testclient import TestClient
+
+import app.api as api
+import app.query as query
+import app.resources as resources
+
+def _seed(rag_env, name, texts):
+    store = resources.get_store(name)
+    ids = [f"{name}-{i}" for i in range(len(texts))]
+    store.upsert(ids, rag_env["embedder"].encode(texts), texts, [{"source": f"{name}/{i}.txt"} for i in range(len(texts))])
+    resources.get_lexical(name).upsert(ids, texts, [f"{name}/{i}.txt" for i in range(len(texts))])
+
+def test_query_selects_collection(rag_env, monkeypatch):
+    monkeypatch.setattr("app.query.OPENAI_API_KEY", "")
+    _seed(rag_env, "legal", ["Vendors must keep shelf price records.", "Cash refunds are not allowed."])
+    client = TestClient(api.app)
+    body = client.post("/query", json={"q": "cash refunds", "k": 2, "collection": "legal"}).json()
+    assert sorted(body["sources"]) == ["legal/0.txt", "legal/1.txt"]
+    assert all(s.startswith("data/") for s in client.post("/query", json={"q": "cash refunds"}).json()["sources"])
+    assert client.post("/query", json={"q": "x", "collection": "missing"}).status_code == 404
+    assert client.post("/query", json={"q": "x", "collection": "../etc"}).status_code == 422
+    assert "missing" not in resources.list_collections()
+    listed = client.get("/collections").json()
+    assert {"docs", "legal"} <= set(listed["collections"]) and listed["default"] == "docs"
+
+def test_idle_collections_are_evicted_and_reopened(rag_env):
+    _seed(rag_env, "legal", ["Cash refunds are not allowed."])
+    assert query.retrieve("refunds", k=1, collection="legal").ids == ["legal-0"]
+    assert resources.evict_idle(max_idle=60, now=time.monotonic() + 30) == []
+    assert resources.evict_idle(max_idle=60, now=time.monotonic() + 120) == ["legal"]
+    assert set(resources._stores) == {"docs"} and "legal" not in resources._lexical
+    assert query.retrieve("refunds", k=1, collection="legal").ids == ["legal-0"]
+    assert "legal" in resources._stores
+
+def test_touching_new_collections_during_a_sweep_is_safe(rag_env, monkeypatch):
+    import threading
+
+    monkeypatch.setattr(resources, "_last_sweep", float("inf"))  # no sweeps from touch() itself
+    errors, stop = [], threading.Event()
+
+    def sweep():
+        while not stop.is_set():
+            try:
+                resources.evict_idle(max_idle=3600)
+            except Exception as e:
+                errors.append(e)
+                return
+
+    t = threading.Thread(target=sweep)
+    t.start()
+    for i in range(20000):
+        resources.touch(f"c{i}")
+    stop.set()
+    t.join()
+    assert errors == [] and len(resources._last_used) >= 20000
+
+def test_flat_and_quantized_retrieves_keep_a_collection_open(rag_env, monkeypatch):
+    from app.ingest import export_flat, export_quantized
+
+    export_flat(rag_env["store"], resources.flat_path("legal"))
+    export_quantized(rag_env["store"], resources.quantized_path("legal"), "int8")
+    monkeypatch.setattr(resources, "_last_sweep", float("inf"))
+    for flat, quant in ((True, "none"), (False, "int8")):
+        monkeypatch.setattr(query, "FLAT_INDEX", flat)
+        monkeypatch.setattr(query, "QUANTIZE", quant)
+        resources._last_used.clear()
+        assert query.retrieve("milk", k=1, collection="legal").ids
+        assert "legal" not in resources.open_collections()  # its vector store was never opened
+        assert resources.evict_idle(max_idle=60, now=time.monotonic() + 30) == []
+        assert resources.evict_idle(max_idle=60, now=time.monotonic() + 120) == ["legal"]
+
+def test_default_collection_is_used_without_a_name_and_never_evicted(rag_env):
+    assert resources.get_store() is resources.get_store(resources.COLLECTION)
+    assert resources.get_lexical() is resources.get_lexical(resources.COLLECTION)
+    assert resources.evict_idle(max_idle=0, now=time.monotonic() + 10**6) == []
+    assert resources.open_collections() == [resources.COLLECTION]
+    assert TestClient(api.app).get("/collections").json()["open"] == [resources.COLLECTION]
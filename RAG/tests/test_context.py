@@ -0,0 +1,41 @@
+from app.chunking import approx_token_count, char_chunks, sentence_chunks
+from app.context import merge_passages, pack
+from app.query import Retrieval
+
+_WORDS = "milk cheese vendor permit dairy store label price state rule order farm".split()
+TEXT = " ".join(" ".join(_WORDS[(i * 7 + j * j) % len(_WORDS)] for j in range(4 + i % 5)).capitalize() + f" {i}."
+                for i in range(60))
+
+def _chunks(spans, **meta):
+    spans = list(spans)
+    return [TEXT[s:e] for s, e in spans], [dict(meta, start=s, end=e) for s, e in spans]
+
+def test_overlapping_and_adjacent_chunks_merge_back_into_page_text():
+    docs, metas = _chunks(char_chunks(TEXT, 300, 80), source="a.pdf", page=1)
+    order = [3, 0, 2, 1]
+    merged = merge_passages([docs[i] for i in order], [metas[i] for i in order])
+    assert merged == [(TEXT[:metas[3]["end"]], 0)]
+
+    docs, metas = _chunks(sentence_chunks(TEXT, 30), source="a.pdf", page=1)
+    (text, rank), = merge_passages(docs[2::-1], metas[2::-1])
+    assert text.replace("\n", " ") == TEXT[:metas[2]["end"]] and rank == 0
+
+def test_separate_pages_and_distant_chunks_stay_apart_and_contained_text_is_dropped():
+    docs, metas = _chunks(char_chunks(TEXT, 200, 0), source="a.pdf", page=1)
+    picked = [docs[5], docs[0], docs[0][20:90], docs[1]]
+    meta = [metas[5], metas[0], {"source": "a.pdf", "page": 1}, dict(metas[1], page=2)]
+    assert merge_passages(picked, meta) == [(docs[5], 0), (docs[0], 1), (docs[1], 3)]
+    # Without offsets, overlap is found from the text itself.
+    plain = [{"source": "b.md"}] * 2
+    assert merge_passages([TEXT[100:400], TEXT[300:600]], plain) == [(TEXT[100:600], 0)]
+
+def test_pack_fills_budget_by_rank_and_truncates_an_oversized_best_passage():
+    docs = ["alpha " * 50, "beta " * 200, "gamma " * 30]
+    metas = [{"source": s} for s in "xyz"]
+    assert pack(docs, metas, 100) == [docs[0], docs[2]]
+    assert pack(docs, metas, 0) == docs
+    cut = pack(docs[1:], metas[1:], 40)
+    assert len(cut) == 1 and approx_token_count(cut)[0] <= 40 and docs[1].startswith(cut[0])
+    r = Retrieval("q", ids=["1", "2"], documents=[TEXT[:300], TEXT[250:500]],
+                  metadatas=[{"source": "s", "start": 0, "end": 300}, {"source": "s", "start": 250, "end": 500}])
+    assert r.contexts == [TEXT[:500]]
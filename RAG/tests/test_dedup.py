@@ -0,0 +1,64 @@
+import json
+import sys
+
+import app.ingest as ingest
+from app.dedup import DedupIndex, minhash
+from app.resources import get_collection
+
+PREAMBLE = (
+    "AGENCY: Food and Nutrition Service (FNS), Department of Agriculture (USDA). ACTION: Proposed rule. "
+    "SUMMARY: This rulemaking proposes to modernize the Special Supplemental Nutrition Program for Women, "
+    "Infants, and Children by allowing online ordering and transactions, and by updating vendor "
+    "authorization requirements for State agencies. DATES: To be assured of consideration, written "
+    "comments must be received on or before {date}."
+)
+
+def _run(monkeypatch, data, *extra):
+    monkeypatch.setattr(sys, "argv", ["ingest", "--data", str(data), "--collection", "dedup_test", *extra])
+    ingest.main()
+
+def test_minhash_index_matches_near_duplicates_only(tmp_path):
+    ix = DedupIndex(str(tmp_path / "dedup.sqlite3"))
+    ix.add("a", "s1", minhash(PREAMBLE.format(date="April 24, 2023")))
+    assert ix.match(minhash("  " + PREAMBLE.format(date="April 24, 2023").upper())) == "a"
+    # A different date is different content, not boilerplate.
+    assert ix.match(minhash(PREAMBLE.format(date="May 1, 2023"))) is None
+    assert ix.match(minhash("Kitchen staff want a simpler menu than the admin proposed.")) is None
+
+def test_ingest_skips_duplicate_chunks_and_reingests_their_holders(rag_env, monkeypatch):
+    monkeypatch.setattr(ingest, "CHROMA_DIR", str(rag_env["tmp_path"] / "chroma"))
+    data = rag_env["tmp_path"] / "data"
+    data.mkdir()
+    a_text = PREAMBLE.format(date="April 24, 2023")
+    b_text = a_text.upper()
+    (data / "a.txt").write_text(a_text)
+    (data / "b.txt").write_text(b_text)
+    (data / "c.txt").write_text(PREAMBLE.format(date="May 1, 2023"))
+    embedder = rag_env["embedder"]
+    encoded = []
+    real_encode = embedder.encode
+    monkeypatch.setattr(embedder, "encode", lambda texts, **kw: encoded.extend(texts) or real_encode(texts, **kw))
+    _run(monkeypatch, data, "--dedup")
+
+    report = json.loads((rag_env["tmp_path"] / "chroma" / "ingest-report-dedup_test.json").read_text())
+    assert report["counts"]["chunks"] == 3 and report["counts"]["duplicates"] == 1
+    assert len(encoded) == 2
+    col = get_collection("dedup_test")
+    got = col.get(where={"source": str(data / "a.txt")}, include=["metadatas"])
+    assert got["metadatas"][0]["sources"] == f"{data / 'a.txt'}\n{data / 'b.txt'}"
+
+    (data / "a.txt").unlink()
+    _run(monkeypatch, data, "--dedup")
+    # b.txt only held a copy of a.txt's chunk, so its own text is embedded now.
+    assert len(encoded) == 3 and encoded[-1] == b_text
+    got = col.get(include=["metadatas", "documents"])
+    by_source = {m["source"]: (m, d) for m, d in zip(got["metadatas"], got["documents"])}
+    assert set(by_source) == {str(data / "b.txt"), str(data / "c.txt")}
+    assert by_source[str(data / "b.txt")] == (
+        {**by_source[str(data / "b.txt")][0], "sources": str(data / "b.txt")}, b_text)
+    manifest = json.loads((rag_env["tmp_path"] / "chroma" / "manifest-dedup_test.json").read_text())["files"]
+    assert "stale" not in manifest[str(data / "b.txt")]
+
+    _run(monkeypatch, data)
+    assert col.count() == 2 and len(encoded) == 5
+    assert DedupIndex(str(rag_env["tmp_path"] / "chroma" / "dedup-dedup_test.sqlite3")).count() == (0, 0)
@@ -0,0 +1,108 @@
+import sys
+
+import numpy as np
+from fastapi.testclient import TestClient
+
+import app.api as api
+import app.ingest as ingest
+import app.query as query
+import app.resources as resources
+from app.docmeta import _text_date
+from app.flat import FlatIndex
+from app.query import build_where
+from app.store import ChromaStore, HnswStore, matches, where_sql
+
+def test_where_filters_agree_across_backends(rag_env, monkeypatch):
+    x = np.random.default_rng(1).normal(size=(400, 16)).astype(np.float32)
+    x /= np.linalg.norm(x, axis=1, keepdims=True)
+    ids = [f"c{i}" for i in range(len(x))]
+    metas = [{"source": f"s{i % 5}", "doc_set": "ab"[i % 2], "date": 20230101 + i % 28} for i in range(len(x))]
+    docs = [f"text {i}" for i in ids]
+    where = build_where(sources=["s0", "s1", "s2"], date_from="2023-01-05", doc_sets=["b"])
+    allowed = {i for i, m in zip(ids, metas) if matches(m, where)}
+    expect = [sorted(allowed, key=lambda i: float(((x[int(i[1:])] - q) ** 2).sum()))[:5] for q in x[:3]]
+
+    chroma = ChromaStore(resources.get_collection("filters"))
+    chroma.upsert(ids, x, docs, metas)
+    hnsw = HnswStore(str(rag_env["tmp_path"] / "hnsw"), "docs")
+    hnsw.upsert(ids, x, docs, metas)
+    flat = FlatIndex.build(str(rag_env["tmp_path"] / "flat"), ids, x, docs, metas)
+    assert [[h[0] for h in row] for row in flat.search(x[:3], 5, where)] == expect
+    assert [[h[0] for h in row] for row in chroma.query(x[:3], 5, where)] == expect
+    assert [[h[0] for h in row] for row in hnsw.query(x[:3], 5, where)] == expect
+    monkeypatch.setattr(HnswStore, "EXACT_FILTER_LIMIT", 0)
+    assert [[h[0] for h in row] for row in hnsw.query(x[:3], 5, where)] == expect
+    sql, params = where_sql({"$or": [{"doc_set": "a"}, {"source": {"$nin": ["s1"]}}]})
+    assert sql.count("json_extract") == 2 and params[-1] == "s1"
+
+def test_flat_index_filters_on_columns_like_matches(tmp_path, monkeypatch):
+    x = np.random.default_rng(2).normal(size=(60, 8)).astype(np.float32)
+    ids = [f"c{i}" for i in range(len(x))]
+    metas = [{"source": f"s{i % 4}", "date": 20230101 + i % 9, **({"doc_set": "ab"[i % 2]} if i % 3 else {})}
+             for i in range(len(x))]
+    flat = FlatIndex.build(str(tmp_path / "flat"), ids, x, [""] * len(x), metas)
+    reads = []
+    real = FlatIndex._record
+    monkeypatch.setattr(FlatIndex, "_record", lambda self, row: reads.append(row) or real(self, row))
+    hits = 0
+    for where in ({"date": {"$lt": 20230104}}, {"date": {"$lte": 20230104, "$gt": 20230102}},
+                  {"doc_set": {"$ne": "a"}}, {"source": {"$nin": ["s0", "s9"]}}, {"doc_set": "b"},
+                  {"$or": [{"source": "s1"}, {"date": {"$gte": 20230300}}]}, {"date": {"$in": [20230105, 1]}}):
+        expect = [i for i, m in zip(ids, metas) if matches(m, where)]
+        found = flat.search(x[:1], len(x), where)[0]
+        assert sorted(h[0] for h in found) == sorted(expect), where
+        hits += len(found)
+    assert len(reads) == hits  # chunks.jsonl is only read for hits, never to filter
+    assert flat.can_filter(build_where(sources=["s0"], date_from="2023-01-01")) and not flat.can_filter({"page": 1})
+
+def test_retrieve_sends_filters_the_flat_index_cannot_evaluate_to_the_store(rag_env, monkeypatch):
+    ingest.export_flat(rag_env["store"], resources.flat_path("docs"))
+    monkeypatch.setattr(query, "FLAT_INDEX", True)
+    assert query.retrieve("milk", k=1, where={"source": "data/doc3.txt"}).sources == ["data/doc3.txt"]
+    monkeypatch.setattr(resources.get_flat("docs"), "search", None)
+    r = query.retrieve("milk", k=1, where={"$or": [{"source": "data/doc3.txt"}, {"page": 1}]})
+    assert r.sources == ["data/doc3.txt"]
+
+def test_text_dates_need_a_real_month_name_and_query_dates_must_exist():
+    assert _text_date("Decided 3, 2019. The market 12, 2020 report; Junk 1, 2020") is None
+    assert [_text_date(t) for t in ("Feb. 23, 2023", "September 3, 2021", "sept 3, 2021", "May 5, 2020")] == [
+        20230223, 20210903, 20210903, 20200505]
+    assert build_where(date_from="20230223") == build_where(date_from="2023-02-23") == {"date": {"$gte": 20230223}}
+    for bad in ("2023-13-45", "2023-02-29", "2023-0223", "2023-W01-1"):
+        try:
+            build_where(date_to=bad)
+        except ValueError:
+            continue
+        raise AssertionError(bad)
+
+def test_ingest_records_page_title_date_and_query_filters(rag_env, monkeypatch, make_pdf):
+    monkeypatch.setattr(ingest, "CHROMA_DIR", str(rag_env["tmp_path"] / "chroma"))
+    data = rag_env["tmp_path"] / "data"
+    (data / "rules").mkdir(parents=True)
+    make_pdf(data / "rules" / "wic.pdf", ["Thursday, February 23, 2023 WIC vendors", "online ordering of milk"])
+    (data / "notes.md").write_text("# Dairy notes\n\nPasteurize milk before sale.")
+    monkeypatch.setattr(sys, "argv", ["ingest", "--data", str(data), "--collection", "docs"])
+    ingest.main()
+
+    got = rag_env["collection"].get(where={"source": {"$in": [str(data / "rules" / "wic.pdf")]}},
+                                    include=["metadatas"])
+    metas = sorted(got["metadatas"], key=lambda m: m["page"])
+    assert [m["page"] for m in metas] == [1, 2]
+    assert metas[0]["date"] == 20230223 and metas[0]["doc_set"] == "rules"
+    assert metas[0]["title"] == "Thursday, February 23, 2023 WIC vendors"
+
+    r = query.retrieve("milk", k=10, where=build_where(doc_sets=["rules"]))
+    assert set(r.sources) == {str(data / "rules" / "wic.pdf")}
+    assert f"{data / 'rules' / 'wic.pdf'}#page=2" in r.citations
+    r = query.retrieve("milk", k=10, where=build_where(doc_sets=["default"], date_to="2023-02-22"))
+    assert r.ids == []
+    notes = query.retrieve("milk", k=10, where=build_where(sources=[str(data / "notes.md")]))
+    assert notes.metadatas[0]["title"] == "Dairy notes" and "page" not in notes.metadatas[0]
+
+def test_query_endpoint_applies_filters(rag_env, monkeypatch):
+    monkeypatch.setattr("app.query.OPENAI_API_KEY", "")
+    client = TestClient(api.app)
+    body = client.post("/query", json={"q": "milk", "k": 5, "sources": ["data/doc3.txt"]}).json()
+    assert body["sources"] == ["data/doc3.txt"] and body["citations"] == ["data/doc3.txt"]
+    assert client.post("/query", json={"q": "milk", "date_from": "last week"}).status_code == 422
+    assert client.post("/query", json={"q": "milk", "date_to": "2023-13-45"}).status_code == 422
@@ -0,0 +1,47 @@
+import numpy as np
+
+import app.query as query
+import app.resources as resources
+from app.flat import FlatIndex
+from app.ingest import export_flat
+from app.resources import flat_path
+
+def test_flat_index_returns_exact_neighbours_with_text(tmp_path):
+    x = np.random.default_rng(0).normal(size=(500, 32)).astype(np.float32)
+    ids = [f"c{i}" for i in range(len(x))]
+    ix = FlatIndex.build(str(tmp_path / "flat"), ids, x, [f"text {i} é" for i in ids], [{"source": "s"}] * len(x))
+    top = ix.search(x[:10] * 3, 2)
+    assert [row[0][0] for row in top] == ids[:10]
+    assert top[0][0][1:3] == ("text c0 é", {"source": "s"}) and abs(top[0][0][3]) < 1e-5
+    assert np.allclose(ix.get(["c7"], embeddings=True)["c7"][2], x[7] / np.linalg.norm(x[7]))
+
+def test_retrieve_from_flat_index_skips_the_vector_store(rag_env, monkeypatch):
+    baseline = query.retrieve("pasteurize milk", k=3)
+    export_flat(rag_env["store"], flat_path("docs"))
+    monkeypatch.setattr(query, "FLAT_INDEX", True)
+    monkeypatch.setattr(query, "get_store", None)
+    r = query.retrieve("pasteurize milk", k=3)
+    assert r.ids == baseline.ids and r.documents == baseline.documents
+    assert np.allclose(r.distances, baseline.distances, atol=1e-4)
+    assert resources.get_flat("docs") is resources.get_flat("docs")
+
+def test_exports_are_dropped_when_a_later_ingest_does_not_rebuild_them(rag_env, monkeypatch):
+    import app.ingest as ingest
+
+    monkeypatch.setattr(ingest, "CHROMA_DIR", str(rag_env["tmp_path"] / "chroma"))
+    data = rag_env["tmp_path"] / "data"
+    data.mkdir()
+    (data / "a.txt").write_text("Raw milk must be pasteurized.")
+    (data / "b.txt").write_text("Eggs are graded by size.")
+    base = ["--data", str(data), "--collection", "docs"]
+    ingest.main(base + ["--flat", "--quantize", "int8"])
+    assert resources.get_flat("docs") is not None and resources.get_quantized("docs") is not None
+
+    ingest.main(base)  # nothing changed: the exports are still current
+    assert resources.get_flat("docs") is not None
+    (data / "a.txt").unlink()
+    ingest.main(base)
+    assert resources.get_flat("docs") is None and resources.get_quantized("docs") is None
+    ingest.main(base + ["--flat"])
+    sources = {m["source"] for _, m, _ in resources.get_flat("docs").get(resources.get_flat("docs").ids).values()}
+    assert str(data / "a.txt") not in sources and str(data / "b.txt") in sources
@@ -0,0 +1,43 @@
+import sqlite3
+
+import app.query as query
+from app.lexical import LexicalIndex, match_expression, reciprocal_rank_fusion
+
+def test_match_expression_keeps_identifiers_as_phrases():
+    assert match_expression('What is "21 CFR 101.9"?') == '"what" OR "is" OR "21" OR "cfr" OR "101.9"'
+
+def test_lexical_index_updates_incrementally(tmp_path):
+    ix = LexicalIndex(str(tmp_path / "lex.sqlite3"))
+    ix.upsert(["a", "b"], ["docket FNS-2022-0007 comments", "section 101 and 9 pages"], ["s1", "s2"])
+    assert [i for i, _ in ix.search("FNS-2022-0007", 5)] == ["a"]
+    assert [i for i, _ in ix.search("101.9", 5)] == []
+    ix.upsert(["a"], ["replaced text"], ["s1"])
+    assert ix.search("FNS-2022-0007", 5) == []
+    ix.delete_source("s1")
+    assert LexicalIndex(ix.path).count() == 1
+
+def test_lexical_index_maps_rows_of_an_older_index(tmp_path):
+    path = str(tmp_path / "lex.sqlite3")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE VIRTUAL TABLE chunks USING fts5(id UNINDEXED, source UNINDEXED, text)")
+    conn.executemany("INSERT INTO chunks VALUES (?, ?, ?)", [("a", "s1", "old milk"), ("b", "s2", "eggs")])
+    conn.commit()
+    conn.close()
+    ix = LexicalIndex(path)
+    ix.upsert(["a"], ["new cheese"], ["s1"])
+    assert ix.search("milk", 5) == [] and [i for i, _ in ix.search("cheese", 5)] == ["a"]
+    ix.delete_source("s2")
+    assert ix.count() == 1
+
+def test_reciprocal_rank_fusion_rewards_agreement():
+    scores = reciprocal_rank_fusion([["a", "b", "c"], ["b"]], k=60)
+    assert sorted(scores, key=scores.get, reverse=True) == ["b", "a", "c"]
+
+def test_keyword_only_hit_is_fused_into_results(rag_env, monkeypatch):
+    col = rag_env["collection"]
+    real_query = col.query
+    # Pretend the embedding search only ever finds the allergen chunk.
+    monkeypatch.setattr(col, "query", lambda **kw: real_query(**{**kw, "n_results": 1}))
+    r = query.retrieve("requirements in 21 CFR 101.9", k=2)
+    assert "doc-4" in r.ids
+    assert r.documents[r.ids.index("doc-4")].endswith("21 CFR 101.9.")
@@ -0,0 +1,124 @@
+import json
+import sys
+
+import app.ingest as ingest
+from app.resources import get_collection
+
+def _run(monkeypatch, data_dir, *extra):
+    monkeypatch.setattr(sys, "argv", ["ingest", "--data", str(data_dir), "--collection", "ingest_test", *extra])
+    ingest.main()
+
+def _ids_by_source(col):
+    got = col.get(include=["metadatas"])
+    out = {}
+    for i, m in zip(got["ids"], got["metadatas"]):
+        out.setdefault(m["source"], set()).add(i)
+    return out
+
+def test_reingest_only_touches_changed_and_removed_files(rag_env, monkeypatch):
+    monkeypatch.setattr(ingest, "CHROMA_DIR", str(rag_env["tmp_path"] / "chroma"))
+    data = rag_env["tmp_path"] / "data"
+    data.mkdir()
+    (data / "a.txt").write_text("alpha " * 200)
+    (data / "b.txt").write_text("bravo " * 200)
+    (data / "c.md").write_text("charlie " * 200)
+    _run(monkeypatch, data)
+    col = get_collection("ingest_test")
+    before = _ids_by_source(col)
+    embedder = rag_env["embedder"]
+
+    embedder.calls = 0
+    with monkeypatch.context() as m:
+        m.setattr(ingest, "get_embedder", None)  # a no-op run must not load the model
+        _run(m, data)
+    assert embedder.calls == 0
+    assert _ids_by_source(col) == before
+
+    (data / "b.txt").write_text("bravo delta " * 200)
+    (data / "c.md").unlink()
+    (data / "aa.txt").write_text("new file " * 50)
+    _run(monkeypatch, data)
+    after = _ids_by_source(col)
+    assert after[str(data / "a.txt")] == before[str(data / "a.txt")]
+    assert after[str(data / "b.txt")].isdisjoint(before[str(data / "b.txt")])
+    assert str(data / "c.md") not in after
+    assert str(data / "aa.txt") in after
+
+def test_interrupted_ingest_keeps_committed_files(rag_env, monkeypatch):
+    monkeypatch.setattr(ingest, "CHROMA_DIR", str(rag_env["tmp_path"] / "chroma"))
+    data = rag_env["tmp_path"] / "data"
+    data.mkdir()
+    for name in ("a.txt", "b.txt", "c.txt"):
+        (data / name).write_text(f"{name} " * 20)
+    embedder = rag_env["embedder"]
+    real_encode = embedder.encode
+
+    def flaky(texts, **kwargs):
+        if embedder.calls >= 2:
+            raise RuntimeError("boom")
+        return real_encode(texts, **kwargs)
+
+    monkeypatch.setattr(embedder, "encode", flaky)
+    try:
+        _run(monkeypatch, data, "--upsert-batch", "1")
+    except RuntimeError:
+        pass
+    manifest = ingest._load_manifest(ingest._manifest_path("ingest_test"))
+    assert sorted(manifest) == [str(data / "a.txt"), str(data / "b.txt")]
+    report = json.loads(ingest._report_path("ingest_test").read_text())
+    assert report["status"] == "failed" and "boom" in report["error"]
+    assert report["counts"]["upsert_batches"] == 2
+
+def test_store_and_manifest_are_flushed_on_an_interval(rag_env, monkeypatch):
+    monkeypatch.setattr(ingest, "CHROMA_DIR", str(rag_env["tmp_path"] / "chroma"))
+    data = rag_env["tmp_path"] / "data"
+    data.mkdir()
+    for name in ("a.txt", "b.txt", "c.txt", "d.txt", "e.txt"):
+        (data / name).write_text(f"{name} " * 20)
+    store = ingest.get_store("ingest_test")
+    flushed = []
+
+    def flush():
+        manifest = ingest._load_manifest(ingest._manifest_path("ingest_test"))
+        flushed.append((store.count(), len(manifest)))
+
+    monkeypatch.setattr(store, "flush", flush)
+    _run(monkeypatch, data, "--upsert-batch", "1", "--flush-chunks", "2", "--flush-seconds", "3600")
+    # One flush for the (empty) delete stage, one per two chunks, one at the end;
+    # the manifest only ever lists files stored before the previous flush.
+    assert flushed == [(0, 0), (2, 0), (4, 2), (5, 4)]
+    assert len(ingest._load_manifest(ingest._manifest_path("ingest_test"))) == 5
+
+def test_ingest_writes_stage_report(rag_env, monkeypatch, make_pdf):
+    monkeypatch.setattr(ingest, "CHROMA_DIR", str(rag_env["tmp_path"] / "chroma"))
+    data = rag_env["tmp_path"] / "data"
+    data.mkdir()
+    make_pdf(data / "a.pdf", ["first page", "second page"])
+    (data / "b.txt").write_text("bravo " * 50)
+    (data / "broken.pdf").write_bytes(b"")
+    _run(monkeypatch, data, "--upsert-batch", "2")
+    report = json.loads(ingest._report_path("ingest_test").read_text())
+    counts = report["counts"]
+    assert report["status"] == "ok"
+    assert counts["files"] == counts["files_total"] == 3
+    assert counts["pages"] == 3 and counts["failures"] == 1
+    assert counts["bytes"] == sum(p.stat().st_size for p in data.iterdir())
+    assert counts["embeddings"] == counts["chunks"] > 0
+    assert set(report["stages"]) >= {"extract", "chunk", "embed", "upsert"}
+    assert report["rates"]["embeddings_per_second"] > 0
+    assert report["settings"]["upsert_batch"] == 2
+
+def test_parallel_extraction_matches_serial_order(tmp_path, monkeypatch, capsys, make_pdf):
+    monkeypatch.setattr(ingest, "PDF_PAGES_PER_TASK", 3)
+    make_pdf(tmp_path / "big.pdf", [f"page {i}" for i in range(10)])
+    (tmp_path / "empty.pdf").write_bytes(b"")
+    (tmp_path / "notes.txt").write_text("plain text")
+    changed = [(p, {}) for p in ingest._discover(tmp_path)]
+    assert len(ingest._tasks(tmp_path / "big.pdf", 3)) == 4
+
+    serial = [(str(p), t) for p, _, t in ingest._extract(changed, workers=1)]
+    parallel = [(str(p), t) for p, _, t in ingest._extract(changed, workers=2)]
+    assert parallel == serial
+    assert [p for p, _ in serial] == [str(tmp_path / n) for n in ("big.pdf", "empty.pdf", "notes.txt")]
+    assert serial[0][1] == [f"page {i}" for i in range(10)]
+    assert "empty.pdf: file:" in capsys.readouterr().err
@@ -0,0 +1,55 @@
+from fastapi.testclient import TestClient
+
+import app.api as api
+from app import metrics
+from app.config import EMBED_MODEL
+
+def test_histogram_renders_cumulative_buckets():
+    reg = metrics.Registry()
+    h = reg.register(metrics.Histogram("t_seconds", "Test.", ("op",), buckets=(0.1, 1.0)))
+    for v in (0.05, 0.1, 0.5, 3.0):
+        h.observe(v, op="a")
+    c = reg.register(metrics.Counter("t_total", "Test.", ("op",)))
+    c.inc(op='x"y')
+    text = reg.render()
+    assert "# TYPE t_seconds histogram" in text
+    assert 't_seconds_bucket{op="a",le="0.1"} 2' in text
+    assert 't_seconds_bucket{op="a",le="1"} 3' in text
+    assert 't_seconds_bucket{op="a",le="+Inf"} 4' in text
+    assert 't_seconds_sum{op="a"} 3.65' in text and 't_seconds_count{op="a"} 4' in text
+    assert 't_total{op="x\\"y"} 1' in text
+
+def test_metrics_endpoint_reports_query_path(rag_env, monkeypatch):
+    from bench.stub_llm import serve
+
+    llm = serve()
+    monkeypatch.setattr("app.query.OPENAI_API_KEY", "stub")
+    monkeypatch.setattr("app.query.OPENAI_BASE_URL", llm.url)
+    monkeypatch.setattr("app.query.ANSWER_CACHE_ENABLED", False)
+    before = {
+        "requests": metrics.REQUESTS.value(path="/query", status="200"),
+        "embed": metrics.EMBED_SECONDS.count(),
+        "search": metrics.SEARCH_SECONDS.count(index="chroma"),
+        "generation": metrics.GENERATION_SECONDS.count(mode="async"),
+        "tokens": metrics.TOKENS.value(kind="completion"),
+        "errors": metrics.REQUESTS.value(path="/query", status="422"),
+    }
+    try:
+        client = TestClient(api.app)
+        assert client.post("/query", json={"q": "milk allergens"}).status_code == 200
+        assert client.post("/query", json={}).status_code == 422
+        resp = client.get("/metrics")
+    finally:
+        llm.shutdown()
+    assert resp.headers["content-type"].startswith("text/plain; version=0.0.4")
+    assert metrics.REQUESTS.value(path="/query", status="200") == before["requests"] + 1
+    assert metrics.REQUESTS.value(path="/query", status="422") == before["errors"] + 1
+    assert metrics.EMBED_SECONDS.count() == before["embed"] + 1
+    assert metrics.SEARCH_SECONDS.count(index="chroma") == before["search"] + 1
+    assert metrics.GENERATION_SECONDS.count(mode="async") == before["generation"] + 1
+    assert metrics.TOKENS.value(kind="completion") > before["tokens"]
+    text = resp.text
+    assert 'rag_collection_chunks{collection="docs"} 5' in text
+    assert f'rag_model_loaded{{model="{EMBED_MODEL}"}} 1' in text
+    assert 'rag_cache_misses_total{cache="embeddings"}' in text
+    assert "rag_generation_seconds_bucket" in text
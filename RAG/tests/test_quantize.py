@@ -0,0 +1,52 @@
+import numpy as np
+
+import app.query as query
+from app.ingest import export_quantized
+from app.quantize import QuantizedIndex, dequantize, open_index, quantize
+from app.resources import quantized_path
+
+def _unit_rows(n, dim, seed=0):
+    x = np.random.default_rng(seed).normal(size=(n, dim)).astype(np.float32)
+    return x / np.linalg.norm(x, axis=1, keepdims=True)
+
+def test_int8_round_trip_error_is_bounded_by_half_a_step():
+    x = _unit_rows(200, 32)
+    codes, scales = quantize(x, "int8")
+    assert codes.dtype == np.int8 and scales.shape == (32,)
+    assert np.all(np.abs(dequantize(codes, scales) - x) <= scales / 2 + 1e-6)
+
+def test_quantized_search_finds_exact_neighbours(tmp_path):
+    x = _unit_rows(2000, 64)
+    ids = [f"c{i}" for i in range(len(x))]
+    for mode in ("float16", "int8"):
+        ix = QuantizedIndex.build(str(tmp_path / mode), ids, x, mode)
+        assert ix.nbytes() < x.nbytes
+        top = ix.search(x[:20], 1)
+        assert [row[0][0] for row in top] == ids[:20]
+
+def test_retrieve_from_quantized_index_matches_chroma(rag_env, monkeypatch):
+    col = rag_env["collection"]
+    baseline = query.retrieve("pasteurize milk", k=3).ids
+    export_quantized(rag_env["store"], quantized_path("docs"), "int8")
+    monkeypatch.setattr(query, "QUANTIZE", "int8")
+    monkeypatch.setattr(col, "query", None)
+    monkeypatch.setattr(query, "get_store", None)
+    r = query.retrieve("pasteurize milk", k=3)
+    assert r.ids == baseline and r.documents[0] == col.get(ids=[baseline[0]])["documents"][0]
+
+def test_index_without_rescoring_vectors_is_ignored(tmp_path):
+    x = _unit_rows(50, 8)
+    path = str(tmp_path / "quant")
+    QuantizedIndex.build(path, [f"c{i}" for i in range(len(x))], x, "int8")
+    assert open_index(path) is None
+    QuantizedIndex.build(path, [f"c{i}" for i in range(len(x))], x, "int8", ["t"] * len(x), [{}] * len(x))
+    assert open_index(path).get(["c3"], embeddings=True)["c3"][0] == "t"
+
+def test_disk_bytes_covers_the_float32_copy_and_rescore_one_skips_it(tmp_path):
+    x = _unit_rows(300, 16)
+    ids = [f"c{i}" for i in range(len(x))]
+    ix = QuantizedIndex.build(str(tmp_path / "quant"), ids, x, "int8", ["text"] * len(x), [{}] * len(x))
+    assert ix.nbytes() < x.nbytes < ix.disk_bytes()
+    ix.vectors = None  # rescore=1 must not touch the float32 copy
+    hits = ix.query(x[:5], 2, rescore=1)
+    assert [row[0][0] for row in hits] == ids[:5] and hits[0][0][1] == "text"
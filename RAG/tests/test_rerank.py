@@ -0,0 +1,58 @@
+import app.query as query
+import app.rerank as rerank
+import app.resources as resources
+
+class _FakeCrossEncoder:
+    def __init__(self):
+        self.calls = []
+
+    def predict(self, pairs, **kwargs):
+        self.calls.append(len(pairs))
+        return [len(set(q.lower().split()) & set(d.lower().rstrip(".").split())) for q, d in pairs]
+
+def _setup(monkeypatch, budget_ms=1000.0):
+    model = _FakeCrossEncoder()
+    monkeypatch.setattr(resources, "_reranker", model)
+    monkeypatch.setattr(query, "RERANK_ENABLED", True)
+    monkeypatch.setattr(rerank, "budget", rerank._Budget(budget_ms))
+    rerank.score_cache.clear()
+    return model
+
+def test_rerank_scores_batch_in_one_call_and_caches(rag_env, monkeypatch):
+    model = _setup(monkeypatch)
+    rs = query.retrieve_many(["pasteurize milk dairy farms", "meat inspection service"], k=1)
+    assert rs[0].ids == ["doc-3"] and rs[1].ids == ["doc-2"]
+    assert len(model.calls) == 1
+    query.retrieve_many(["pasteurize milk dairy farms"], k=1)
+    assert len(model.calls) == 1
+
+def test_rerank_skipped_when_over_budget(rag_env, monkeypatch):
+    model = _setup(monkeypatch, budget_ms=1.0)
+    rerank.budget.observe(pairs=1, elapsed_ms=5.0)
+    r = query.retrieve("pasteurize milk dairy farms", k=2)
+    assert model.calls == [] and len(r.ids) == 2
+    assert rerank.stats()["skipped"] == 1
+
+def test_model_load_is_not_counted_against_the_budget(rag_env, monkeypatch):
+    import time
+
+    model = _setup(monkeypatch, budget_ms=50.0)
+
+    def slow_load(name):
+        time.sleep(0.3)
+        return model
+
+    monkeypatch.setattr(resources, "_reranker", None)
+    monkeypatch.setattr(resources, "CrossEncoder", slow_load)
+    query.retrieve("pasteurize milk dairy farms", k=2)
+    query.retrieve("meat inspection service", k=2)
+    assert len(model.calls) == 2 and rerank.stats()["skipped"] == 0
+
+def test_over_budget_estimate_recovers_through_probes(rag_env, monkeypatch):
+    model = _setup(monkeypatch, budget_ms=1000.0)
+    rerank.budget.observe(pairs=1, elapsed_ms=5000.0)
+    for i in range(rerank._Budget.PROBE_EVERY):
+        query.retrieve(f"pasteurize milk {i}", k=2)
+    assert len(model.calls) == 1 and rerank.stats()["skipped"] == rerank._Budget.PROBE_EVERY - 1
+    query.retrieve("meat inspection service", k=2)
+    assert len(model.calls) == 2
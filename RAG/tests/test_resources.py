@@ -0,0 +1,32 @@
+import threading
+
+import app.resources as resources
+
+class _FakeModel:
+    loads = 0
+
+    def __init__(self, name):
+        _FakeModel.loads += 1
+
+    def encode(self, texts, convert_to_numpy=True):
+        return [[0.0] for _ in texts]
+
+def test_embedder_loaded_once_across_threads(monkeypatch):
+    monkeypatch.setattr(resources, "SentenceTransformer", _FakeModel)
+    monkeypatch.setattr(resources, "_embedder", None)
+    _FakeModel.loads = 0
+    seen = []
+    threads = [threading.Thread(target=lambda: seen.append(resources.get_embedder())) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert _FakeModel.loads == 1
+    assert all(m is seen[0] for m in seen)
+
+def test_warm_preloads_reranker_when_enabled(rag_env, monkeypatch):
+    monkeypatch.setattr(resources, "CrossEncoder", _FakeModel)
+    monkeypatch.setattr(resources, "_reranker", None)
+    monkeypatch.setattr(resources, "RERANK_ENABLED", True)
+    resources.warm()
+    assert isinstance(resources._reranker, _FakeModel) and resources.is_ready()
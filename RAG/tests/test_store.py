@@ -0,0 +1,51 @@
+import numpy as np
+
+import app.query as query
+import app.resources as resources
+from app.store import HnswStore
+
+def _unit_rows(n, dim, seed=0):
+    x = np.random.default_rng(seed).normal(size=(n, dim)).astype(np.float32)
+    return x / np.linalg.norm(x, axis=1, keepdims=True)
+
+def test_hnsw_store_upsert_query_delete_and_reload(tmp_path):
+    x = _unit_rows(300, 16)
+    ids = [f"c{i}" for i in range(len(x))]
+    metas = [{"source": f"s{i % 3}"} for i in range(len(x))]
+    store = HnswStore(str(tmp_path / "hnsw"), "docs")
+    store.upsert(ids, x, [f"text {i}" for i in ids], metas)
+    store.flush()
+    top = store.query(x[:5], 1)
+    assert [row[0][0] for row in top] == ids[:5]
+    assert top[0][0][1] == "text c0" and top[0][0][3] < 1e-5
+
+    store.delete_by_source("s0")
+    store.upsert(["c1"], x[:1], ["moved"], [{"source": "s1"}])
+    store.flush()
+    reopened = HnswStore(str(tmp_path / "hnsw"), "docs")
+    assert reopened.count() == 200
+    hits = reopened.query(x[:1], 3)[0]
+    assert hits[0][:2] == ("c1", "moved")
+    assert all(metas[int(h[0][1:])]["source"] != "s0" for h in hits if h[0] != "c1")
+    got = reopened.get(["c2", "c3"], embeddings=True)
+    assert set(got) == {"c2"} and np.allclose(got["c2"][2], x[2])
+    assert sum(len(page) for page, _ in reopened.scan(64)) == 200
+
+def test_retrieve_on_hnsw_backend_matches_chroma(rag_env, monkeypatch):
+    baseline = query.retrieve("pasteurize milk", k=3).ids
+    monkeypatch.setattr(resources, "VECTOR_BACKEND", "hnsw")
+    monkeypatch.setattr(resources, "_stores", {})
+    docs = rag_env["collection"].get(include=["embeddings", "documents", "metadatas"])
+    store = resources.get_store("docs")
+    assert isinstance(store, HnswStore)
+    store.upsert(docs["ids"], np.asarray(docs["embeddings"]), docs["documents"], docs["metadatas"])
+    monkeypatch.setattr(rag_env["collection"], "query", None)
+    assert query.retrieve("pasteurize milk", k=3).ids == baseline
+
+def test_hnsw_store_reopens_after_close(tmp_path):
+    x = _unit_rows(50, 8)
+    store = HnswStore(str(tmp_path / "hnsw"), "docs")
+    store.upsert([f"c{i}" for i in range(len(x))], x, ["t"] * len(x), [{"source": "s"}] * len(x))
+    store.close()
+    assert store._index is None
+    assert store.query(x[:1], 1)[0][0][0] == "c0"
@@ -0,0 +1,50 @@
+import sys
+import threading
+
+import app.ingest as ingest
+import app.watch as watch
+from app.resources import get_collection
+
+def test_poll_changes_debounces_a_burst_of_writes(tmp_path):
+    stop = threading.Event()
+    gen = watch.poll_changes(tmp_path, debounce_ms=100, interval=0.02, stop=stop)
+
+    def writes():
+        for i in range(3):
+            (tmp_path / "a.txt").write_text("x" * (i + 1))
+            stop.wait(0.03)
+        (tmp_path / "b.md").write_text("y")
+
+    threading.Thread(target=writes).start()
+    assert next(gen) == {tmp_path / "a.txt", tmp_path / "b.md"}
+    stop.set()
+    assert list(gen) == []
+
+def test_watch_ingests_only_changed_paths(rag_env, monkeypatch):
+    monkeypatch.setattr(ingest, "CHROMA_DIR", str(rag_env["tmp_path"] / "chroma"))
+    data = rag_env["tmp_path"] / "data"
+    (data / "old").mkdir(parents=True)
+    (data / "a.txt").write_text("alpha file about milk")
+    (data / "old" / "b.txt").write_text("bravo file about cheese")
+    embedder = rag_env["embedder"]
+    seen = []
+
+    def scripted(root, debounce_ms, interval, force_polling, stop):
+        (data / "c.txt").write_text("charlie file about eggs")
+        (data / "old" / "b.txt").unlink()
+        (data / "old").rmdir()
+        yield {(data / "c.txt").resolve(), (data / "old").resolve()}
+        seen.append(embedder.calls)
+        (data / "a.txt").write_text("alpha file about butter")
+        yield {(data / "a.txt").resolve(), (data / "notes.tmp").resolve()}
+
+    monkeypatch.setattr(watch, "changes", scripted)
+    monkeypatch.setattr(sys, "argv", ["ingest", "--data", str(data), "--collection", "watch_test", "--watch"])
+    ingest.main()
+
+    got = get_collection("watch_test").get(include=["metadatas", "documents"])
+    assert sorted(m["source"] for m in got["metadatas"]) == [str(data / "a.txt"), str(data / "c.txt")]
+    assert "alpha file about butter" in got["documents"]
+    assert seen == [2] and embedder.calls == 3
+    manifest = ingest._load_manifest(ingest._manifest_path("watch_test"))
+    assert sorted(manifest) == [str(data / "a.txt"), str(data / "c.txt")]